@@ -0,0 +1,116 @@
+import atexit
+import hashlib
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import datetime, timedelta
+
+
+class AccessLogWriter:
+    """Asynchronous batched writer for the access_logs table.
+
+    Requests only put a small tuple into a bounded queue; a background
+    thread bulk-inserts the records every batch_size records or
+    flush_interval seconds and prunes rows older than retention_days.
+    When the queue is full records are dropped and counted instead of
+    blocking the request.
+    """
+
+    def __init__(self, max_queue=10000, batch_size=500, flush_interval=1.0,
+                 retention_days=30, prune_interval=3600):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.retention_days = retention_days
+        self.prune_interval = prune_interval
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._engine = None
+        self._table = None
+        self._thread_pid = None
+        self._start_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._last_prune = 0.0
+
+    def bind(self, engine, table):
+        """Enable the pipeline (schema is handled by migrations.py)"""
+        self._engine = engine
+        self._table = table
+        atexit.register(self.flush)
+
+    def record(self, ip, user_id, path, user_agent, status, status_code, latency_ms):
+        """Enqueue one access record without touching the database"""
+        if self._engine is None:
+            return
+        if self._thread_pid != os.getpid():
+            self._start_writer()
+        try:
+            self._queue.put_nowait((datetime.now(), ip, user_id, path[:255], user_agent,
+                                    status, status_code, latency_ms))
+        except queue.Full:
+            self.dropped += 1
+
+    def _start_writer(self):
+        with self._start_lock:
+            if self._thread_pid != os.getpid():
+                self._thread_pid = os.getpid()
+                threading.Thread(target=self._writer_loop, name='access-log-writer', daemon=True).start()
+
+    def _writer_loop(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+            try:
+                self._write(batch)
+                if time.monotonic() - self._last_prune > self.prune_interval:
+                    self.prune()
+            except Exception as e:
+                logging.error(f"Error writing access log batch ({len(batch)} records): {e}")
+
+    def flush(self):
+        """Write everything currently queued (used at shutdown)"""
+        batch = []
+        while True:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        if batch and self._engine is not None:
+            self._write(batch)
+        return len(batch)
+
+    def _write(self, batch):
+        rows = [{
+            'timestamp': timestamp,
+            'ip_address': ip,
+            'user_id': user_id,
+            'request_path': path,
+            'user_agent_hash': hashlib.sha1(user_agent.encode()).hexdigest()[:16] if user_agent else None,
+            'status': status,
+            'status_code': status_code,
+            'latency_ms': latency_ms,
+        } for timestamp, ip, user_id, path, user_agent, status, status_code, latency_ms in batch]
+        with self._write_lock, self._engine.begin() as conn:
+            conn.execute(self._table.insert(), rows)
+
+    def prune(self):
+        """Delete records older than retention_days"""
+        self._last_prune = time.monotonic()
+        cutoff = datetime.now() - timedelta(days=self.retention_days)
+        with self._write_lock, self._engine.begin() as conn:
+            deleted = conn.execute(self._table.delete().where(self._table.c.timestamp < cutoff)).rowcount
+        if deleted:
+            logging.info(f"Pruned {deleted} access log records older than {self.retention_days} days")
+        return deleted
+
+
+access_log = AccessLogWriter()
@@ -0,0 +1,312 @@
+"""Удаленный агент проверок для площадок за NAT.
+
+Агент получает у сервера назначенные ему хосты (/api/agent/targets,
+см. remote_agents.py), проверяет их так же, как сборщик (collector.py:
+пул потоков, уровни зависимостей, подавление потомков), и вместо записи
+в базу складывает пакеты результатов в очередь на диске. Отдельный поток
+отправляет пакеты на /api/ingest по порядку (gzip, номер пакета) и
+удаляет пакет только после подтверждения сервером этого номера. Пока
+сервер недоступен, пакеты копятся в очереди, поэтому доставка "хотя бы
+один раз"; повторы сервер отбрасывает по номеру пакета.
+
+    python agent.py --server http://noc:5000 --id branch-a --token ... [--spool agent_spool]
+                    [--interval 300] [--workers 32] [--once]
+
+Модуль не зависит от Flask (и не импортирует веб-приложение).
+"""
+import argparse
+import gzip
+import json
+import logging
+import os
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+
+import alerts
+from collector import Collector, probe_host
+from monitoring import COLLECTOR_INTERVAL
+
+
+class DeliveryError(Exception):
+    """Пакет не доставлен, его нужно отправить повторно."""
+
+
+class BatchRejected(Exception):
+    """Сервер отклонил пакет как некорректный; повтор не поможет."""
+
+
+class Spool:
+    """Очередь пакетов на диске.
+
+    Каждый пакет - файл <seq>.json.gz с уже сжатым телом запроса;
+    state.json хранит идентификатор очереди (instance) и последний номер.
+    Файлы пишутся во временный файл и переименовываются, поэтому после
+    сбоя в очереди остаются только целые пакеты.
+    """
+
+    SUFFIX = '.json.gz'
+
+    def __init__(self, path, max_files=10000):
+        self.path = path
+        self.max_files = max_files
+        self.lock = threading.Lock()
+        os.makedirs(path, exist_ok=True)
+        state = self.read_json('state.json') or {}
+        self.instance = state.get('instance') or uuid.uuid4().hex
+        pending = self.pending()
+        self.seq = max([state.get('seq', 0)] + [seq for seq, _ in pending])
+        self._save_state()
+
+    def read_json(self, name):
+        try:
+            with open(os.path.join(self.path, name), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def write_file(self, name, data):
+        target = os.path.join(self.path, name)
+        with open(target + '.tmp', 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(target + '.tmp', target)
+
+    def _save_state(self):
+        self.write_file('state.json', json.dumps({'instance': self.instance, 'seq': self.seq}).encode())
+
+    def append(self, agent_id, rows):
+        """Сохранить пакет строк; возвращает его номер."""
+        with self.lock:
+            self.seq += 1
+            body = json.dumps({'agent': agent_id, 'instance': self.instance, 'seq': self.seq, 'rows': rows},
+                              ensure_ascii=False, separators=(',', ':')).encode()
+            self.write_file(f"{self.seq:012d}{self.SUFFIX}", gzip.compress(body, compresslevel=6))
+            self._save_state()
+            pending = self.pending()
+        # Ограничение очереди: при долгой недоступности сервера удаляются самые старые пакеты
+        for seq, path in pending[:max(0, len(pending) - self.max_files)]:
+            logging.warning(f"Очередь агента переполнена, пакет {seq} удален без отправки")
+            self.remove(path)
+        return self.seq
+
+    def pending(self):
+        """[(номер, путь)] неотправленных пакетов по порядку."""
+        batches = []
+        for name in os.listdir(self.path):
+            if name.endswith(self.SUFFIX) and name[:-len(self.SUFFIX)].isdigit():
+                batches.append((int(name[:-len(self.SUFFIX)]), os.path.join(self.path, name)))
+        return sorted(batches)
+
+    def remove(self, path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def reject(self, path):
+        """Отложить отклоненный сервером пакет в rejected/ для разбора."""
+        rejected = os.path.join(self.path, 'rejected')
+        os.makedirs(rejected, exist_ok=True)
+        os.replace(path, os.path.join(rejected, os.path.basename(path)))
+
+
+class IngestClient:
+    """HTTP-клиент агента: назначенные хосты и отправка пакетов."""
+
+    def __init__(self, server, agent_id, token, timeout=30):
+        self.server = server.rstrip('/')
+        self.agent_id = agent_id
+        self.timeout = timeout
+        self.headers = {'Authorization': f'Bearer {token}', 'X-Agent-Id': agent_id}
+
+    def _request(self, path, data=None, headers=None):
+        request = urllib.request.Request(self.server + path, data=data, method='POST' if data else 'GET',
+                                         headers={**self.headers, **(headers or {})})
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                body = response.read()
+        except urllib.error.HTTPError as e:
+            if e.code == 400:
+                raise BatchRejected(e.read().decode(errors='replace')) from e
+            raise DeliveryError(f"HTTP {e.code}") from e
+        except (urllib.error.URLError, OSError) as e:
+            raise DeliveryError(str(e)) from e
+        try:
+            return json.loads(body)
+        except ValueError as e:
+            # например, 204 для заблокированного IP: это не подтверждение
+            raise DeliveryError(f"Некорректный ответ сервера: {body[:100]!r}") from e
+
+    def targets(self):
+        return self._request('/api/agent/targets')
+
+    def send(self, body):
+        return self._request('/api/ingest', data=body,
+                             headers={'Content-Type': 'application/json', 'Content-Encoding': 'gzip'})
+
+
+class Agent(Collector):
+    """Сборщик, который пишет результаты в очередь на диске и отправляет их на сервер."""
+
+    def __init__(self, server, agent_id, token, spool_dir='agent_spool', interval=COLLECTOR_INTERVAL,
+                 workers=32, timeout=1.0, probe=probe_host, batch_size=500, flush_interval=1.0,
+                 max_spool_files=10000, max_backoff=60.0, client=None):
+        super().__init__(interval=interval, workers=workers, timeout=timeout, probe=probe,
+                         batch_size=batch_size, flush_interval=flush_interval,
+                         alert_engine=alerts.AlertEngine([], None))
+        self.agent_id = agent_id
+        self.client = client or IngestClient(server, agent_id, token)
+        self.spool = Spool(spool_dir, max_spool_files)
+        self.max_backoff = max_backoff
+        self.delivered = 0
+        self._spooled = threading.Event()
+        self._sender = None
+
+    # --- хосты ---
+
+    def _load_targets(self):
+        """Назначенные хосты с сервера; если он недоступен - последний полученный список."""
+        cache = os.path.join(self.spool.path, 'targets.json')
+        try:
+            assignment = self.client.targets()
+            self.spool.write_file('targets.json', json.dumps(assignment, ensure_ascii=False).encode())
+        except (DeliveryError, BatchRejected) as e:
+            assignment = self.spool.read_json('targets.json')
+            if assignment is None:
+                logging.error(f"Агент {self.agent_id}: список хостов не получен ({e}), кэша {cache} нет")
+                return [], {}
+            logging.warning(f"Агент {self.agent_id}: сервер недоступен ({e}), используется сохраненный список хостов")
+        targets = [tuple(target) for target in assignment.get('targets', [])]
+        dependencies = {(group_name, address): (group_name, parent)
+                        for group_name, address, parent in assignment.get('dependencies', [])}
+        return targets, dependencies
+
+    # --- очередь и отправка ---
+
+    def _writer_loop(self):
+        while not (self._stop.is_set() and self._queue.empty()):
+            batch = self._next_batch()
+            if batch:
+                self._write_batch(None, batch)
+
+    def _write_batch(self, conn, batch):
+        start = time.perf_counter()
+        try:
+            self.spool.append(self.agent_id, [list(row) for row in batch])
+        except OSError as e:
+            logging.error(f"Ошибка записи в очередь агента ({len(batch)} строк): {e}")
+            with self._write_lock:
+                self._pending -= len(batch)
+            return
+        elapsed = time.perf_counter() - start
+        with self._write_lock:
+            self._pending -= len(batch)
+            self._rows_written += len(batch)
+            self._flush_seconds += elapsed
+            self._flush_max = max(self._flush_max, elapsed)
+        self._spooled.set()
+
+    def deliver(self):
+        """Отправить накопленные пакеты по порядку; возвращает число доставленных.
+
+        Останавливается на первой ошибке доставки, чтобы не нарушать порядок.
+        """
+        delivered = 0
+        for seq, path in self.spool.pending():
+            try:
+                with open(path, 'rb') as f:
+                    body = f.read()
+            except FileNotFoundError:
+                continue
+            try:
+                ack = self.client.send(body)
+            except BatchRejected as e:
+                logging.error(f"Агент {self.agent_id}: пакет {seq} отклонен сервером: {e}")
+                self.spool.reject(path)
+                continue
+            if ack.get('seq') != seq:
+                raise DeliveryError(f"Сервер подтвердил пакет {ack.get('seq')} вместо {seq}")
+            self.spool.remove(path)
+            delivered += 1
+        self.delivered += delivered
+        return delivered
+
+    def _sender_loop(self):
+        backoff = 1.0
+        while True:
+            try:
+                self.deliver()
+                backoff = 1.0
+                delay = self.interval
+            except DeliveryError as e:
+                logging.warning(f"Агент {self.agent_id}: сервер недоступен ({e}), "
+                                f"в очереди {len(self.spool.pending())} пакетов, повтор через {backoff:.0f} с")
+                delay = backoff
+                backoff = min(backoff * 2, self.max_backoff)
+            if self._stop.is_set():
+                return
+            # Новый пакет будит поток сразу, если сервер был доступен
+            if delay == self.interval:
+                self._spooled.wait(delay)
+            else:
+                self._stop.wait(delay)
+            self._spooled.clear()
+
+    # --- жизненный цикл ---
+
+    def prepare(self):
+        """Агенту не нужна база: только поток отправки."""
+        if self._sender is None or not self._sender.is_alive():
+            self._sender = threading.Thread(target=self._sender_loop, name='agent-sender', daemon=True)
+            self._sender.start()
+
+    def save_state(self):
+        pass
+
+    def _save_stats(self, stats):
+        stats['spooled'] = len(self.spool.pending())
+        logging.info(f"Цикл агента {self.agent_id}: {stats}")
+
+    def stop(self, wait_writer=True):
+        super().stop(wait_writer)
+        self._spooled.set()
+        if wait_writer and self._sender is not None:
+            self._sender.join(timeout=self.client.timeout + 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Удаленный агент проверок')
+    parser.add_argument('--server', required=True, help='адрес веб-приложения, например http://noc:5000')
+    parser.add_argument('--id', required=True, help='идентификатор агента из config/agents.json')
+    parser.add_argument('--token', default=os.environ.get('AGENT_TOKEN'), help='токен (или AGENT_TOKEN)')
+    parser.add_argument('--spool', default='agent_spool', help='каталог очереди пакетов')
+    parser.add_argument('--interval', type=int, default=COLLECTOR_INTERVAL)
+    parser.add_argument('--workers', type=int, default=32)
+    parser.add_argument('--timeout', type=float, default=1.0)
+    parser.add_argument('--once', action='store_true', help='один цикл, отправка очереди и выход')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    if not args.token:
+        parser.error('укажите --token или AGENT_TOKEN')
+
+    agent = Agent(args.server, args.id, args.token, args.spool, args.interval, args.workers, args.timeout)
+    if args.once:
+        print(agent.run_cycle())
+        agent.stop()
+        try:
+            print(f"Доставлено пакетов: {agent.deliver()}, в очереди: {len(agent.spool.pending())}")
+        except DeliveryError as e:
+            print(f"Сервер недоступен ({e}), пакеты остались в очереди: {len(agent.spool.pending())}")
+    else:
+        try:
+            agent.run_forever()
+        except KeyboardInterrupt:
+            agent.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,554 @@
+"""Движок оповещений, работающий по пакетам записываемых результатов.
+
+Правила проверяются инкрементально: по каждому пакету (обработчик ingest)
+обновляется состояние только затронутых хостов и подгрупп, история
+ping_results повторно не читается. Поддерживаемые правила:
+
+- host_down: хост недоступен probes проверок подряд;
+- subgroup_availability: доля доступных хостов подгруппы (по последней
+  проверке) ниже below процентов;
+- latency_p95: 95-й перцентиль задержки хоста по последним window
+  проверкам выше above_ms.
+
+Переходы состояний проходят подавление флаппинга и окно дедупликации,
+после чего уходят в NotificationDispatcher: он собирает их в пакеты и
+отправляет в каналы (webhook, email, syslog) с отдельной очередью
+повторов для каждого канала. Настройки - config/alerts.json (пример в
+config/alerts.example.json); без файла оповещения отключены.
+"""
+import json
+import logging
+import os
+import queue
+import smtplib
+import socket
+import threading
+import time
+import urllib.request
+from collections import deque
+from email.message import EmailMessage
+
+import numpy as np
+
+from monitoring import STATUS_DOWN, STATUS_UP
+
+ALERTS_CONFIG = os.environ.get('ALERTS_CONFIG', 'config/alerts.json')
+
+FIRING = 'firing'
+RESOLVED = 'resolved'
+
+
+# --- правила ---
+#
+# evaluate возвращает номера затронутых хостов (или подгрупп), условие
+# срабатывания и значение для текста оповещения - все массивами NumPy.
+
+class HostDownRule:
+    kind = 'host_down'
+    scope = 'host'
+    detail = 'failed_probes'
+
+    def __init__(self, name, probes=3):
+        self.name = name
+        self.probes = probes
+
+    def evaluate(self, engine, hosts, subgroups):
+        streak = engine.down_streak[hosts]
+        return hosts, streak >= self.probes, streak
+
+
+class SubgroupAvailabilityRule:
+    kind = 'subgroup_availability'
+    scope = 'subgroup'
+    detail = 'availability'
+
+    def __init__(self, name, below=90.0, min_hosts=1):
+        self.name = name
+        self.below = below
+        self.min_hosts = min_hosts
+
+    def evaluate(self, engine, hosts, subgroups):
+        known = engine.subgroup_known[subgroups]
+        ready = known >= self.min_hosts
+        availability = engine.subgroup_up[subgroups[ready]] / known[ready] * 100
+        return subgroups[ready], availability < self.below, np.round(availability, 2)
+
+
+class LatencyP95Rule:
+    kind = 'latency_p95'
+    scope = 'host'
+    detail = 'p95_ms'
+
+    def __init__(self, name, above_ms=200.0, min_samples=10):
+        self.name = name
+        self.above_ms = above_ms
+        self.min_samples = min_samples
+
+    def evaluate(self, engine, hosts, subgroups):
+        windows = engine.latency[hosts]
+        samples = np.count_nonzero(~np.isnan(windows), axis=1)
+        ready = samples >= self.min_samples
+        # Перцентиль с линейной интерполяцией по отсортированным окнам (NaN в конце);
+        # np.nanpercentile при неполных окнах считает построчно и в десятки раз медленнее
+        ordered = np.sort(windows[ready], axis=1)
+        position = (samples[ready] - 1) * 0.95
+        low = np.floor(position).astype(np.int64)
+        high = np.ceil(position).astype(np.int64)
+        rows = np.arange(len(ordered))
+        p95 = ordered[rows, low] + (ordered[rows, high] - ordered[rows, low]) * (position - low)
+        p95 = np.round(p95.astype(np.float64) * 1000, 2)
+        return hosts[ready], p95 > self.above_ms, p95
+
+
+RULE_TYPES = {rule.kind: rule for rule in (HostDownRule, SubgroupAvailabilityRule, LatencyP95Rule)}
+
+
+class AlertState:
+    __slots__ = ('firing', 'notified', 'since', 'transitions', 'details')
+
+    def __init__(self):
+        self.firing = False
+        self.notified = False
+        self.since = None
+        self.transitions = deque()
+        self.details = None
+
+
+class AlertEngine:
+    """Состояние хостов и подгрупп в массивах NumPy и состояние оповещений.
+
+    Для каждого правила хранится массив текущих условий по хостам или
+    подгруппам; на пакет в Python разбираются только ключи, у которых
+    условие изменилось.
+    """
+
+    def __init__(self, rules, dispatcher, latency_window=20, flap_window=1800, flap_threshold=4,
+                 dedup_seconds=600, clock=time.time):
+        self.rules = rules
+        self.dispatcher = dispatcher
+        self.latency_window = latency_window
+        self.flap_window = flap_window
+        self.flap_threshold = flap_threshold
+        self.dedup_seconds = dedup_seconds
+        self.clock = clock
+        self.lock = threading.Lock()
+
+        self.host_index = {}
+        self.host_keys = []
+        self.subgroup_index = {}
+        self.subgroup_keys = []
+        self.host_subgroup = np.zeros(0, dtype=np.int32)
+        self.last_up = np.zeros(0, dtype=np.int8)  # -1 неизвестно, 0 недоступен, 1 доступен
+        self.down_streak = np.zeros(0, dtype=np.int32)
+        self.latency = np.zeros((0, latency_window), dtype=np.float32)
+        self.latency_pos = np.zeros(0, dtype=np.int16)
+        self.subgroup_up = np.zeros(0, dtype=np.int32)
+        self.subgroup_known = np.zeros(0, dtype=np.int32)
+        self.conditions = {rule.name: np.zeros(0, dtype=bool) for rule in rules}
+
+        self.states = {}
+        self.flapping = set()
+        self.last_sent = {}
+        self._last_sweep = 0.0
+
+    # --- хосты ---
+
+    def load_hosts(self, conn):
+        """Сопоставить хосты подгруппам по таблицам hosts_<группа>."""
+        pairs = []
+        for (group_name,) in conn.execute("SELECT group_name FROM groups").fetchall():
+            table_name = "hosts_" + group_name.replace("'", "''")
+            try:
+                rows = conn.execute(f"SELECT address, subgroup FROM '{table_name}'").fetchall()
+            except Exception as e:
+                logging.warning(f"Оповещения: хосты группы {group_name} не загружены: {e}")
+                continue
+            pairs.extend(((group_name, address), (group_name, subgroup or 'нет')) for address, subgroup in rows)
+        with self.lock:
+            present = np.zeros(len(self.host_subgroup), dtype=bool)
+            for host_key, subgroup_key in pairs:
+                index = self._host(host_key)
+                if index >= len(present):
+                    present = _resize(present, len(self.host_subgroup), False)
+                present[index] = True
+                subgroup = self._subgroup(subgroup_key)
+                old = self.host_subgroup[index]
+                if old != subgroup and self.last_up[index] >= 0:
+                    # хост перенесен в другую подгруппу: перенести его вклад
+                    if old >= 0:
+                        self.subgroup_known[old] -= 1
+                        self.subgroup_up[old] -= self.last_up[index]
+                    self.subgroup_known[subgroup] += 1
+                    self.subgroup_up[subgroup] += self.last_up[index]
+                self.host_subgroup[index] = subgroup
+            # хосты, удаленные из групп (например, синхронизацией инвентаря): убрать их вклад
+            removed = np.flatnonzero(~present[:len(self.host_keys)] & (self.host_subgroup[:len(self.host_keys)] >= 0))
+            if len(removed):
+                known = removed[self.last_up[removed] >= 0]
+                np.add.at(self.subgroup_known, self.host_subgroup[known], -1)
+                np.add.at(self.subgroup_up, self.host_subgroup[known], -self.last_up[known])
+                self.host_subgroup[removed] = -1
+
+    def _host(self, key):
+        index = self.host_index.get(key)
+        if index is None:
+            index = self.host_index[key] = len(self.host_keys)
+            self.host_keys.append(key)
+            if index >= len(self.last_up):
+                size = max(1024, len(self.last_up) * 2)
+                self.host_subgroup = _resize(self.host_subgroup, size, -1)
+                self.last_up = _resize(self.last_up, size, -1)
+                self.down_streak = _resize(self.down_streak, size, 0)
+                self.latency = _resize(self.latency, size, np.nan)
+                self.latency_pos = _resize(self.latency_pos, size, 0)
+                self._resize_conditions('host', size)
+        return index
+
+    def _subgroup(self, key):
+        index = self.subgroup_index.get(key)
+        if index is None:
+            index = self.subgroup_index[key] = len(self.subgroup_keys)
+            self.subgroup_keys.append(key)
+            if index >= len(self.subgroup_up):
+                size = max(64, len(self.subgroup_up) * 2)
+                self.subgroup_up = _resize(self.subgroup_up, size, 0)
+                self.subgroup_known = _resize(self.subgroup_known, size, 0)
+                self._resize_conditions('subgroup', size)
+        return index
+
+    def _resize_conditions(self, scope, size):
+        for rule in self.rules:
+            if rule.scope == scope:
+                self.conditions[rule.name] = _resize(self.conditions[rule.name], size, False)
+
+    # --- обработка пакета ---
+
+    def process(self, conn, rows):
+        """Обработчик ingest: обновить состояние и проверить правила для затронутых ключей."""
+        if not self.rules:
+            return
+        with self.lock:
+            indices = np.fromiter((self._host((group_name, address)) for group_name, address, _, _, _ in rows),
+                                  dtype=np.int64, count=len(rows))
+            up = np.fromiter((status == STATUS_UP for _, _, _, status, _ in rows), dtype=np.int8, count=len(rows))
+            down = np.fromiter((status == STATUS_DOWN for _, _, _, status, _ in rows), dtype=bool, count=len(rows))
+            latency = np.fromiter((np.nan if value is None else value for _, _, _, _, value in rows),
+                                  dtype=np.float32, count=len(rows))
+
+            # Повторы одного хоста в пакете применяются по очереди
+            pending = np.arange(len(rows))
+            while len(pending):
+                _, first = np.unique(indices[pending], return_index=True)
+                step = pending[first]
+                pending = np.setdiff1d(pending, step, assume_unique=True)
+                self._apply(indices[step], up[step], down[step], latency[step])
+
+            hosts = np.unique(indices)
+            subgroups = np.unique(self.host_subgroup[hosts])
+            subgroups = subgroups[subgroups >= 0]
+            timestamp = rows[-1][2]
+            for rule in self.rules:
+                targets, condition, values = rule.evaluate(self, hosts, subgroups)
+                current = self.conditions[rule.name]
+                changed = np.flatnonzero(current[targets] != condition)
+                current[targets] = condition
+                keys = self.host_keys if rule.scope == 'host' else self.subgroup_keys
+                for i in changed.tolist():
+                    self._transition(rule, keys[targets[i]], bool(condition[i]),
+                                     {rule.detail: values[i].item()}, timestamp)
+            self._housekeeping(timestamp)
+
+    def _apply(self, hosts, up, down, latency):
+        previous = self.last_up[hosts]
+        subgroups = self.host_subgroup[hosts]
+        mapped = subgroups >= 0
+        np.add.at(self.subgroup_known, subgroups[mapped & (previous < 0)], 1)
+        np.add.at(self.subgroup_up, subgroups[mapped], (up - np.maximum(previous, 0))[mapped])
+        self.last_up[hosts] = up
+        # Подавленная проверка (недоступен родитель) не продлевает и не сбрасывает серию
+        streak = self.down_streak[hosts]
+        self.down_streak[hosts] = np.where(up == 1, 0, np.where(down, streak + 1, streak))
+        measured = (up == 1) & ~np.isnan(latency)
+        rows = hosts[measured]
+        positions = self.latency_pos[rows]
+        self.latency[rows, positions] = latency[measured]
+        self.latency_pos[rows] = (positions + 1) % self.latency_window
+
+    def _transition(self, rule, key, firing, details, timestamp):
+        state_key = (rule.name, key)
+        state = self.states.get(state_key)
+        if state is None:
+            state = self.states[state_key] = AlertState()
+        now = self.clock()
+        state.firing = firing
+        state.since = timestamp
+        state.details = details
+        state.transitions.append(now)
+        while state.transitions and state.transitions[0] < now - self.flap_window:
+            state.transitions.popleft()
+        if len(state.transitions) >= self.flap_threshold:
+            if state_key not in self.flapping:
+                self.flapping.add(state_key)
+                logging.info(f"Оповещение {rule.name} {'/'.join(key)} флаппит, уведомления приостановлены")
+            return
+        if state_key not in self.flapping:
+            self._notify(rule, key, state, timestamp)
+
+    def _housekeeping(self, timestamp):
+        """Снять флаппинг после flap_window без переходов и забыть старые восстановленные оповещения."""
+        now = self.clock()
+        for state_key in [k for k in self.flapping if self.states[k].transitions[-1] < now - self.flap_window]:
+            self.flapping.discard(state_key)
+            state = self.states[state_key]
+            if state.firing != state.notified:
+                rule = next(rule for rule in self.rules if rule.name == state_key[0])
+                self._notify(rule, state_key[1], state, timestamp)
+        if now - self._last_sweep > 60:
+            self._last_sweep = now
+            for state_key in [k for k, state in self.states.items()
+                              if not state.firing and state.transitions[-1] < now - self.flap_window]:
+                del self.states[state_key]
+            for dedup_key in [k for k, (_, sent) in self.last_sent.items() if sent < now - self.dedup_seconds]:
+                del self.last_sent[dedup_key]
+
+    def _notify(self, rule, key, state, timestamp):
+        status = FIRING if state.firing else RESOLVED
+        if status == RESOLVED and not state.notified:
+            return
+        now = self.clock()
+        # Подавляется только повтор статуса, последним отправленного по этому
+        # ключу: получатель уже знает его, поэтому notified все равно обновляется
+        dedup_key = (rule.name, key)
+        state.notified = state.firing
+        last_status, last_time = self.last_sent.get(dedup_key, (None, None))
+        if last_status == status and now - last_time < self.dedup_seconds:
+            return
+        self.last_sent[dedup_key] = (status, now)
+        self.dispatcher.enqueue({
+            'rule': rule.name,
+            'type': rule.kind,
+            'target': '/'.join(key),
+            'status': status,
+            'since': state.since,
+            'timestamp': timestamp,
+            **state.details,
+        })
+
+    def active_alerts(self):
+        with self.lock:
+            return [{'rule': rule_name, 'target': '/'.join(key), 'since': state.since, **state.details}
+                    for (rule_name, key), state in self.states.items() if state.firing]
+
+
+def _resize(array, size, fill):
+    resized = np.full((size,) + array.shape[1:], fill, dtype=array.dtype)
+    resized[:len(array)] = array
+    return resized
+
+
+# --- каналы доставки ---
+
+def summary_line(events):
+    firing = sum(1 for event in events if event['status'] == FIRING)
+    return f"{len(events)} оповещений: сработало {firing}, восстановлено {len(events) - firing}"
+
+
+def event_line(event):
+    details = ', '.join(f"{key}={value}" for key, value in event.items()
+                        if key not in ('rule', 'type', 'target', 'status', 'since', 'timestamp'))
+    state = 'СРАБОТАЛО' if event['status'] == FIRING else 'ВОССТАНОВЛЕНО'
+    return f"[{state}] {event['rule']}: {event['target']} с {event['since']} ({details})"
+
+
+class WebhookSink:
+    """POST JSON {"summary", "alerts": [...]} на url."""
+
+    def __init__(self, url, timeout=10, headers=None):
+        self.name = f"webhook {url}"
+        self.url = url
+        self.timeout = timeout
+        self.headers = headers or {}
+
+    def send(self, events):
+        body = json.dumps({'summary': summary_line(events), 'alerts': events}, ensure_ascii=False).encode()
+        request = urllib.request.Request(self.url, data=body, method='POST',
+                                         headers={'Content-Type': 'application/json', **self.headers})
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            response.read()
+
+
+class EmailSink:
+    """Одно письмо на пакет; в тексте не более max_lines оповещений."""
+
+    def __init__(self, host, port=25, sender='monitoring@localhost', recipients=(), username=None,
+                 password=None, starttls=False, timeout=10, max_lines=200):
+        self.name = f"email {host}:{port}"
+        self.host = host
+        self.port = port
+        self.sender = sender
+        self.recipients = list(recipients)
+        self.username = username
+        self.password = password
+        self.starttls = starttls
+        self.timeout = timeout
+        self.max_lines = max_lines
+
+    def send(self, events):
+        message = EmailMessage()
+        message['Subject'] = f"[Мониторинг] {summary_line(events)}"
+        message['From'] = self.sender
+        message['To'] = ', '.join(self.recipients)
+        lines = [event_line(event) for event in events[:self.max_lines]]
+        if len(events) > self.max_lines:
+            lines.append(f"... и еще {len(events) - self.max_lines}")
+        message.set_content('\n'.join(lines))
+        with smtplib.SMTP(self.host, self.port, timeout=self.timeout) as smtp:
+            if self.starttls:
+                smtp.starttls()
+            if self.username:
+                smtp.login(self.username, self.password)
+            smtp.send_message(message)
+
+
+class SyslogSink:
+    """Строки RFC 3164 по UDP: сводка пакета и по строке на оповещение."""
+
+    def __init__(self, host='localhost', port=514, facility=1, tag='monitoring', max_lines=1000):
+        self.name = f"syslog {host}:{port}"
+        self.address = (host, port)
+        self.facility = facility
+        self.tag = tag
+        self.max_lines = max_lines
+
+    def send(self, events):
+        lines = [summary_line(events)] + [event_line(event) for event in events[:self.max_lines]]
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+            for line in lines:
+                severity = 4  # warning
+                sock.sendto(f"<{self.facility * 8 + severity}>{self.tag}: {line}".encode()[:2048], self.address)
+
+
+SINK_TYPES = {'webhook': WebhookSink, 'email': EmailSink, 'syslog': SyslogSink}
+
+
+class NotificationDispatcher:
+    """Сборка оповещений в пакеты и доставка с повторами.
+
+    События копятся batch_interval секунд (или до max_batch штук) и
+    отправляются одним пакетом в каждый канал. Неудачная отправка
+    повторяется с экспоненциальной задержкой до max_attempts раз; у
+    каждого канала своя очередь повторов, поэтому недоступный webhook не
+    задерживает почту.
+    """
+
+    def __init__(self, sinks, batch_interval=5.0, max_batch=5000, max_queue=100000,
+                 retry_delay=5.0, max_attempts=6, max_retry_batches=100):
+        self.sinks = sinks
+        self.batch_interval = batch_interval
+        self.max_batch = max_batch
+        self.retry_delay = retry_delay
+        self.max_attempts = max_attempts
+        self.max_retry_batches = max_retry_batches
+        self.dropped = 0
+        self.delivered = 0
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._retries = {sink.name: deque() for sink in sinks}
+        self._thread = None
+        self._thread_pid = None
+        self._start_lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def enqueue(self, event):
+        if not self.sinks:
+            return
+        if self._thread_pid != os.getpid():
+            self._start()
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            self.dropped += 1
+
+    def _start(self):
+        with self._start_lock:
+            if self._thread_pid != os.getpid():
+                self._thread_pid = os.getpid()
+                self._thread = threading.Thread(target=self._loop, name='alert-dispatcher', daemon=True)
+                self._thread.start()
+
+    def _loop(self):
+        while not self._stop.is_set():
+            batch = self._collect()
+            if batch:
+                for sink in self.sinks:
+                    self._deliver(sink, batch, 1)
+            self._retry_due()
+
+    def _collect(self):
+        try:
+            batch = [self._queue.get(timeout=self.batch_interval)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.batch_interval
+        while len(batch) < self.max_batch:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=timeout))
+            except queue.Empty:
+                break
+        return batch
+
+    def _deliver(self, sink, batch, attempt):
+        try:
+            sink.send(batch)
+            self.delivered += len(batch)
+            return True
+        except Exception as e:
+            retries = self._retries[sink.name]
+            if attempt >= self.max_attempts:
+                logging.error(f"Оповещения ({len(batch)}) не доставлены в {sink.name}: {e}")
+                return False
+            logging.warning(f"Ошибка доставки в {sink.name} (попытка {attempt}): {e}")
+            if len(retries) >= self.max_retry_batches:
+                dropped_batch = retries.popleft()
+                self.dropped += len(dropped_batch[2])
+            retries.append((time.monotonic() + self.retry_delay * 2 ** (attempt - 1), attempt + 1, batch))
+            return False
+
+    def _retry_due(self):
+        now = time.monotonic()
+        for sink in self.sinks:
+            retries = self._retries[sink.name]
+            due = [item for item in retries if item[0] <= now]
+            for item in due:
+                retries.remove(item)
+            for _, attempt, batch in due:
+                self._deliver(sink, batch, attempt)
+
+    def pending(self):
+        return self._queue.qsize() + sum(len(batch) for retries in self._retries.values()
+                                         for _, _, batch in retries)
+
+    def stop(self):
+        self._stop.set()
+
+
+def load_engine(path=ALERTS_CONFIG):
+    """Создать движок по файлу настроек; без файла - движок без правил."""
+    if not os.path.exists(path):
+        return AlertEngine([], NotificationDispatcher([]))
+    with open(path, 'r', encoding='utf-8') as f:
+        config = json.load(f)
+    rules = []
+    for rule in config.get('rules', []):
+        options = dict(rule)
+        kind = options.pop('type')
+        name = options.pop('name', kind)
+        rules.append(RULE_TYPES[kind](name, **options))
+    sinks = []
+    for sink in config.get('sinks', []):
+        options = dict(sink)
+        sinks.append(SINK_TYPES[options.pop('type')](**options))
+    dispatcher = NotificationDispatcher(sinks, **config.get('dispatcher', {}))
+    return AlertEngine(rules, dispatcher, **config.get('engine', {}))
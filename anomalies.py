@@ -0,0 +1,235 @@
+"""Потоковое обнаружение аномалий задержки при записи результатов.
+
+Для каждого хоста поддерживается базовая линия задержки по часам суток:
+EWMA среднего и дисперсии логарифма задержки в 24 корзинах. Состояние
+хранится в массивах NumPy (строка на хост), а не в словарях: 128 байт
+на хост (float16 среднее и дисперсия, uint8 счетчик прогрева, id
+открытого интервала), около 13 МБ на 100 тыс. хостов.
+Проверка, у которой z-оценка выше порога, отмечается как аномальная;
+серии аномальных проверок сохраняются интервалами в latency_anomalies.
+
+Логарифм используется потому, что задержка распределена примерно
+логнормально: отклонение в z-оценках означает кратное замедление.
+"""
+import logging
+import os
+import threading
+from datetime import datetime
+
+import numpy as np
+
+from monitoring import STATUS_UP
+
+ANOMALY_Z = float(os.environ.get('ANOMALY_Z', '4.0'))
+ANOMALY_ALPHA = float(os.environ.get('ANOMALY_ALPHA', '0.1'))
+# Проверок в корзине часа, после которых по ней начинают отмечать аномалии
+ANOMALY_MIN_SAMPLES = int(os.environ.get('ANOMALY_MIN_SAMPLES', '12'))
+# Минимальное стандартное отклонение логарифма задержки (~10%)
+MIN_STD = 0.1
+
+HOURS = 24
+
+
+class LatencyBaselines:
+    """Базовые линии задержки всех хостов и открытые интервалы аномалий."""
+
+    def __init__(self, z_threshold=ANOMALY_Z, alpha=ANOMALY_ALPHA, min_samples=ANOMALY_MIN_SAMPLES,
+                 capacity=1024):
+        self.z_threshold = z_threshold
+        self.alpha = alpha
+        self.min_samples = min_samples
+        self.index = {}
+        self.mean = np.zeros((capacity, HOURS), dtype=np.float16)
+        self.var = np.zeros((capacity, HOURS), dtype=np.float16)
+        self.count = np.zeros((capacity, HOURS), dtype=np.uint8)
+        # id открытого интервала аномалии в latency_anomalies (0 - нет)
+        self.open_id = np.zeros(capacity, dtype=np.int64)
+        self.lock = threading.Lock()
+
+    @property
+    def nbytes(self):
+        return self.mean.nbytes + self.var.nbytes + self.count.nbytes + self.open_id.nbytes
+
+    def host_indices(self, keys):
+        """Номера строк для (группа, адрес), новые хосты добавляются в конец."""
+        indices = np.empty(len(keys), dtype=np.int64)
+        for i, key in enumerate(keys):
+            index = self.index.get(key)
+            if index is None:
+                index = self.index[key] = len(self.index)
+            indices[i] = index
+        if len(self.index) > len(self.open_id):
+            self._grow(len(self.index))
+        return indices
+
+    def _grow(self, needed):
+        capacity = max(needed, len(self.open_id) * 2)
+        for name in ('mean', 'var', 'count', 'open_id'):
+            old = getattr(self, name)
+            new = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)
+
+    def observe(self, indices, hours, log_latency, arrays=None):
+        """Обновить базовые линии; вернуть z-оценки, маску аномалий и ожидаемые значения.
+
+        Повторы одного хоста в пакете обрабатываются по очереди, чтобы
+        каждое обновление EWMA видело результат предыдущего. arrays -
+        (mean, var, count) для обновления вместо массивов состояния,
+        indices тогда - номера строк в них.
+        """
+        mean_rows, var_rows, count_rows = arrays or (self.mean, self.var, self.count)
+        z = np.zeros(len(indices))
+        expected = np.zeros(len(indices))
+        flagged = np.zeros(len(indices), dtype=bool)
+        pending = np.arange(len(indices))
+        while len(pending):
+            _, first = np.unique(indices[pending], return_index=True)
+            step = pending[first]
+            pending = np.setdiff1d(pending, step, assume_unique=True)
+
+            rows, cols, x = indices[step], hours[step], log_latency[step]
+            mean = mean_rows[rows, cols].astype(np.float64)
+            var = var_rows[rows, cols].astype(np.float64)
+            count = count_rows[rows, cols]
+            fresh = count == 0
+            expected[step] = np.where(fresh, x, mean)
+
+            std = np.maximum(np.sqrt(var), MIN_STD)
+            z[step] = np.where(fresh, 0.0, (x - mean) / std)
+            flagged[step] = (count >= self.min_samples) & (z[step] > self.z_threshold)
+
+            # Аномальные значения входят в обновление усеченными до порога,
+            # чтобы всплеск не раздувал дисперсию, а устойчивый сдвиг постепенно
+            # становился новой нормой
+            diff = np.minimum(x, mean + self.z_threshold * std) - mean
+            increment = self.alpha * diff
+            mean_rows[rows, cols] = np.where(fresh, x, mean + increment)
+            var_rows[rows, cols] = np.where(fresh, 0.0, (1 - self.alpha) * (var + diff * increment))
+            count_rows[rows, cols] = np.minimum(count.astype(np.uint16) + 1, 255)
+        return z, flagged, expected
+
+    def save(self, path):
+        keys = list(self.index)
+        n = len(keys)
+        tmp_path = path + '.tmp.npz'
+        np.savez(tmp_path, groups=np.array([k[0] for k in keys], dtype=str),
+                 addresses=np.array([k[1] for k in keys], dtype=str),
+                 mean=self.mean[:n], var=self.var[:n], count=self.count[:n], open_id=self.open_id[:n])
+        os.replace(tmp_path, path)
+
+    def load(self, path):
+        with np.load(path) as data:
+            keys = list(zip(data['groups'].tolist(), data['addresses'].tolist()))
+            self.index = {key: i for i, key in enumerate(keys)}
+            self._grow(len(keys))
+            for name in ('mean', 'var', 'count', 'open_id'):
+                getattr(self, name)[:len(keys)] = data[name]
+
+
+baselines = LatencyBaselines()
+
+
+def state_path(db_path):
+    """Файл с сохраненным состоянием базовых линий рядом с базой."""
+    return db_path + '.baselines.npz'
+
+
+def update_anomalies(conn, rows, state=None):
+    """Обработчик ingest: обновить базовые линии и интервалы аномалий.
+
+    Новые значения считаются на копиях строк затронутых хостов и
+    переносятся в состояние функцией, которую ingest.write_results
+    вызывает после commit: при откате записи базовые линии и id открытых
+    интервалов остаются прежними.
+    """
+    state = state or baselines
+    probes = [(group_name, address, timestamp, latency)
+              for group_name, address, timestamp, status, latency in rows
+              if status == STATUS_UP and latency]
+    if not probes:
+        return
+    keys = [(group_name, address) for group_name, address, _, _ in probes]
+    hours = np.array([int(timestamp[11:13]) for _, _, timestamp, _ in probes])
+    log_latency = np.log(np.array([latency for _, _, _, latency in probes]) * 1000)
+
+    with state.lock:
+        hosts, indices = np.unique(state.host_indices(keys), return_inverse=True)
+        arrays = (state.mean[hosts], state.var[hosts], state.count[hosts])
+        open_id = state.open_id[hosts]
+    z, flagged, expected = state.observe(indices, hours, log_latency, arrays)
+
+    # Открытие, продление и закрытие интервалов: в пакете проверки идут по времени
+    active_hosts = np.union1d(indices[flagged], indices[open_id[indices] != 0])
+    current = {}
+    intervals = []
+    for i in np.flatnonzero(np.isin(indices, active_hosts)):
+        index = int(indices[i])
+        group_name, address, timestamp, _ = probes[i]
+        interval = current.get(index)
+        if interval is None and open_id[index]:
+            interval = current[index] = {'id': int(open_id[index]), 'max_z': None,
+                                         'probes': 0, 'ended_at': None}
+            intervals.append((index, interval))
+        if flagged[i]:
+            if interval is None or interval['ended_at']:
+                interval = current[index] = {'id': None, 'group': group_name, 'address': address,
+                                             'started_at': timestamp, 'baseline_ms': float(np.exp(expected[i])),
+                                             'max_z': None, 'probes': 0, 'ended_at': None}
+                intervals.append((index, interval))
+            interval['probes'] += 1
+            interval['max_z'] = max(interval['max_z'] or 0.0, float(z[i]))
+        elif interval is not None and not interval['ended_at']:
+            interval['ended_at'] = timestamp
+
+    for index, interval in intervals:
+        _store_interval(conn, open_id, index, interval)
+
+    def apply():
+        with state.lock:
+            state.mean[hosts], state.var[hosts], state.count[hosts] = arrays
+            state.open_id[hosts] = open_id
+    return apply
+
+
+def _store_interval(conn, open_id, index, interval):
+    if interval['id'] is None:
+        cursor = conn.execute(
+            "INSERT INTO latency_anomalies (group_name, address, started_at, ended_at, baseline_ms, max_z, probes) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (interval['group'], interval['address'], interval['started_at'], interval['ended_at'],
+             round(interval['baseline_ms'], 3), round(interval['max_z'], 2), interval['probes'])
+        )
+        interval['id'] = cursor.lastrowid
+    else:
+        conn.execute(
+            "UPDATE latency_anomalies SET ended_at = ?, max_z = MAX(max_z, COALESCE(?, max_z)), "
+            "probes = probes + ? WHERE id = ?",
+            (interval['ended_at'],
+             round(interval['max_z'], 2) if interval['max_z'] is not None else None,
+             interval['probes'], interval['id'])
+        )
+    open_id[index] = 0 if interval['ended_at'] else interval['id']
+
+
+def warm_up(conn, state=None, days=7, batch_size=5000):
+    """Прогреть базовые линии по истории за последние days дней (без записи аномалий)."""
+    state = state or baselines
+    since = datetime.fromtimestamp(datetime.now().timestamp() - days * 86400).strftime('%Y-%m-%d %H:%M:%S')
+    cursor = conn.execute(
+        "SELECT group_name, address, timestamp, latency FROM ping_results "
+        "WHERE timestamp >= ? AND status = ? AND latency > 0 ORDER BY timestamp",
+        (since, STATUS_UP)
+    )
+    total = 0
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            break
+        with state.lock:
+            indices = state.host_indices([(group_name, address) for group_name, address, _, _ in rows])
+            hours = np.array([int(row[2][11:13]) for row in rows])
+            state.observe(indices, hours, np.log(np.array([row[3] for row in rows]) * 1000))
+        total += len(rows)
+    logging.info(f"Базовые линии задержки прогреты по {total} результатам ({len(state.index)} хостов)")
+    return total
@@ -15,6 +15,8 @@ class Base(DeclarativeBase):
 app = Flask(__name__)
 app.secret_key = os.environ.get("SESSION_SECRET")
 app.wsgi_app = ProxyFix(app.wsgi_app, x_proto=1, x_host=1)
+# Cookie сессии переподписывается только при изменении сессии
+app.config["SESSION_REFRESH_EACH_REQUEST"] = False
 
 # Database configuration
 app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///monitoring.db"
@@ -25,9 +27,3 @@ app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
 }
 
 db = SQLAlchemy(app, model_class=Base)
-
-# Create tables
-with app.app_context():
-    import models  # noqa: F401
-    db.create_all()
-    logging.info("Database tables created")
@@ -0,0 +1,86 @@
+"""Накопительные счетчики доступности хостов по часовым корзинам.
+
+Строка (группа, адрес, bucket) хранит число успешных (up_total) и всех
+(total) проверок хоста от начала истории до конца часа bucket
+включительно (префиксные суммы). Доступность за любой период - разность
+двух таких строк, без чтения ping_results.
+
+update_counters обновляет счетчики при записи результатов (обработчик
+ingest), backfill_counters строит их по всей истории векторно (NumPy).
+"""
+import logging
+from collections import defaultdict
+
+import numpy as np
+
+from monitoring import STATUS_UP
+
+
+def bucket_of(timestamp):
+    """Начало часа для времени 'YYYY-MM-DD HH:MM:SS'."""
+    return timestamp[:13] + ':00:00'
+
+
+def update_counters(conn, rows):
+    """Обработчик ingest: добавить пакет результатов к счетчикам.
+
+    Сначала создается строка корзины (если ее нет) с итогами предыдущей
+    корзины, затем приращения добавляются к ней и ко всем более поздним
+    корзинам хоста - так опоздавшие результаты тоже учитываются верно.
+    """
+    increments = defaultdict(lambda: [0, 0])
+    for group_name, address, timestamp, status, _ in rows:
+        counter = increments[(group_name, address, bucket_of(timestamp))]
+        counter[0] += status == STATUS_UP
+        counter[1] += 1
+    keys = sorted(increments)
+    conn.executemany("""
+        INSERT OR IGNORE INTO availability_counters (group_name, address, bucket, up_total, total)
+        SELECT ?1, ?2, ?3, COALESCE(MAX(up_total), 0), COALESCE(MAX(total), 0) FROM (
+            SELECT up_total, total FROM availability_counters
+            WHERE group_name = ?1 AND address = ?2 AND bucket < ?3
+            ORDER BY bucket DESC LIMIT 1
+        )
+    """, keys)
+    conn.executemany(
+        "UPDATE availability_counters SET up_total = up_total + ?, total = total + ? "
+        "WHERE group_name = ? AND address = ? AND bucket >= ?",
+        [(*increments[key], *key) for key in keys]
+    )
+
+
+def backfill_counters(conn, group_name=None):
+    """Перестроить счетчики по всей истории ping_results (по группам)."""
+    if group_name:
+        groups = [group_name]
+    else:
+        groups = [row[0] for row in conn.execute("SELECT DISTINCT group_name FROM ping_results")]
+    total = 0
+    for group in groups:
+        rows = conn.execute(
+            "SELECT address, substr(timestamp, 1, 13) || ':00:00', status = ? FROM ping_results "
+            "WHERE group_name = ? ORDER BY address, timestamp",
+            (STATUS_UP, group)
+        ).fetchall()
+        conn.execute("DELETE FROM availability_counters WHERE group_name = ?", (group,))
+        if not rows:
+            continue
+        addresses, buckets, up = (np.array(column) for column in zip(*rows))
+        # последняя строка каждой корзины хоста (история отсортирована по адресу и времени)
+        last = np.flatnonzero(np.append((addresses[1:] != addresses[:-1]) | (buckets[1:] != buckets[:-1]), True))
+        cum_up = np.cumsum(up.astype(np.int64))[last]
+        cum_total = last + 1
+        # префиксные суммы считаются от начала истории каждого хоста
+        host_start = np.flatnonzero(np.append(True, addresses[last][1:] != addresses[last][:-1]))
+        host_index = np.cumsum(np.isin(np.arange(len(last)), host_start)) - 1
+        offset_up = np.append(0, cum_up[:-1])[host_start][host_index]
+        offset_total = np.append(0, cum_total[:-1])[host_start][host_index]
+        conn.executemany(
+            "INSERT INTO availability_counters (group_name, address, bucket, up_total, total) VALUES (?, ?, ?, ?, ?)",
+            zip([group] * len(last), addresses[last].tolist(), buckets[last].tolist(),
+                (cum_up - offset_up).tolist(), (cum_total - offset_total).tolist())
+        )
+        total += len(last)
+    conn.commit()
+    logging.info(f"Счетчики доступности перестроены: {total} корзин")
+    return total
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""Проверка удаленных агентов (agent.py) на localhost: пропускная способность и доставка.
+
+Создает временную базу (generate_dataset.py) с группой на каждого агента,
+config/agents.json во временном каталоге и запускает веб-приложение.
+Веб-приложение ставит пакеты в очередь agent_inbox, в ping_results их
+пишет сборщик (collector.py), запущенный в этом процессе. Агенты тоже
+работают здесь с имитацией ping (без сети):
+
+1. несколько циклов при работающем сервере - строк в секунду от агентов
+   до ping_results;
+2. сервер остановлен: циклы идут, пакеты копятся в очереди на диске;
+3. сервер снова запущен: очередь досылается, затем сверяется число строк в
+   ping_results с числом выполненных проверок (без потерь и повторов);
+4. повторная отправка уже принятого пакета подтверждается как дубликат.
+
+Запуск из корня проекта:
+    python benchmarks/bench_agents.py [--agents 4] [--hosts 2500] [--cycles 3]
+"""
+
+import argparse
+import gzip
+import json
+import logging
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import remote_agents  # noqa: E402
+from agent import Agent, DeliveryError  # noqa: E402
+from collector import Collector  # noqa: E402
+from generate_dataset import generate  # noqa: E402
+from load_test import start_server  # noqa: E402
+from monitoring import STATUS_DOWN, STATUS_UP  # noqa: E402
+
+
+def fake_probe(address, timeout):
+    if random.random() < 0.02:
+        return STATUS_DOWN, None
+    return STATUS_UP, round(random.uniform(0.001, 0.05), 4)
+
+
+def agent_rows(db_path, groups):
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute(f"SELECT COUNT(*) FROM ping_results WHERE group_name IN ({','.join('?' * len(groups))})",
+                            groups).fetchone()[0]
+    finally:
+        conn.close()
+
+
+def wait_inbox(db_path, timeout=120):
+    """Дождаться, пока сборщик запишет все принятые пакеты из agent_inbox."""
+    deadline = time.time() + timeout
+    conn = sqlite3.connect(db_path)
+    try:
+        while conn.execute("SELECT COUNT(*) FROM agent_inbox").fetchone()[0]:
+            if time.time() > deadline:
+                raise SystemExit('Очередь agent_inbox не записана сборщиком')
+            time.sleep(0.1)
+    finally:
+        conn.close()
+
+
+def run_cycles(agents, cycles):
+    """Циклы всех агентов; возвращает число результатов."""
+    produced = 0
+    for _ in range(cycles):
+        for agent in agents:
+            stats = agent.run_cycle()
+            produced += stats['rows_written']
+    return produced
+
+
+def deliver_all(agents, timeout=120):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            for agent in agents:
+                agent.deliver()
+        except DeliveryError:
+            time.sleep(0.5)
+            continue
+        if not any(agent.spool.pending() for agent in agents):
+            return
+    raise SystemExit('Очередь агентов не доставлена')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--agents', type=int, default=4)
+    parser.add_argument('--hosts', type=int, default=2500, help='хостов на агента')
+    parser.add_argument('--cycles', type=int, default=3)
+    parser.add_argument('--workers', type=int, default=64, help='потоков проверок агента')
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'monitoring.db')
+        generate(db_path, args.agents, 5, max(1, args.hosts // 5), 0.01)
+        groups = [f"group{i + 1}" for i in range(args.agents)]
+        tokens = {f"agent{i + 1}": os.urandom(16).hex() for i in range(args.agents)}
+        config = os.path.join(tmp, 'agents.json')
+        with open(config, 'w', encoding='utf-8') as f:
+            json.dump({'agents': {agent_id: {'token': token, 'groups': [group]}
+                                  for (agent_id, token), group in zip(tokens.items(), groups)}}, f)
+        os.environ['AGENTS_CONFIG'] = config
+        remote_agents.registry.path = config
+        server_args = argparse.Namespace(db=db_path, server='flask', workers=1)
+
+        process, url = start_server(server_args)
+        # Все группы назначены агентам: сборщик только разбирает agent_inbox
+        collector = Collector(db_path, interval=60, probe=fake_probe, flush_interval=0.2)
+        collector.prepare()
+        collector.run_cycle()
+        agents = [Agent(url, agent_id, token, os.path.join(tmp, f'spool-{agent_id}'), interval=60,
+                        workers=args.workers, probe=fake_probe, flush_interval=0.2)
+                  for agent_id, token in tokens.items()]
+        baseline = agent_rows(db_path, groups)
+        try:
+            started = time.perf_counter()
+            produced = run_cycles(agents, args.cycles)
+            deliver_all(agents)
+            wait_inbox(db_path)
+            elapsed = time.perf_counter() - started
+            delivered = agent_rows(db_path, groups) - baseline
+            print(f"Агентов: {args.agents}, хостов: {args.agents * args.hosts}, циклов: {args.cycles}")
+            print(f"  сервер доступен:  проверок {produced}, записано {delivered}, "
+                  f"{delivered / elapsed:.0f} строк/с")
+
+            process.terminate()
+            process.wait()
+            produced += run_cycles(agents, args.cycles)
+            spooled = sum(len(agent.spool.pending()) for agent in agents)
+            try:
+                agents[0].deliver()
+            except DeliveryError:
+                pass
+            print(f"  сервер остановлен: в очереди {spooled} пакетов")
+
+            process, url = start_server(server_args)
+            for agent in agents:
+                agent.client.server = url
+            started = time.perf_counter()
+            deliver_all(agents)
+            wait_inbox(db_path)
+            print(f"  после перезапуска: очередь досылается за {time.perf_counter() - started:.2f} с")
+        finally:
+            for agent in agents:
+                agent.stop()
+            collector.stop()
+
+        delivered = agent_rows(db_path, groups) - baseline
+        print(f"  итого проверок {produced}, в ping_results {delivered}: "
+              f"{'совпадает' if produced == delivered else 'РАСХОЖДЕНИЕ'}")
+
+        # Повтор уже принятого пакета
+        agent = agents[0]
+        body = gzip.compress(json.dumps({'instance': agent.spool.instance, 'seq': 1, 'rows': []}).encode())
+        print(f"  повтор пакета 1: {agent.client.send(body)}")
+        process.terminate()
+        process.wait()
+
+
+if __name__ == '__main__':
+    main()
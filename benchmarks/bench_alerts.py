@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""Бенчмарк движка оповещений: авария ядра сети на тысячах хостов.
+
+Поднимает локальные заглушки HTTP (webhook) и SMTP, подает в AlertEngine
+пакеты результатов как от сборщика: несколько циклов нормальной работы,
+затем одновременную недоступность всех хостов (отказ коммутатора ядра)
+и восстановление. Первый запрос к webhook получает ответ 500, чтобы
+проверить очередь повторов; один хост флаппит, чтобы проверить
+подавление. Выводит время обработки пакетов, число переходов и время до
+доставки в каждый канал.
+
+Запуск из корня проекта:
+    python benchmarks/bench_alerts.py [--hosts 10000] [--subgroups 50]
+"""
+
+import argparse
+import json
+import os
+import socketserver
+import sqlite3
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from alerts import (AlertEngine, EmailSink, HostDownRule, LatencyP95Rule,  # noqa: E402
+                    NotificationDispatcher, SubgroupAvailabilityRule, WebhookSink)
+from monitoring import STATUS_DOWN, STATUS_UP  # noqa: E402
+
+received = {'webhook_posts': 0, 'webhook_alerts': 0, 'webhook_failed': 0, 'emails': 0, 'deliveries': []}
+lock = threading.Lock()
+
+
+class WebhookHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        with lock:
+            if received['webhook_failed'] == 0:
+                received['webhook_failed'] += 1
+                self.send_response(500)
+                self.end_headers()
+                return
+            received['webhook_posts'] += 1
+            received['webhook_alerts'] += len(json.loads(body)['alerts'])
+            received['deliveries'].append(('webhook', time.perf_counter()))
+        self.send_response(204)
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+class SMTPHandler(socketserver.StreamRequestHandler):
+    """Минимальный SMTP-сервер: принимает письма и считает их."""
+
+    def handle(self):
+        self.wfile.write(b"220 localhost\r\n")
+        in_data = False
+        for line in self.rfile:
+            if in_data:
+                if line.rstrip(b"\r\n") == b".":
+                    in_data = False
+                    with lock:
+                        received['emails'] += 1
+                        received['deliveries'].append(('email', time.perf_counter()))
+                    self.wfile.write(b"250 OK\r\n")
+                continue
+            command = line[:4].upper()
+            if command == b"EHLO" or command == b"HELO":
+                self.wfile.write(b"250 localhost\r\n")
+            elif command == b"DATA":
+                in_data = True
+                self.wfile.write(b"354 End data with <CR><LF>.<CR><LF>\r\n")
+            elif command == b"QUIT":
+                self.wfile.write(b"221 Bye\r\n")
+                return
+            else:
+                self.wfile.write(b"250 OK\r\n")
+
+
+def serve(server):
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server.server_address[1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--hosts', type=int, default=10000)
+    parser.add_argument('--subgroups', type=int, default=50)
+    parser.add_argument('--batch', type=int, default=500, help='строк в пакете записи')
+    args = parser.parse_args()
+
+    http_port = serve(ThreadingHTTPServer(('127.0.0.1', 0), WebhookHandler))
+    socketserver.ThreadingTCPServer.allow_reuse_address = True
+    smtp_port = serve(socketserver.ThreadingTCPServer(('127.0.0.1', 0), SMTPHandler))
+
+    dispatcher = NotificationDispatcher(
+        [WebhookSink(f"http://127.0.0.1:{http_port}/alerts"),
+         EmailSink('127.0.0.1', smtp_port, recipients=['noc@localhost'])],
+        batch_interval=0.5, retry_delay=0.2)
+    engine = AlertEngine([HostDownRule('host_down', probes=3),
+                          SubgroupAvailabilityRule('subgroup_availability', below=80),
+                          LatencyP95Rule('latency_p95', above_ms=200)],
+                         dispatcher, flap_threshold=4)
+
+    hosts = [(f"sg{h % args.subgroups}", f"10.{h >> 16 & 255}.{h >> 8 & 255}.{h & 255}") for h in range(args.hosts)]
+    conn = sqlite3.connect(':memory:')
+    conn.execute("CREATE TABLE groups (group_name TEXT)")
+    conn.execute("INSERT INTO groups VALUES ('core')")
+    conn.execute("CREATE TABLE hosts_core (address TEXT PRIMARY KEY, description TEXT, subgroup TEXT)")
+    conn.executemany("INSERT INTO hosts_core VALUES (?, '', ?)", [(address, sg) for sg, address in hosts])
+    engine.load_hosts(conn)
+
+    start = datetime(2024, 1, 1)
+    batch_times = []
+
+    def cycle(number, down, flapper_down=False):
+        timestamp = (start + timedelta(minutes=5 * number)).strftime('%Y-%m-%d %H:%M:%S')
+        rows = [('core', address, timestamp, STATUS_DOWN, None) if down
+                else ('core', address, timestamp, STATUS_UP, 0.01) for _, address in hosts]
+        rows[0] = ('core', hosts[0][1], timestamp, STATUS_DOWN if flapper_down or down else STATUS_UP,
+                   None if flapper_down or down else 0.01)
+        for i in range(0, len(rows), args.batch):
+            started = time.perf_counter()
+            engine.process(conn, rows[i:i + args.batch])
+            batch_times.append((time.perf_counter() - started) * 1000)
+
+    number = 0
+    for _ in range(12):  # нормальная работа; хост 0 флаппит (по 3 проверки вниз/вверх)
+        cycle(number, False, flapper_down=(number // 3) % 2 == 0)
+        number += 1
+    outage_start = time.perf_counter()
+    for _ in range(4):
+        cycle(number, True)
+        number += 1
+    outage_processed = time.perf_counter()
+    for _ in range(2):
+        cycle(number, False)
+        number += 1
+
+    deadline = time.time() + 30
+    while (dispatcher.pending() or received['emails'] < 2) and time.time() < deadline:
+        time.sleep(0.1)
+    time.sleep(1.0)
+
+    batch_times.sort()
+    print(f"Хостов: {args.hosts}, подгрупп: {args.subgroups}, пакетов: {len(batch_times)}")
+    print(f"Обработка пакета ({args.batch} строк): медиана {batch_times[len(batch_times) // 2]:.2f} мс, "
+          f"p99 {batch_times[int(len(batch_times) * 0.99)]:.2f} мс")
+    print(f"Обработка 4 циклов аварии: {(outage_processed - outage_start) * 1000:.0f} мс")
+    print(f"Оповещений доставлено диспетчером: {dispatcher.delivered}, потеряно: {dispatcher.dropped}")
+    print(f"Webhook: {received['webhook_posts']} запросов, {received['webhook_alerts']} оповещений, "
+          f"ошибок до повтора: {received['webhook_failed']}")
+    print(f"Email: {received['emails']} писем")
+    for sink in ('webhook', 'email'):
+        delivered_at = min((at for name, at in received['deliveries'] if name == sink and at > outage_start),
+                           default=None)
+        if delivered_at:
+            print(f"  первая доставка {sink} после начала аварии: {(delivered_at - outage_start) * 1000:.0f} мс")
+    print(f"Флаппинг подавлен для: {sorted('/'.join(key) for _, key in engine.flapping)}")
+    print(f"Активных оповещений: {len(engine.active_alerts())}")
+
+
+if __name__ == '__main__':
+    main()
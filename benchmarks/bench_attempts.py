@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""Бенчмарк счетчика попыток доступа при потоке запросов с неизвестных IP.
+
+Запуск из корня проекта:
+    python benchmarks/bench_attempts.py [--ips 100000] [--hits 3]
+"""
+
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import Boolean, Column, DateTime, Integer, MetaData, String, Table, create_engine  # noqa: E402
+from ip_filter import AttemptTracker  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--ips', type=int, default=100000, help='количество уникальных IP')
+    parser.add_argument('--hits', type=int, default=3, help='запросов с каждого IP')
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    engine = create_engine('sqlite:///' + os.path.join(tempfile.mkdtemp(prefix='attempts-bench-'), 'bench.db'))
+    metadata = MetaData()
+    table = Table(
+        'ip_attempts', metadata,
+        Column('id', Integer, primary_key=True),
+        Column('ip_address', String(45), nullable=False, unique=True, index=True),
+        Column('attempt_count', Integer, default=0),
+        Column('first_attempt', DateTime),
+        Column('last_attempt', DateTime),
+        Column('is_blocked', Boolean, default=False),
+    )
+    metadata.create_all(engine)
+
+    tracker = AttemptTracker(max_tracked=args.ips * 2)
+    tracker.bind(engine, table)
+    tracker._thread_pid = os.getpid()  # сброс выполняется вручную ниже
+    blocked = []
+    tracker.on_block = blocked.append
+
+    ips = [f"198.{i // 65536 % 256}.{i // 256 % 256}.{i % 256}" for i in range(args.ips)]
+    record_time = flush_time = 0.0
+    for _ in range(args.hits):
+        start = time.perf_counter()
+        for ip in ips:
+            tracker.record(ip)
+        record_time += time.perf_counter() - start
+        start = time.perf_counter()
+        tracker.flush()
+        flush_time += time.perf_counter() - start
+
+    total = args.ips * args.hits
+    print(f"Попыток:               {total}")
+    print(f"Учет в памяти:         {total / record_time:12.0f} попыток/с")
+    print(f"Пакетная запись в БД:  {total / flush_time:12.0f} строк/с ({args.hits} сброса)")
+    print(f"Заблокировано IP:      {len(blocked)}")
+
+
+if __name__ == '__main__':
+    main()
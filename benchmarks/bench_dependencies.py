@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""Бенчмарк проверок с учетом зависимостей: авария в дереве из ~10 тыс. хостов.
+
+Строит во временной базе дерево ядро -> распределение -> доступ -> хосты
+и выполняет цикл сборщика с имитацией проверок: хосты под отказавшим
+коммутатором ядра не отвечают до истечения таймаута, остальные отвечают
+сразу. Цикл выполняется дважды - без таблицы зависимостей (проверяются
+все хосты) и с ней (проверяется только отказавший узел, его потомки
+записываются как подавленные). Выводит число проверок, длительность
+цикла и число записанных строк по статусам.
+
+Запуск из корня проекта:
+    python benchmarks/bench_dependencies.py [--fanout 2,10,10,50] [--timeout 0.05] [--workers 64]
+"""
+
+import argparse
+import logging
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from collector import Collector  # noqa: E402
+from dependencies import save_dependencies  # noqa: E402
+from migrations import ensure_monitoring_schema  # noqa: E402
+from monitoring import STATUS_DOWN, STATUS_UP  # noqa: E402
+
+LEVELS = ('core', 'distribution', 'access', 'host')
+
+
+def build_tree(fanout):
+    """[(адрес, подгруппа, родитель)]: уровни дерева по числу потомков на узел."""
+    nodes = []
+    parents = [None]
+    for level, count in zip(LEVELS, fanout):
+        children = []
+        for parent in parents:
+            for _ in range(count):
+                n = len(nodes)
+                address = f"10.{n >> 16 & 255}.{n >> 8 & 255}.{n & 255}"
+                nodes.append((address, level, parent))
+                children.append(address)
+        parents = children
+    return nodes
+
+
+def prepare_db(path, nodes, with_dependencies):
+    conn = sqlite3.connect(path)
+    ensure_monitoring_schema(conn)
+    conn.execute("INSERT INTO groups (group_name) VALUES ('net')")
+    conn.execute("CREATE TABLE hosts_net (address TEXT PRIMARY KEY, description TEXT, subgroup TEXT)")
+    conn.executemany("INSERT INTO hosts_net VALUES (?, '', ?)", [(address, level) for address, level, _ in nodes])
+    conn.commit()
+    if with_dependencies:
+        save_dependencies(conn, [('net', address, parent) for address, _, parent in nodes if parent])
+    conn.close()
+
+
+def failed_subtree(nodes, root):
+    failed = {root}
+    for address, _, parent in nodes:  # узлы идут по уровням, родитель раньше потомков
+        if parent in failed:
+            failed.add(address)
+    return failed
+
+
+def run(nodes, failed, args, with_dependencies):
+    probes = [0]
+    lock = threading.Lock()
+
+    def probe(address, timeout):
+        with lock:
+            probes[0] += 1
+        if address in failed:
+            time.sleep(timeout)
+            return STATUS_DOWN, None
+        time.sleep(0.001)
+        return STATUS_UP, 0.002
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'monitoring.db')
+        prepare_db(path, nodes, with_dependencies)
+        collector = Collector(path, interval=600, workers=args.workers, timeout=args.timeout, probe=probe)
+        stats = collector.run_cycle()
+        collector.stop()
+        conn = sqlite3.connect(path)
+        statuses = dict(conn.execute("SELECT status, COUNT(*) FROM ping_results GROUP BY status").fetchall())
+        incidents = conn.execute("SELECT COUNT(*) FROM incidents").fetchone()[0]
+        conn.close()
+    return probes[0], stats, statuses, incidents
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--fanout', default='2,10,10,50', help='потомков на узел по уровням дерева')
+    parser.add_argument('--timeout', type=float, default=0.05, help='таймаут проверки недоступного хоста, с')
+    parser.add_argument('--workers', type=int, default=64)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.ERROR)
+
+    nodes = build_tree([int(n) for n in args.fanout.split(',')])
+    failed = failed_subtree(nodes, nodes[0][0])
+    print(f"Хостов: {len(nodes)}, в отказавшем поддереве: {len(failed)}, "
+          f"таймаут {args.timeout * 1000:.0f} мс, потоков {args.workers}")
+    for title, with_dependencies in (('без зависимостей', False), ('с зависимостями', True)):
+        probes, stats, statuses, incidents = run(nodes, failed, args, with_dependencies)
+        print(f"{title}: проверок {probes}, подавлено {stats['suppressed']}, "
+              f"цикл {stats['duration_ms']:.0f} мс, строк {stats['rows_written']}, инцидентов {incidents}")
+        print(f"  статусы: {statuses}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""Бенчмарк тепловой карты доступности (/api/heatmap, get_heatmap).
+
+Во временной базе создает группу с подгруппами (inventory.py) и
+накопительные счетчики availability_counters за несколько суток (проверка
+каждые 5 минут, часть хостов с пропусками и отказами), затем замеряет
+get_heatmap по часам и по суткам для всей группы и одной подгруппы и
+размер ответа в JSON.
+
+Запуск из корня проекта:
+    python benchmarks/bench_heatmap.py [--hosts 2000] [--subgroups 4] [--days 14] [--repeat 5]
+"""
+
+import argparse
+import json
+import logging
+import os
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def timings_ms(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings), max(timings), result
+
+
+def make_counters(group_name, addresses, end_hour, hours, seed=1):
+    """Строки availability_counters: 12 проверок в час, у каждого хоста свои пропуски и отказы."""
+    rng = np.random.default_rng(seed)
+    buckets = [str(end_hour - np.timedelta64(hours - 1 - k, 'h')).replace('T', ' ') + ':00:00'
+               for k in range(hours)]
+    for address in addresses:
+        checks = np.where(rng.random(hours) < 0.02, 0, 12)
+        up = np.minimum(checks, rng.binomial(12, 0.97, hours))
+        up_total, total = np.cumsum(up), np.cumsum(checks)
+        for k in np.flatnonzero(checks):
+            yield group_name, address, buckets[k], int(up_total[k]), int(total[k])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--hosts', type=int, default=2000)
+    parser.add_argument('--subgroups', type=int, default=4)
+    parser.add_argument('--days', type=int, default=14)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'monitoring.db')
+        os.environ['MONITORING_DB'] = db_path
+        import inventory
+        import monitoring
+
+        rows = [('group1', f"10.0.{i >> 8}.{i & 255}", f"Хост {i}", f"sg{i % args.subgroups}", None)
+                for i in range(args.hosts)]
+        conn = sqlite3.connect(db_path)
+        inventory.sync_inventory(conn, rows)
+        end_hour = np.datetime64(time.strftime('%Y-%m-%dT%H'), 'h')
+        started = time.perf_counter()
+        conn.executemany(
+            "INSERT INTO availability_counters (group_name, address, bucket, up_total, total) VALUES (?, ?, ?, ?, ?)",
+            make_counters('group1', [row[1] for row in rows], end_hour, args.days * 24)
+        )
+        conn.commit()
+        count = conn.execute("SELECT COUNT(*) FROM availability_counters").fetchone()[0]
+        conn.close()
+        print(f"Хостов: {args.hosts} в {args.subgroups} подгруппах, {args.days} сут., "
+              f"строк счетчиков {count} ({time.perf_counter() - started:.1f} с)")
+
+        print(f"  {'запрос':28s}{'ячеек':>9s}{'медиана, мс':>13s}{'макс., мс':>11s}{'JSON, КБ':>10s}")
+        for bucket in ('hour', 'day'):
+            for subgroup in (None, 'sg0'):
+                median, worst, heatmap = timings_ms(
+                    lambda: monitoring.get_heatmap('group1', subgroup, bucket), args.repeat)
+                cells = len(heatmap['availability'])
+                size = len(json.dumps(heatmap, separators=(',', ':'))) / 1024
+                title = f"{bucket}, {subgroup or 'вся группа'}"
+                print(f"  {title:28s}{cells:9d}{median:13.1f}{worst:11.1f}{size:10.0f}")
+
+
+if __name__ == '__main__':
+    main()
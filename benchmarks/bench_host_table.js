@@ -0,0 +1,122 @@
+#!/usr/bin/env node
+/*
+ * Бенчмарк таблицы хостов monitoring.js на 20 тыс. синтетических хостов (jsdom).
+ *
+ * Сравнивает прежнюю отрисовку (конкатенация строк и innerHTML всей
+ * таблицы) с VirtualTable: время первой отрисовки, число строк в DOM,
+ * время и число изменений DOM при автообновлении, в котором у 1% хостов
+ * сменился статус, и время отрисовки после прокрутки в середину.
+ * Изменения DOM считаются через MutationObserver.
+ *
+ * jsdom не входит в зависимости проекта, установка без сохранения:
+ *     npm install --no-save jsdom
+ *     node benchmarks/bench_host_table.js [--hosts 20000] [--changed 0.01]
+ */
+'use strict';
+
+const path = require('path');
+const { performance } = require('perf_hooks');
+const { JSDOM } = require('jsdom');
+
+function arg(name, fallback) {
+    const index = process.argv.indexOf(`--${name}`);
+    return index >= 0 ? Number(process.argv[index + 1]) : fallback;
+}
+
+const HOSTS = arg('hosts', 20000);
+const CHANGED = arg('changed', 0.01);
+const VIEWPORT = 600;
+
+const dom = new JSDOM(`<!DOCTYPE html><div id="hosts">
+    <div class="table-responsive virtual-scroll"><table class="table host-table"><tbody></tbody></table></div>
+</div>`, { pretendToBeVisual: true });
+global.window = dom.window;
+global.document = dom.window.document;
+const { VirtualTable, hostRows } = require(path.join(__dirname, '..', 'static', 'js', 'monitoring.js'));
+
+// В jsdom нет верстки: высота окна прокрутки и scrollTop задаются вручную
+const scroller = document.querySelector('.virtual-scroll');
+let scrollTop = 0;
+Object.defineProperty(scroller, 'clientHeight', { get: () => VIEWPORT });
+Object.defineProperty(scroller, 'scrollTop', { get: () => scrollTop, set: value => { scrollTop = value; } });
+
+function makeHosts(count) {
+    const hosts = [];
+    for (let i = 0; i < count; i++) {
+        hosts.push({
+            address: `10.${(i >> 16) & 255}.${(i >> 8) & 255}.${i & 255}`,
+            description: `Хост ${i}`,
+            subgroup: `sg${i % 50}`,
+            status: i % 17 === 0 ? 'danger' : 'success',
+            anomaly: null
+        });
+    }
+    return hosts;
+}
+
+function changeStatuses(hosts, share) {
+    const step = Math.max(1, Math.round(1 / share));
+    return hosts.map((host, i) => (i % step === 0
+        ? { ...host, status: host.status === 'success' ? 'danger' : 'success' }
+        : host));
+}
+
+// Прежний renderHosts: вся таблица заново через innerHTML
+function legacyRender(tbody, hosts) {
+    let html = '';
+    hosts.forEach(host => {
+        html += `
+            <tr class="host-row status-${host.status}" style="cursor: pointer;" title="Нажмите для просмотра логов">
+                <td><span class="status-indicator status-${host.status}"></span></td>
+                <td class="fw-bold">${host.address}</td>
+                <td>${host.description}</td>
+                <td><span class="badge bg-secondary">${host.subgroup}</span></td>
+            </tr>
+        `;
+    });
+    tbody.innerHTML = html;
+}
+
+async function measure(tbody, action) {
+    const observer = new window.MutationObserver(() => {});
+    observer.observe(tbody, { subtree: true, childList: true, attributes: true, characterData: true });
+    const started = performance.now();
+    action();
+    const elapsed = performance.now() - started;
+    const mutations = observer.takeRecords().length;
+    observer.disconnect();
+    return { ms: elapsed, mutations, rows: tbody.querySelectorAll('tr').length };
+}
+
+function report(title, result) {
+    console.log(`  ${title.padEnd(34)} ${result.ms.toFixed(1).padStart(9)} мс, ` +
+                `изменений DOM ${String(result.mutations).padStart(7)}, строк в DOM ${result.rows}`);
+}
+
+async function main() {
+    const hosts = makeHosts(HOSTS);
+    const refreshed = changeStatuses(hosts, CHANGED);
+    const tbody = document.querySelector('tbody');
+    console.log(`Хостов: ${HOSTS}, при обновлении сменили статус: ${Math.round(HOSTS * CHANGED)}`);
+
+    console.log('innerHTML (прежняя отрисовка):');
+    report('первая отрисовка', await measure(tbody, () => legacyRender(tbody, hosts)));
+    report('автообновление', await measure(tbody, () => legacyRender(tbody, refreshed)));
+    tbody.replaceChildren();
+
+    console.log('VirtualTable:');
+    const table = new VirtualTable(tbody, { ...hostRows, emptyText: '' });
+    report('первая отрисовка', await measure(tbody, () => table.setData(hosts)));
+    report('автообновление', await measure(tbody, () => table.setData(refreshed)));
+    report('автообновление без изменений', await measure(tbody, () => table.setData(refreshed.slice())));
+    report('прокрутка в середину', await measure(tbody, () => {
+        scroller.scrollTop = table.rowHeight * HOSTS / 2;
+        table.render();
+    }));
+    report('прокрутка на 5 строк', await measure(tbody, () => {
+        scroller.scrollTop += table.rowHeight * 5;
+        table.render();
+    }));
+}
+
+main();
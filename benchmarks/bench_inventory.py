@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""Бенчмарк синхронизации инвентаря (inventory.py) на 100 тыс. хостов.
+
+Во временной базе замеряет: первичную загрузку инвентаря, повторную
+синхронизацию без изменений и синхронизацию, в которой часть хостов
+удалена, добавлена и изменена (--churn). Для сравнения - загрузка того
+же инвентаря построчными INSERT с фиксацией каждого хоста.
+
+Запуск из корня проекта:
+    python benchmarks/bench_inventory.py [--groups 10] [--hosts 100000] [--churn 0.05]
+"""
+
+import argparse
+import logging
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import inventory  # noqa: E402
+
+
+def make_inventory(groups, hosts):
+    rows = []
+    for i in range(hosts):
+        group_name = f"group{i % groups}"
+        rows.append((group_name, f"10.{(i >> 16) & 255}.{(i >> 8) & 255}.{i & 255}",
+                     f"Хост {i}", f"sg{i % 50}", None))
+    return rows
+
+
+def churn(rows, share):
+    """Удалить, добавить и изменить по share/3 хостов."""
+    step = max(3, round(3 / share))
+    result = []
+    for i, (group_name, address, description, subgroup, parent) in enumerate(rows):
+        if i % step == 0:
+            continue
+        if i % step == 1:
+            description += ' (изменен)'
+        result.append((group_name, address, description, subgroup, parent))
+        if i % step == 2:
+            result.append((group_name, 'new-' + address, description, subgroup, parent))
+    return result
+
+
+def timed(title, fn):
+    started = time.perf_counter()
+    report = fn()
+    elapsed = time.perf_counter() - started
+    counts = f"+{report['added']} -{report['removed']} ~{report['changed']}" if report else ''
+    print(f"  {title:36s}{elapsed:8.2f} с  {counts}")
+
+
+def naive_load(path, rows):
+    conn = sqlite3.connect(path)
+    inventory.sync_inventory(conn, [], dry_run=True)
+    for group_name in sorted({row[0] for row in rows}):
+        conn.execute("INSERT INTO groups (group_name) VALUES (?)", (group_name,))
+        conn.execute(inventory.HOSTS_SCHEMA.format(table=inventory.hosts_table(group_name)))
+        conn.commit()
+    for group_name, address, description, subgroup, _ in rows:
+        conn.execute(f"INSERT INTO '{inventory.hosts_table(group_name)}' (address, description, subgroup) "
+                     f"VALUES (?, ?, ?)", (address, description, subgroup))
+        conn.commit()
+    conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--groups', type=int, default=10)
+    parser.add_argument('--hosts', type=int, default=100000)
+    parser.add_argument('--churn', type=float, default=0.05, help='доля измененных хостов')
+    parser.add_argument('--naive', type=int, default=10000, help='хостов для построчной загрузки (0 - пропустить)')
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+
+    rows = make_inventory(args.groups, args.hosts)
+    changed = churn(rows, args.churn)
+    print(f"Хостов: {args.hosts} в {args.groups} группах")
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = sqlite3.connect(os.path.join(tmp, 'monitoring.db'))
+        timed('первичная загрузка', lambda: inventory.sync_inventory(conn, rows))
+        timed('повтор без изменений', lambda: inventory.sync_inventory(conn, rows))
+        timed(f'изменения ({args.churn:.0%})', lambda: inventory.sync_inventory(conn, changed))
+        timed('проверка (dry-run)', lambda: inventory.sync_inventory(conn, rows, dry_run=True))
+        conn.close()
+
+        if args.naive:
+            subset = rows[:args.naive]
+            started = time.perf_counter()
+            naive_load(os.path.join(tmp, 'naive.db'), subset)
+            elapsed = time.perf_counter() - started
+            print(f"  {'построчно, ' + str(len(subset)) + ' хостов':36s}{elapsed:8.2f} с  "
+                  f"(~{elapsed * args.hosts / len(subset):.0f} с на {args.hosts})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""Бенчмарк накладных расходов декоратора require_ip_whitelist на один запрос.
+
+Также измеряет проверку адреса по списку подсетей CIDR (PrefixSet).
+
+Запуск из корня проекта:
+    python benchmarks/bench_ip_filter.py [--entries 10000] [--requests 20000] [--prefixes 100000]
+"""
+
+import argparse
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask  # noqa: E402
+from ip_filter import PrefixSet, ip_filter, require_ip_whitelist  # noqa: E402
+
+
+def measure(app, view, requests, remote_addr, reset_cache=False):
+    """Среднее время вызова обёрнутого представления в микросекундах."""
+    with app.test_request_context('/api/hosts', environ_base={'REMOTE_ADDR': remote_addr}):
+        start = time.perf_counter()
+        for _ in range(requests):
+            if reset_cache:
+                ip_filter._lists.clear()
+            view()
+        elapsed = time.perf_counter() - start
+    return elapsed / requests * 1e6
+
+
+def measure_prefixes(prefixes, lookups):
+    """Время компиляции PrefixSet и одной проверки адреса (мкс)."""
+    rng = random.Random(42)
+    entries = []
+    for _ in range(prefixes):
+        length = rng.choice((16, 20, 24, 28, 32))
+        value = rng.getrandbits(32) >> (32 - length) << (32 - length)
+        entries.append(f"{value >> 24}.{value >> 16 & 255}.{value >> 8 & 255}.{value & 255}/{length}")
+    for _ in range(prefixes // 10):
+        entries.append(f"2001:db8:{rng.getrandbits(16):x}:{rng.getrandbits(16):x}::/64")
+
+    start = time.perf_counter()
+    matcher = PrefixSet(entries)
+    compile_ms = (time.perf_counter() - start) * 1000
+
+    probes = [f"{rng.getrandbits(8)}.{rng.getrandbits(8)}.{rng.getrandbits(8)}.{rng.getrandbits(8)}"
+              for _ in range(lookups)]
+    hits = 0
+    start = time.perf_counter()
+    for ip in probes:
+        if ip in matcher:
+            hits += 1
+    lookup_us = (time.perf_counter() - start) / lookups * 1e6
+    return len(entries), compile_ms, lookup_us, hits
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--entries', type=int, default=10000, help='размер белого и черного списков')
+    parser.add_argument('--requests', type=int, default=20000, help='количество запросов')
+    parser.add_argument('--prefixes', type=int, default=100000, help='количество подсетей CIDR')
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    workdir = tempfile.mkdtemp(prefix='ipfilter-bench-')
+    ip_filter.whitelist_file = os.path.join(workdir, 'whitelist.json')
+    ip_filter.blacklist_file = os.path.join(workdir, 'blacklist.json')
+
+    allowed = [f"10.{i // 65536 % 256}.{i // 256 % 256}.{i % 256}" for i in range(args.entries)]
+    blocked = [f"172.{i // 65536 % 256}.{i // 256 % 256}.{i % 256}" for i in range(args.entries)]
+    with open(ip_filter.whitelist_file, 'w') as f:
+        json.dump({'allowed_ips': allowed}, f)
+    with open(ip_filter.blacklist_file, 'w') as f:
+        json.dump({'blocked_ips': blocked}, f)
+
+    app = Flask(__name__)
+    view = require_ip_whitelist(lambda: 'ok')
+
+    baseline = measure(app, lambda: 'ok', args.requests, allowed[-1])
+    cached = measure(app, view, args.requests, allowed[-1])
+    blocked_hit = measure(app, view, args.requests, blocked[-1])
+    reread = measure(app, view, max(1, args.requests // 100), allowed[-1], reset_cache=True)
+
+    print(f"Записей в списках:             {args.entries}")
+    print(f"Без декоратора:                {baseline:10.2f} мкс/запрос")
+    print(f"Разрешенный IP (кэш):          {cached:10.2f} мкс/запрос")
+    print(f"Заблокированный IP (кэш):      {blocked_hit:10.2f} мкс/запрос")
+    print(f"Разрешенный IP (чтение JSON):  {reread:10.2f} мкс/запрос")
+
+    total, compile_ms, lookup_us, hits = measure_prefixes(args.prefixes, args.requests)
+    print(f"Подсетей CIDR:                 {total}")
+    print(f"Компиляция PrefixSet:          {compile_ms:10.2f} мс")
+    print(f"Проверка адреса:               {lookup_us:10.2f} мкс ({hits} совпадений)")
+
+
+if __name__ == '__main__':
+    main()
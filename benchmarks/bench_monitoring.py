@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""Бенчмарк функций monitoring.py и маршрутов /api/* на синтетических данных.
+
+Для каждого масштаба (группы x подгруппы x хосты x дни) генерируется база
+(generate_dataset.py, кэшируется в benchmarks/.data), затем замеряется
+каждая функция доступа к данным и каждый /api/* маршрут через тестовый
+клиент Flask. Результаты сохраняются в benchmarks/results/ в JSON; с
+--compare выводится отношение к предыдущему прогону.
+
+Запуск из корня проекта:
+    python benchmarks/bench_monitoring.py [--scales small=1x4x10x1,medium=2x5x40x3]
+        [--repeat 5] [--compare benchmarks/results/monitoring-<commit>.json]
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import sqlite3
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+os.environ.setdefault('REPL_ID', 'local-dev-mode')
+os.environ.setdefault('SESSION_SECRET', 'benchmark-secret')
+
+DATA_DIR = os.path.join(ROOT, 'benchmarks', '.data')
+RESULTS_DIR = os.path.join(ROOT, 'benchmarks', 'results')
+DEFAULT_SCALES = 'small=1x4x10x1,medium=2x5x40x3'
+
+
+def parse_scales(text):
+    scales = []
+    for item in text.split(','):
+        name, spec = item.split('=')
+        groups, subgroups, hosts, days = spec.split('x')
+        scales.append((name, int(groups), int(subgroups), int(hosts), float(days)))
+    return scales
+
+
+def prepare_db(groups, subgroups, hosts, days):
+    from generate_dataset import generate
+    from migrations import ensure_monitoring_schema
+    os.makedirs(DATA_DIR, exist_ok=True)
+    path = os.path.join(DATA_DIR, f"{groups}x{subgroups}x{hosts}x{days:g}.db")
+    if not os.path.exists(path):
+        started = time.perf_counter()
+        rows = generate(path + '.tmp', groups, subgroups, hosts, days)
+        os.replace(path + '.tmp', path)
+        print(f"  сгенерировано {rows} результатов за {time.perf_counter() - started:.1f} с")
+    # базы из кэша дополняются производными таблицами новых миграций
+    conn = sqlite3.connect(path)
+    try:
+        ensure_monitoring_schema(conn)
+    finally:
+        conn.close()
+    return path
+
+
+def measure(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - started) * 1000)
+    return {'median_ms': round(statistics.median(times), 3), 'min_ms': round(min(times), 3), 'runs': repeat}
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scales', default=DEFAULT_SCALES, help='имя=ГРУППЫxПОДГРУППЫxХОСТЫxДНИ,...')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--compare', help='JSON предыдущего прогона для сравнения')
+    args = parser.parse_args()
+
+    import monitoring
+    from main import app
+    from access_log import access_log
+    logging.disable(logging.CRITICAL)
+    access_log._engine = None  # не писать журнал доступа во время замера
+    client = app.test_client()
+
+    results = {}
+    for name, groups, subgroups, hosts, days in parse_scales(args.scales):
+        print(f"[{name}] {groups} групп x {subgroups} подгрупп x {hosts} хостов x {days:g} дней")
+        monitoring.MONITORING_DB = prepare_db(groups, subgroups, hosts, days)
+        group = monitoring.get_groups()[0]
+        subgroup = monitoring.get_subgroups(group)[1]
+        host = monitoring.get_hosts(group)[0]['address']
+        day_ago = (datetime.now() - timedelta(days=1)).strftime('%Y-%m-%d %H:%M:%S')
+
+        cases = {
+            'get_groups': lambda: monitoring.get_groups(),
+            'get_subgroups': lambda: monitoring.get_subgroups(group),
+            'get_hosts': lambda: monitoring.get_hosts(group),
+            'get_ping_history': lambda: monitoring.get_ping_history(group, host),
+            'get_dashboard_data': lambda: monitoring.get_dashboard_data(group),
+            'get_dashboard_data[subgroup]': lambda: monitoring.get_dashboard_data(group, subgroup),
+            'get_host_status_color': lambda: monitoring.get_host_status_color(group, host),
+            'get_subgroup_status_summary': lambda: monitoring.get_subgroup_status_summary(group, subgroup),
+            'get_incident_stats': lambda: monitoring.get_incident_stats(group),
+            'get_availability[24h]': lambda: monitoring.get_availability(group, None, day_ago),
+            'get_availability[all]': lambda: monitoring.get_availability(group),
+        }
+        for url in ('/api/groups',
+                    f'/api/subgroups?group={group}',
+                    f'/api/hosts?group={group}',
+                    f'/api/hosts?group={group}&subgroup={subgroup}',
+                    f'/api/ping_history?group={group}&host={host}',
+                    f'/api/dashboard?group={group}'):
+            cases['GET ' + url.replace(group, '{group}').replace(subgroup, '{subgroup}').replace(host, '{host}')] = \
+                lambda url=url: client.get(url).close()
+
+        results[name] = {'spec': [groups, subgroups, hosts, days]}
+        for case, fn in cases.items():
+            results[name][case] = measure(fn, args.repeat)
+            print(f"  {case:50s} {results[name][case]['median_ms']:10.2f} мс")
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    commit = git_commit()
+    output = os.path.join(RESULTS_DIR, f"monitoring-{commit}.json")
+    with open(output, 'w') as f:
+        json.dump({'commit': commit, 'date': datetime.now().isoformat(timespec='seconds'),
+                   'python': platform.python_version(), 'results': results}, f, indent=2, ensure_ascii=False)
+    print(f"Результаты: {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)['results']
+        print(f"Сравнение с {args.compare} (новое / старое):")
+        for name, cases in results.items():
+            for case, value in cases.items():
+                old = previous.get(name, {}).get(case)
+                if case != 'spec' and old:
+                    print(f"  [{name}] {case:50s} x{value['median_ms'] / max(old['median_ms'], 1e-6):6.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""Бенчмарк сводки по всем группам (/api/overview, overview.py).
+
+Во временной базе с сотнями групп (инвентарь через inventory.py и
+последний результат каждого хоста) замеряет:
+- пересчет сводки одним агрегирующим запросом (обработчик ingest делает
+  его не чаще раза в OVERVIEW_INTERVAL);
+- ответ get_overview по готовой сводке;
+- прежний путь для сравнения: get_subgroups и get_subgroup_status_summary
+  по каждой группе (на части групп, с пересчетом на все).
+
+Запуск из корня проекта:
+    python benchmarks/bench_overview.py [--groups 500] [--hosts 100000] [--repeat 20]
+"""
+
+import argparse
+import logging
+import os
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def timings_ms(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings), max(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--groups', type=int, default=500)
+    parser.add_argument('--hosts', type=int, default=100000)
+    parser.add_argument('--subgroups', type=int, default=7, help='подгрупп в группе')
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--sample', type=int, default=5, help='групп для замера прежнего пути (0 - пропустить)')
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'monitoring.db')
+        os.environ['MONITORING_DB'] = db_path
+        import inventory
+        import monitoring
+        import overview
+        from host_status import update_status
+        from ingest import write_results
+
+        rows = [(f"group{i % args.groups}", f"10.{(i >> 16) & 255}.{(i >> 8) & 255}.{i & 255}",
+                 f"Хост {i}", f"sg{i % args.subgroups}", None) for i in range(args.hosts)]
+        conn = sqlite3.connect(db_path)
+        inventory.sync_inventory(conn, rows)
+        timestamp = time.strftime('%Y-%m-%d %H:%M:%S')
+        update_status(conn, [(group_name, address, timestamp,
+                              monitoring.STATUS_DOWN if i % 50 == 0 else monitoring.STATUS_UP,
+                              None if i % 50 == 0 else 0.001 * (i % 97))
+                             for i, (group_name, address, *_) in enumerate(rows)])
+        conn.commit()
+        print(f"Хостов: {args.hosts} в {args.groups} группах по {args.subgroups} подгрупп")
+
+        median, worst = timings_ms(lambda: overview.refresh_overview(conn), args.repeat)
+        conn.commit()
+        print(f"  {'пересчет сводки':40s}{median:8.1f} мс (макс. {worst:.1f})")
+
+        median, worst = timings_ms(monitoring.get_overview, args.repeat)
+        print(f"  {'get_overview по готовой сводке':40s}{median:8.1f} мс (макс. {worst:.1f})")
+
+        # Обработчик ingest между пересчетами почти ничего не стоит
+        batch = [(group_name, address, timestamp, monitoring.STATUS_UP, 0.01) for group_name, address, *_ in rows[:500]]
+        overview.update_overview(conn, batch)
+        median, _ = timings_ms(lambda: overview.update_overview(conn, batch), args.repeat)
+        print(f"  {'update_overview между пересчетами':40s}{median:8.3f} мс")
+        write_results(conn, batch)
+        conn.close()
+
+        if args.sample:
+            groups = monitoring.get_groups()[:args.sample]
+
+            def old_path():
+                for group_name in groups:
+                    for subgroup in monitoring.get_subgroups(group_name)[1:]:
+                        monitoring.get_subgroup_status_summary(group_name, subgroup)
+
+            median, _ = timings_ms(old_path, 1)
+            print(f"  {'прежний путь, ' + str(len(groups)) + ' групп':40s}{median:8.1f} мс "
+                  f"(~{median * args.groups / len(groups) / 1000:.1f} с на {args.groups})")
+
+
+if __name__ == '__main__':
+    main()
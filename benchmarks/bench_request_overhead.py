@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""Бенчмарк накладных расходов Flask-приложения на один запрос.
+
+Измеряет время запросов /api/groups и статического файла через тестовый
+клиент и проверяет, отправляется ли Set-Cookie на каждый запрос.
+
+Запуск из корня проекта:
+    python benchmarks/bench_request_overhead.py [--requests 2000]
+"""
+
+import argparse
+import logging
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+os.environ.setdefault('REPL_ID', 'local-dev-mode')
+os.environ.setdefault('SESSION_SECRET', 'benchmark-secret')
+
+
+def measure(client, url, requests):
+    """Среднее время запроса (мс) и доля ответов с Set-Cookie."""
+    client.get(url)
+    cookies = 0
+    start = time.perf_counter()
+    for _ in range(requests):
+        response = client.get(url)
+        if 'Set-Cookie' in response.headers:
+            cookies += 1
+        response.close()
+    elapsed = time.perf_counter() - start
+    return elapsed / requests * 1000, cookies / requests
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=2000, help='количество запросов на URL')
+    args = parser.parse_args()
+
+    from main import app
+    logging.disable(logging.CRITICAL)
+    try:
+        from access_log import access_log
+        access_log._engine = None  # не писать журнал доступа во время замера
+    except ImportError:
+        pass
+
+    client = app.test_client()
+    client.get('/')  # получить cookie сессии, как браузер
+    for url in ('/api/groups', '/static/css/custom.css'):
+        ms, cookie_ratio = measure(client, url, args.requests)
+        print(f"{url:28s} {ms:8.3f} мс/запрос, Set-Cookie в {cookie_ratio:5.0%} ответов")
+
+
+if __name__ == '__main__':
+    main()
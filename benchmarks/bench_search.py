@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""Бенчмарк поиска хостов (host_search.py) на 100 тыс. хостов.
+
+Во временной базе загружает инвентарь (inventory.py, индекс строится
+при загрузке), записывает последний результат каждого хоста и замеряет
+время ответа на типичные запросы: адрес целиком, начало адреса, слово
+описания, подгруппа, частые и редкие слова, несколько слов. Отдельно -
+сверка индекса с таблицами групп (sync_index, каждый цикл сборщика) без
+изменений и после правки хоста в обход инвентаря, и открытие нового
+соединения (разбор схемы с таблицами всех групп).
+
+Запуск из корня проекта:
+    python benchmarks/bench_search.py [--groups 10] [--hosts 100000] [--repeat 20]
+"""
+
+import argparse
+import logging
+import os
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import host_search  # noqa: E402
+import inventory  # noqa: E402
+from host_status import update_status  # noqa: E402
+
+QUERIES = [
+    '10.1.134.150',
+    '10.0.1',
+    '10.',
+    'Хост 4242',
+    'Хост',
+    'sg17',
+    'group3 sg4',
+    'коммутатор',
+    'ост 99',
+    'zz',
+]
+
+
+def make_inventory(groups, hosts):
+    rows = []
+    for i in range(hosts):
+        description = f"Хост {i}" if i % 100 else f"Коммутатор доступа {i}"
+        rows.append((f"group{i % groups}", f"10.{(i >> 16) & 255}.{(i >> 8) & 255}.{i & 255}",
+                     description, f"sg{i % 50}", None))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--groups', type=int, default=10)
+    parser.add_argument('--hosts', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+
+    rows = make_inventory(args.groups, args.hosts)
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = sqlite3.connect(os.path.join(tmp, 'monitoring.db'))
+        started = time.perf_counter()
+        inventory.sync_inventory(conn, rows)
+        print(f"Хостов: {args.hosts} в {args.groups} группах, загрузка с индексом "
+              f"{time.perf_counter() - started:.2f} с")
+        update_status(conn, [(group_name, address, '2026-01-01 00:00:00', 'Доступен', 0.01)
+                             for group_name, address, *_ in rows])
+        conn.commit()
+
+        print(f"  {'запрос':24s}{'найдено':>8s}{'медиана, мс':>14s}{'макс., мс':>12s}")
+        for query in QUERIES:
+            timings = []
+            for _ in range(args.repeat):
+                started = time.perf_counter()
+                found, truncated = host_search.search(conn, query)
+                timings.append((time.perf_counter() - started) * 1000)
+            print(f"  {query!r:24s}{len(found):8d}{statistics.median(timings):14.2f}{max(timings):12.2f}"
+                  f"{'  неполный' if truncated else ''}")
+
+        started = time.perf_counter()
+        changed = host_search.sync_index(conn)
+        print(f"  сверка индекса без изменений: {(time.perf_counter() - started) * 1000:.0f} мс, изменено {changed}")
+
+        group_name, address = rows[0][:2]
+        conn.execute(f"UPDATE '{inventory.hosts_table(group_name)}' SET description = 'Изменен вручную' "
+                     f"WHERE address = ?", (address,))
+        conn.commit()
+        started = time.perf_counter()
+        changed = host_search.sync_index(conn)
+        print(f"  сверка после правки одного хоста: {(time.perf_counter() - started) * 1000:.0f} мс, изменено {changed}")
+        assert host_search.search(conn, 'Изменен вручную')[0][0]['address'] == address
+        conn.close()
+
+        timings = []
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            fresh = sqlite3.connect(os.path.join(tmp, 'monitoring.db'))
+            fresh.execute("SELECT COUNT(*) FROM groups").fetchone()
+            fresh.close()
+            timings.append((time.perf_counter() - started) * 1000)
+        print(f"  новое соединение и первый запрос: медиана {statistics.median(timings):.2f} мс")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""Бенчмарк холодного старта: время импорта main и время до первого ответа.
+
+Каждый замер выполняется в отдельном процессе. Результат сравнивается с
+целевыми значениями из benchmarks/startup_target.json; при превышении
+скрипт завершается с кодом 1.
+
+Запуск из корня проекта:
+    python benchmarks/bench_startup.py [--runs 5] [--top 10]
+"""
+
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TARGET_FILE = os.path.join(ROOT, 'benchmarks', 'startup_target.json')
+
+FIRST_REQUEST_SCRIPT = """
+import logging, time
+start = time.perf_counter()
+import main
+imported = time.perf_counter()
+logging.disable(logging.CRITICAL)
+main.app.test_client().get('/api/groups')
+print(f"{(imported - start) * 1000:.1f} {(time.perf_counter() - start) * 1000:.1f}")
+"""
+
+
+def run_python(args):
+    env = dict(os.environ, REPL_ID=os.environ.get('REPL_ID', 'local-dev-mode'))
+    return subprocess.run([sys.executable] + args, cwd=ROOT, env=env,
+                          capture_output=True, text=True, check=True)
+
+
+def import_profile(top):
+    """Самые дорогие модули по накопленному времени импорта (мс)."""
+    result = run_python(['-X', 'importtime', '-c', 'import main'])
+    modules = []
+    for line in result.stderr.splitlines():
+        match = re.match(r'import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)', line)
+        if match and len(match.group(3)) <= 2:
+            modules.append((int(match.group(2)) / 1000, match.group(4)))
+    return sorted(modules, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5, help='количество запусков')
+    parser.add_argument('--top', type=int, default=10, help='сколько модулей показать')
+    args = parser.parse_args()
+
+    import_ms, first_request_ms = [], []
+    for _ in range(args.runs):
+        imported, answered = run_python(['-c', FIRST_REQUEST_SCRIPT]).stdout.split()[-2:]
+        import_ms.append(float(imported))
+        first_request_ms.append(float(answered))
+
+    results = {
+        'import_ms': round(statistics.median(import_ms), 1),
+        'first_request_ms': round(statistics.median(first_request_ms), 1),
+    }
+    print("Самые дорогие импорты верхнего уровня:")
+    for cumulative, module in import_profile(args.top):
+        print(f"  {cumulative:8.1f} мс  {module}")
+    print(f"Импорт main (медиана):         {results['import_ms']:8.1f} мс")
+    print(f"До первого ответа (медиана):   {results['first_request_ms']:8.1f} мс")
+
+    with open(TARGET_FILE) as f:
+        targets = json.load(f)
+    failed = [key for key, value in results.items() if value > targets.get(key, float('inf'))]
+    for key in failed:
+        print(f"Превышена цель {key}: {results[key]} > {targets[key]} мс")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
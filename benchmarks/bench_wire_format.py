@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""Бенчмарк формата ответов /api/ping_history и /api/dashboard: строки и колонки.
+
+Генерирует временную базу (generate_dataset.py) и для каждого эндпоинта
+сравнивает обычный ответ (список объектов) с format=columnar: размер
+тела без сжатия и в gzip, время сериализации в JSON и полное время
+ответа через тестовый клиент Flask.
+
+Запуск из корня проекта:
+    python benchmarks/bench_wire_format.py [--subgroups 10] [--hosts 50] [--days 1] [--interval 60]
+"""
+
+import argparse
+import gzip
+import json
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+os.environ.setdefault('REPL_ID', 'local-dev-mode')
+os.environ.setdefault('SESSION_SECRET', 'benchmark-secret')
+
+
+def median_ms(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - started) * 1000)
+    return statistics.median(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--subgroups', type=int, default=10)
+    parser.add_argument('--hosts', type=int, default=50, help='хостов в подгруппе')
+    parser.add_argument('--days', type=float, default=1)
+    parser.add_argument('--interval', type=int, default=60)
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+
+    import monitoring
+    from access_log import access_log
+    from generate_dataset import generate
+    from main import app
+    logging.disable(logging.CRITICAL)
+    access_log._engine = None  # не писать журнал доступа во время замера
+    client = app.test_client()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        monitoring.MONITORING_DB = os.path.join(tmp, 'monitoring.db')
+        rows = generate(monitoring.MONITORING_DB, 1, args.subgroups, args.hosts, args.days, args.interval)
+        group = monitoring.get_groups()[0]
+        host = monitoring.get_hosts(group)[0]['address']
+        print(f"Результатов: {rows}, хостов: {args.subgroups * args.hosts}")
+
+        cases = [
+            ('ping_history', f'/api/ping_history?group={group}&host={host}',
+             lambda columnar: monitoring.get_ping_history(group, host, columnar=columnar)),
+            ('dashboard', f'/api/dashboard?group={group}',
+             lambda columnar: monitoring.get_dashboard_data(group, columnar=columnar)),
+        ]
+        print(f"{'':26s}{'байт':>10s}{'gzip':>10s}{'json, мс':>11s}{'ответ, мс':>11s}")
+        for name, url, accessor in cases:
+            for columnar in (False, True):
+                suffix = '&format=columnar' if columnar else ''
+                body = client.get(url + suffix).get_data()
+                payload = accessor(columnar)
+                serialize = median_ms(lambda: json.dumps(payload, ensure_ascii=False, separators=(',', ':')),
+                                      args.repeat)
+                response = median_ms(lambda: client.get(url + suffix).close(), args.repeat)
+                title = f"{name}[{'columnar' if columnar else 'rows'}]"
+                print(f"{title:26s}{len(body):10d}{len(gzip.compress(body)):10d}{serialize:11.2f}{response:11.2f}")
+
+
+if __name__ == '__main__':
+    main()
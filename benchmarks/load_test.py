@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+"""Нагрузочный тест: парк экранов NOC, работающих с monitoring.js.
+
+Каждый клиент повторяет последовательность запросов дашборда: начальная
+загрузка (/, /api/groups, /api/subgroups, /api/hosts), переключения
+вкладок (/api/ping_history, /api/dashboard) и периодическое обновление
+текущей вкладки. HTTP-клиент на asyncio без внешних зависимостей,
+работает полностью локально.
+
+Примеры:
+    # запустить сервер на синтетической базе и нагрузить его 200 экранами
+    python benchmarks/load_test.py --start-server --db monitoring_synthetic.db --clients 200 --duration 120
+    # нагрузить уже запущенный сервер
+    python benchmarks/load_test.py --url http://127.0.0.1:5000 --clients 50 --refresh 10
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from urllib.parse import quote, urlsplit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class HTTPConnection:
+    """Минимальный HTTP/1.1 клиент с keep-alive поверх asyncio streams."""
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.reader = None
+        self.writer = None
+        self.cookie = None
+
+    async def get(self, path):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        headers = f"GET {path} HTTP/1.1\r\nHost: {self.host}:{self.port}\r\nAccept: */*\r\n"
+        if self.cookie:
+            headers += f"Cookie: {self.cookie}\r\n"
+        self.writer.write((headers + "\r\n").encode())
+        await self.writer.drain()
+
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise ConnectionError('connection closed')
+        version, status = status_line.split(b' ', 2)[:2]
+        response_headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b'\r\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            response_headers[name.strip().lower()] = value.strip()
+
+        if 'content-length' in response_headers:
+            body = await self.reader.readexactly(int(response_headers['content-length']))
+        elif response_headers.get('transfer-encoding') == 'chunked':
+            body = b''
+            while True:
+                size = int((await self.reader.readline()).split(b';')[0], 16)
+                if size == 0:
+                    await self.reader.readline()
+                    break
+                body += await self.reader.readexactly(size)
+                await self.reader.readline()
+        else:
+            body = await self.reader.read()
+
+        if 'set-cookie' in response_headers:
+            self.cookie = response_headers['set-cookie'].split(';', 1)[0]
+        if version == b'HTTP/1.0' or response_headers.get('connection', '').lower() == 'close' \
+                or 'content-length' not in response_headers and 'transfer-encoding' not in response_headers:
+            await self.close()
+        return int(status), body
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except OSError:
+                pass
+        self.reader = self.writer = None
+
+
+class Stats:
+    def __init__(self):
+        self.latencies = {}
+        self.errors = {}
+
+    def add(self, endpoint, seconds, ok):
+        self.latencies.setdefault(endpoint, []).append(seconds)
+        if not ok:
+            self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+
+    def report(self, elapsed):
+        rows = {}
+        for endpoint, values in sorted(self.latencies.items()):
+            values.sort()
+            pick = lambda q: values[min(len(values) - 1, int(q * len(values)))] * 1000  # noqa: E731
+            rows[endpoint] = {
+                'requests': len(values),
+                'rps': round(len(values) / elapsed, 2),
+                'p50_ms': round(statistics.median(values) * 1000, 2),
+                'p95_ms': round(pick(0.95), 2),
+                'p99_ms': round(pick(0.99), 2),
+                'error_rate': round(self.errors.get(endpoint, 0) / len(values), 4),
+            }
+        return rows
+
+
+class DashboardClient:
+    """Один экран: повторяет поведение MonitoringDashboard из monitoring.js."""
+
+    def __init__(self, host, port, stats, args, rng):
+        self.conn = HTTPConnection(host, port)
+        self.stats = stats
+        self.args = args
+        self.rng = rng
+        self.group = None
+        self.subgroup = 'Все'
+        self.subgroups = ['Все']
+        self.host = None
+        self.tab = 'hosts'
+
+    async def call(self, endpoint, path):
+        started = time.perf_counter()
+        try:
+            status, body = await self.conn.get(path)
+            ok = status < 400
+        except (OSError, ConnectionError, asyncio.IncompleteReadError, ValueError):
+            await self.conn.close()
+            status, body, ok = 0, b'', False
+        self.stats.add(endpoint, time.perf_counter() - started, ok)
+        if ok and endpoint.startswith('/api/'):
+            try:
+                return json.loads(body)
+            except ValueError:
+                return None
+        return None
+
+    def query(self, **params):
+        return '&'.join(f"{k}={quote(str(v))}" for k, v in params.items())
+
+    async def load_tab(self):
+        if not self.group:
+            return
+        if self.tab == 'hosts':
+            data = await self.call('/api/hosts', '/api/hosts?' + self.query(group=self.group, subgroup=self.subgroup))
+            if data and data.get('hosts'):
+                self.host = self.rng.choice(data['hosts'])['address']
+        elif self.tab == 'history' and self.host:
+            await self.call('/api/ping_history', '/api/ping_history?' + self.query(
+                group=self.group, host=self.host, subgroup=self.subgroup))
+        elif self.tab == 'dashboard':
+            await self.call('/api/dashboard', '/api/dashboard?' + self.query(group=self.group, subgroup=self.subgroup))
+
+    async def run(self, deadline):
+        await self.call('/', '/')
+        data = await self.call('/api/groups', '/api/groups')
+        if data and data.get('groups'):
+            self.group = self.rng.choice(data['groups'])
+            data = await self.call('/api/subgroups', '/api/subgroups?' + self.query(group=self.group))
+            if data:
+                self.subgroups = data.get('subgroups', ['Все'])
+        await self.load_tab()
+
+        # несколько переключений вкладок и подгрупп после загрузки
+        for _ in range(self.rng.randint(1, 3)):
+            await asyncio.sleep(self.rng.expovariate(1 / self.args.think))
+            if self.rng.random() < 0.3:
+                self.subgroup = self.rng.choice(self.subgroups)
+                await self.call('/api/hosts', '/api/hosts?' + self.query(group=self.group, subgroup=self.subgroup))
+            self.tab = self.rng.choice(['hosts', 'history', 'dashboard'])
+            await self.load_tab()
+
+        # периодическое обновление текущей вкладки (startAutoRefresh)
+        while True:
+            delay = self.args.refresh * self.rng.uniform(0.9, 1.1)
+            if time.monotonic() + delay > deadline:
+                break
+            await asyncio.sleep(delay)
+            await self.load_tab()
+        await self.conn.close()
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_server(args):
+    port = free_port()
+    env = dict(os.environ, REPL_ID='local-dev-mode',
+               SESSION_SECRET=os.environ.get('SESSION_SECRET', 'load-test-secret'))
+    if args.db:
+        env['MONITORING_DB'] = os.path.abspath(args.db)
+    if args.server == 'gunicorn':
+        command = [sys.executable, '-m', 'gunicorn', '-w', str(args.workers), '--threads', '4',
+                   '-b', f'127.0.0.1:{port}', '--log-level', 'warning', 'main:app']
+    else:
+        command = [sys.executable, '-c',
+                   'import logging; from main import app; logging.disable(logging.INFO); '
+                   f'app.run(host="127.0.0.1", port={port}, threaded=True)']
+    process = subprocess.Popen(command, cwd=ROOT, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    for _ in range(300):
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=0.2):
+                return process, f'http://127.0.0.1:{port}'
+        except OSError:
+            if process.poll() is not None:
+                raise SystemExit('Сервер завершился при запуске')
+            time.sleep(0.1)
+    process.terminate()
+    raise SystemExit('Сервер не запустился за 30 с')
+
+
+async def run_load(args, url):
+    parts = urlsplit(url)
+    stats = Stats()
+    started = time.monotonic()
+    deadline = started + args.duration
+    rng = random.Random(args.seed)
+    tasks = []
+    for i in range(args.clients):
+        client = DashboardClient(parts.hostname, parts.port or 80, stats, args, random.Random(rng.random()))
+        tasks.append(asyncio.create_task(client.run(deadline)))
+        await asyncio.sleep(args.ramp_up / max(1, args.clients))
+    await asyncio.gather(*tasks)
+    return stats.report(time.monotonic() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', default='http://127.0.0.1:5000', help='адрес запущенного сервера')
+    parser.add_argument('--start-server', action='store_true', help='запустить сервер локально')
+    parser.add_argument('--server', choices=['flask', 'gunicorn'], default='flask')
+    parser.add_argument('--workers', type=int, default=4, help='воркеров gunicorn')
+    parser.add_argument('--db', help='база мониторинга для запускаемого сервера')
+    parser.add_argument('--clients', type=int, default=50, help='количество экранов')
+    parser.add_argument('--duration', type=float, default=60, help='длительность теста, с')
+    parser.add_argument('--refresh', type=float, default=30, help='период обновления вкладки, с '
+                        '(в monitoring.js 300)')
+    parser.add_argument('--think', type=float, default=2.0, help='среднее время между действиями, с')
+    parser.add_argument('--ramp-up', type=float, default=5.0, help='время подключения всех клиентов, с')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--json', help='сохранить отчет в JSON')
+    args = parser.parse_args()
+
+    process = None
+    url = args.url
+    if args.start_server:
+        process, url = start_server(args)
+    try:
+        report = asyncio.run(run_load(args, url))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+    print(f"{'Эндпоинт':18s} {'запросов':>9s} {'rps':>8s} {'p50 мс':>9s} {'p95 мс':>9s} {'p99 мс':>9s} {'ошибки':>8s}")
+    for endpoint, row in report.items():
+        print(f"{endpoint:18s} {row['requests']:9d} {row['rps']:8.2f} {row['p50_ms']:9.2f} "
+              f"{row['p95_ms']:9.2f} {row['p99_ms']:9.2f} {row['error_rate']:8.2%}")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'clients': args.clients, 'duration': args.duration, 'endpoints': report}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
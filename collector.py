@@ -0,0 +1,403 @@
+"""Сборщик результатов пинга хостов с самодиагностикой.
+
+Каждый цикл (interval секунд) все хосты из таблиц hosts_<группа>
+проверяются пулом потоков (с учетом зависимостей, см. dependencies.py); результаты через очередь попадают в поток
+записи, который пишет их пакетами (ingest.write_results). По каждому
+циклу сохраняется статистика: запланировано/выполнено проверок, задержка
+старта цикла, незавершенные проверки, глубина очереди записи,
+длительность записи пакетов и скорость записи. Последние циклы хранятся
+в памяти и в кольцевой таблице collector_stats.
+
+Хосты, назначенные удаленным агентам (remote_agents.py, agent.py),
+центральный сборщик не проверяет.
+
+Запуск: python collector.py [--interval 300] [--workers 32] [--once]
+или в процессе веб-приложения при COLLECTOR_ENABLED=1.
+Модуль не зависит от Flask.
+"""
+import argparse
+import logging
+import os
+import platform
+import queue
+import re
+import sqlite3
+import subprocess
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import datetime
+
+import numpy as np
+
+import alerts
+import anomalies
+import host_search
+import ingest
+import monitoring
+import remote_agents
+from dependencies import DOWN, SUPPRESSED, UNKNOWN, UP, DependencyGraph, load_dependencies
+from migrations import ensure_monitoring_schema
+from monitoring import COLLECTOR_INTERVAL, STATUS_DOWN, STATUS_SUPPRESSED, STATUS_UP
+
+_LATENCY_RE = re.compile(r'(?:time|время)[=<]\s*([\d.,]+)\s*(?:ms|мс)')
+_IS_WINDOWS = platform.system() == 'Windows'
+
+
+class ProbeError(Exception):
+    """Проверку не удалось выполнить (это не означает недоступность хоста)."""
+
+
+def probe_host(address, timeout=1.0):
+    """Один ICMP-запрос через системный ping: (статус, задержка в секундах)."""
+    if _IS_WINDOWS:
+        cmd = ['ping', '-n', '1', '-w', str(int(timeout * 1000)), address]
+    else:
+        cmd = ['ping', '-c', '1', '-W', str(max(1, int(round(timeout)))), address]
+    try:
+        result = subprocess.run(cmd, capture_output=True, timeout=timeout + 2)
+    except FileNotFoundError as e:
+        raise ProbeError(f"ping не найден: {e}") from e
+    except subprocess.TimeoutExpired:
+        return STATUS_DOWN, None
+    output = result.stdout.decode(errors='replace')
+    match = _LATENCY_RE.search(output)
+    if result.returncode != 0 or not match:
+        return STATUS_DOWN, None
+    return STATUS_UP, round(float(match.group(1).replace(',', '.')) / 1000, 4)
+
+
+ingest.register_default_processors()
+
+
+def load_targets(conn, include=None):
+    """Список (группа, адрес) по всем таблицам hosts_<группа>.
+
+    include(группа, подгруппа) - необязательный отбор хостов.
+    """
+    targets = []
+    for (group_name,) in conn.execute("SELECT group_name FROM groups").fetchall():
+        table_name = "hosts_" + group_name.replace("'", "''")
+        try:
+            rows = conn.execute(f"SELECT address, subgroup FROM '{table_name}'").fetchall()
+        except sqlite3.Error as e:
+            logging.warning(f"Хосты группы {group_name} не загружены: {e}")
+            continue
+        targets.extend((group_name, address) for address, subgroup in rows
+                       if include is None or include(group_name, subgroup))
+    return targets
+
+
+class Collector:
+    """Планировщик проверок, поток записи и статистика циклов."""
+
+    def __init__(self, db_path=None, interval=COLLECTOR_INTERVAL, workers=32, timeout=1.0,
+                 probe=probe_host, batch_size=500, flush_interval=1.0, stats_retention=1000,
+                 alert_engine=None):
+        self.db_path = db_path or monitoring.MONITORING_DB
+        self.interval = interval
+        self.timeout = timeout
+        self.probe = probe
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.stats_retention = stats_retention
+        self.history = deque(maxlen=stats_retention)
+        self.alerts = alert_engine or alerts.load_engine()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='collector-probe')
+        self._queue = queue.Queue()
+        self._in_flight = set()
+        self._in_flight_lock = threading.Lock()
+        # Счетчики записи, накопленные с начала текущего цикла
+        self._write_lock = threading.Lock()
+        self._rows_written = 0
+        self._flush_seconds = 0.0
+        self._flush_max = 0.0
+        self._failed = 0
+        self._pending = 0
+        self._stop = threading.Event()
+        self._writer = None
+        self._thread = None
+
+    def _connect(self):
+        # Запросы сборщика (в том числе executemany ingest) попадают в гистограммы SQL
+        conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False,
+                               factory=monitoring.MonitoringConnection)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    # --- проверки ---
+
+    def _run_probe(self, group_name, address):
+        """Проверить хост и поставить результат в очередь записи; вернуть статус или None."""
+        try:
+            status, latency = self.probe(address, self.timeout)
+        except Exception as e:
+            with self._write_lock:
+                self._failed += 1
+            logging.debug(f"Проверка {address} не выполнена: {e}")
+            return None
+        else:
+            self._enqueue([(group_name, address, datetime.now().strftime('%Y-%m-%d %H:%M:%S'), status, latency)])
+            return status
+        finally:
+            with self._in_flight_lock:
+                self._in_flight.discard((group_name, address))
+
+    # --- запись ---
+
+    def _enqueue(self, rows):
+        with self._write_lock:
+            self._pending += len(rows)
+        for row in rows:
+            self._queue.put(row)
+
+    def _start_writer(self):
+        if self._writer is None or not self._writer.is_alive():
+            self._writer = threading.Thread(target=self._writer_loop, name='collector-writer', daemon=True)
+            self._writer.start()
+
+    def _next_batch(self):
+        """Пакет из очереди: до batch_size строк или что накопилось за flush_interval."""
+        try:
+            batch = [self._queue.get(timeout=self.flush_interval)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=timeout))
+            except queue.Empty:
+                break
+        return batch
+
+    def _writer_loop(self):
+        conn = self._connect()
+        drained_at = 0.0
+        try:
+            while not (self._stop.is_set() and self._queue.empty()):
+                batch = self._next_batch()
+                if batch:
+                    self._write_batch(conn, batch)
+                if time.monotonic() - drained_at >= self.flush_interval:
+                    drained_at = time.monotonic()
+                    self._drain_agent_inbox(conn)
+        finally:
+            conn.close()
+
+    def _drain_agent_inbox(self, conn):
+        """Записать пакеты удаленных агентов, принятые веб-приложением (agent_inbox)."""
+        try:
+            while remote_agents.drain_inbox(conn):
+                pass
+        except (sqlite3.Error, ValueError) as e:
+            logging.error(f"Ошибка записи пакетов агентов: {e}")
+            conn.rollback()
+
+    def _write_batch(self, conn, batch):
+        start = time.perf_counter()
+        try:
+            ingest.write_results(conn, batch)
+        except sqlite3.Error as e:
+            logging.error(f"Ошибка записи результатов ({len(batch)} строк): {e}")
+            conn.rollback()
+            with self._write_lock:
+                self._pending -= len(batch)
+            return
+        elapsed = time.perf_counter() - start
+        with self._write_lock:
+            self._pending -= len(batch)
+            self._rows_written += len(batch)
+            self._flush_seconds += elapsed
+            self._flush_max = max(self._flush_max, elapsed)
+
+    def _take_write_counters(self):
+        with self._write_lock:
+            counters = (self._rows_written, self._flush_seconds, self._flush_max, self._failed)
+            self._rows_written = 0
+            self._flush_seconds = 0.0
+            self._flush_max = 0.0
+            self._failed = 0
+        return counters
+
+    # --- циклы ---
+
+    def _load_targets(self):
+        """Хосты цикла и зависимости; хосты, назначенные удаленным агентам, пропускаются."""
+        conn = self._connect()
+        try:
+            targets = load_targets(conn, lambda group_name, subgroup:
+                                   remote_agents.registry.owner(group_name, subgroup) is None)
+            dependencies = load_dependencies(conn)
+            # Правки хостов в обход инвентаря попадают в поиск хостов
+            try:
+                host_search.sync_index(conn)
+            except sqlite3.Error as e:
+                logging.warning(f"Индекс поиска хостов не обновлен: {e}")
+            if self.alerts.rules:
+                self.alerts.load_hosts(conn)
+        finally:
+            conn.close()
+        return targets, dependencies
+
+    def run_cycle(self, scheduled_at=None, deadline=None):
+        """Один цикл проверок; возвращает статистику цикла."""
+        started = time.time()
+        scheduled_at = scheduled_at or started
+        deadline = deadline or started + self.interval
+        self._start_writer()
+
+        targets, dependencies = self._load_targets()
+        graph = DependencyGraph(targets, dependencies)
+
+        # Проверка по уровням зависимостей: потомки недоступного хоста не
+        # проверяются, а записываются как подавленные. Без зависимостей
+        # все хосты находятся на одном уровне.
+        state = np.full(len(targets), UNKNOWN, dtype=np.int8)
+        futures = {}
+        suppressed = 0
+        for level in range(len(graph.levels)):
+            to_probe, to_suppress = graph.split_level(level, state)
+            if len(to_suppress):
+                state[to_suppress] = SUPPRESSED
+                suppressed += len(to_suppress)
+                timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+                self._enqueue([(*targets[i], timestamp, STATUS_SUPPRESSED, None) for i in to_suppress.tolist()])
+
+            # Хосты, проверка которых не завершилась с прошлого цикла, не планируются повторно
+            with self._in_flight_lock:
+                to_probe = [i for i in to_probe.tolist() if targets[i] not in self._in_flight]
+                self._in_flight.update(targets[i] for i in to_probe)
+            level_futures = {self._executor.submit(self._run_probe, *targets[i]): i for i in to_probe}
+            futures.update(level_futures)
+            done, _ = wait(level_futures, timeout=max(0.0, deadline - time.time()))
+            for future in done:
+                # stop() отменяет еще не начатые проверки
+                status = None if future.cancelled() else future.result()
+                state[level_futures[future]] = UP if status == STATUS_UP else DOWN if status == STATUS_DOWN \
+                    else UNKNOWN
+
+        # Дождаться записи результатов этого цикла, но не дольше дедлайна
+        while self._pending and time.time() < deadline:
+            time.sleep(0.05)
+
+        rows_written, flush_seconds, flush_max, failed = self._take_write_counters()
+        duration = time.time() - started
+        stats = {
+            'cycle_start': datetime.fromtimestamp(started).strftime('%Y-%m-%d %H:%M:%S'),
+            'scheduled': len(futures),
+            'completed': sum(1 for f in futures if f.done() and not f.cancelled() and f.result() is not None),
+            'failed': failed,
+            'suppressed': suppressed,
+            'outstanding': sum(1 for f in futures if not f.done()),
+            'lag_ms': round(max(0.0, started - scheduled_at) * 1000, 1),
+            'queue_depth': self._queue.qsize(),
+            'flush_ms': round(flush_max * 1000, 1),
+            'rows_written': rows_written,
+            'rows_per_sec': round(rows_written / flush_seconds, 1) if flush_seconds else 0.0,
+            'duration_ms': round(duration * 1000, 1),
+        }
+        self.history.append(stats)
+        self._save_stats(stats)
+        if stats['outstanding'] or stats['lag_ms'] > self.interval * 1000 / 10:
+            logging.warning(f"Сборщик отстает: {stats}")
+        return stats
+
+    def _save_stats(self, stats):
+        conn = self._connect()
+        try:
+            conn.execute(
+                "INSERT INTO collector_stats (cycle_start, scheduled, completed, failed, suppressed, outstanding, "
+                "lag_ms, queue_depth, flush_ms, rows_written, rows_per_sec, duration_ms) "
+                "VALUES (:cycle_start, :scheduled, :completed, :failed, :suppressed, :outstanding, :lag_ms, "
+                ":queue_depth, :flush_ms, :rows_written, :rows_per_sec, :duration_ms)",
+                stats
+            )
+            # Кольцевой буфер: хранятся только последние stats_retention циклов
+            conn.execute("DELETE FROM collector_stats WHERE id <= (SELECT MAX(id) FROM collector_stats) - ?",
+                         (self.stats_retention,))
+            conn.commit()
+        except sqlite3.Error as e:
+            logging.error(f"Ошибка сохранения статистики сборщика: {e}")
+        finally:
+            conn.close()
+
+    def prepare(self):
+        """Проверить схему monitoring.db и загрузить базовые линии задержки."""
+        conn = self._connect()
+        try:
+            ensure_monitoring_schema(conn)
+            ingest.register_processor(self.alerts.process)
+            if os.path.exists(anomalies.state_path(self.db_path)):
+                anomalies.baselines.load(anomalies.state_path(self.db_path))
+            else:
+                anomalies.warm_up(conn)
+        finally:
+            conn.close()
+
+    def save_state(self):
+        try:
+            with anomalies.baselines.lock:
+                anomalies.baselines.save(anomalies.state_path(self.db_path))
+        except OSError as e:
+            logging.error(f"Не удалось сохранить базовые линии задержки: {e}")
+
+    def run_forever(self):
+        self.prepare()
+        scheduled_at = time.time()
+        while not self._stop.is_set():
+            deadline = scheduled_at + self.interval
+            try:
+                self.run_cycle(scheduled_at, deadline)
+                self.save_state()
+            except Exception as e:
+                logging.error(f"Ошибка цикла сборщика: {e}")
+            # Полностью пропущенные слоты не навёрстываются; опоздание учитывается в lag_ms
+            scheduled_at += self.interval
+            now = time.time()
+            while scheduled_at + self.interval <= now:
+                scheduled_at += self.interval
+            self._stop.wait(max(0.0, scheduled_at - now))
+
+    def start(self):
+        """Запустить сборщик в фоновом потоке текущего процесса."""
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self.run_forever, name='collector', daemon=True)
+            self._thread.start()
+
+    def stop(self, wait_writer=True):
+        self._stop.set()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        if wait_writer and self._writer is not None:
+            self._writer.join(timeout=self.flush_interval * 2 + 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Сборщик результатов пинга хостов')
+    parser.add_argument('--db', default=monitoring.MONITORING_DB)
+    parser.add_argument('--interval', type=int, default=COLLECTOR_INTERVAL)
+    parser.add_argument('--workers', type=int, default=32)
+    parser.add_argument('--timeout', type=float, default=1.0)
+    parser.add_argument('--once', action='store_true', help='выполнить один цикл и выйти')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    collector = Collector(args.db, args.interval, args.workers, args.timeout)
+    if args.once:
+        collector.prepare()
+        print(collector.run_cycle())
+        collector.stop()
+        collector.save_state()
+    else:
+        try:
+            collector.run_forever()
+        except KeyboardInterrupt:
+            collector.stop()
+            collector.save_state()
+
+
+if __name__ == '__main__':
+    main()
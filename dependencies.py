@@ -0,0 +1,123 @@
+"""Зависимости между хостами (родитель - потомок) для подавления проверок.
+
+Родитель хоста (например, маршрутизатор подгруппы) хранится в таблице
+host_dependencies рядом с таблицами hosts_<группа>. Перед циклом сборщик
+строит DependencyGraph: номер родителя и глубину каждого хоста. Хосты
+проверяются по уровням глубины; если родитель недоступен, его потомки не
+проверяются и записываются как 'Недоступен (подавлен)'.
+
+Загрузка зависимостей из CSV (группа,адрес,родитель; пустой родитель -
+удалить зависимость):
+    python dependencies.py import deps.csv [--db monitoring.db]
+"""
+import argparse
+import csv
+import logging
+import sqlite3
+
+import numpy as np
+
+import monitoring
+from migrations import ensure_monitoring_schema
+
+UNKNOWN, UP, DOWN, SUPPRESSED = 0, 1, 2, 3
+
+
+def load_dependencies(conn):
+    """{(группа, адрес): (группа, адрес родителя)}."""
+    try:
+        rows = conn.execute("SELECT group_name, address, parent FROM host_dependencies").fetchall()
+    except sqlite3.OperationalError:
+        return {}
+    return {(group_name, address): (group_name, parent) for group_name, address, parent in rows}
+
+
+def save_dependencies(conn, rows):
+    """Записать зависимости [(группа, адрес, родитель или None)]; возвращает число строк."""
+    conn.executemany(
+        "INSERT OR REPLACE INTO host_dependencies (group_name, address, parent) VALUES (?, ?, ?)",
+        [row for row in rows if row[2]]
+    )
+    conn.executemany(
+        "DELETE FROM host_dependencies WHERE group_name = ? AND address = ?",
+        [row[:2] for row in rows if not row[2]]
+    )
+    conn.commit()
+    return len(rows)
+
+
+class DependencyGraph:
+    """Предвычисленный граф достижимости для списка хостов.
+
+    parent[i] - номер родителя (-1 для корней и хостов, чей родитель не
+    опрашивается), depth[i] - глубина в дереве. Циклы в зависимостях
+    разрываются: такие хосты считаются корнями.
+    """
+
+    def __init__(self, targets, dependencies):
+        self.targets = list(targets)
+        index = {target: i for i, target in enumerate(self.targets)}
+        self.parent = np.array([index.get(dependencies.get(target), -1) for target in self.targets],
+                               dtype=np.int64).reshape(-1)
+        self.depth, cyclic = self._walk()
+        if cyclic.any():
+            logging.warning(f"Циклические зависимости у {int(cyclic.sum())} хостов, они проверяются как корни")
+            self.parent[cyclic] = -1
+            self.depth, _ = self._walk()
+        self.levels = [np.flatnonzero(self.depth == level) for level in range(int(self.depth.max(initial=0)) + 1)]
+
+    def _walk(self):
+        """Глубина: подъем по родителям всех хостов одновременно.
+
+        Возвращает глубины и маску хостов, не дошедших до корня (циклы).
+        """
+        depth = np.zeros(len(self.targets), dtype=np.int64)
+        ancestor = self.parent.copy()
+        for _ in range(len(self.targets)):
+            active = ancestor >= 0
+            if not active.any():
+                break
+            depth[active] += 1
+            ancestor[active] = self.parent[ancestor[active]]
+        return depth, ancestor >= 0
+
+    @property
+    def has_dependencies(self):
+        return len(self.levels) > 1
+
+    def split_level(self, level, state):
+        """Хосты уровня: (проверяемые, подавленные) по состоянию родителей."""
+        hosts = self.levels[level]
+        parents = self.parent[hosts]
+        parent_state = np.where(parents >= 0, state[np.maximum(parents, 0)], UP)
+        suppressed = (parent_state == DOWN) | (parent_state == SUPPRESSED)
+        return hosts[~suppressed], hosts[suppressed]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Зависимости между хостами')
+    parser.add_argument('command', choices=['import', 'export'])
+    parser.add_argument('path', help='CSV: группа,адрес,родитель')
+    parser.add_argument('--db', default=monitoring.MONITORING_DB)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    conn = sqlite3.connect(args.db)
+    try:
+        ensure_monitoring_schema(conn)
+        if args.command == 'import':
+            with open(args.path, newline='', encoding='utf-8') as f:
+                rows = [(row[0].strip(), row[1].strip(), row[2].strip() or None if len(row) > 2 else None)
+                        for row in csv.reader(f) if len(row) >= 2 and not row[0].startswith('#')]
+            print(f"Загружено зависимостей: {save_dependencies(conn, rows)}")
+        else:
+            with open(args.path, 'w', newline='', encoding='utf-8') as f:
+                writer = csv.writer(f)
+                for (group_name, address), (_, parent) in sorted(load_dependencies(conn).items()):
+                    writer.writerow([group_name, address, parent])
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
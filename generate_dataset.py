@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""Генератор синтетической базы мониторинга для нагрузочных замеров.
+
+Создает базу со схемой monitoring.db: группы x подгруппы x хосты и
+результаты пингов за заданное число дней. В данных есть одиночные потери
+пакетов, простои отдельных хостов, аварии целых подгрупп и всплески
+задержки.
+
+Пример:
+    python generate_dataset.py --db bench.db --groups 3 --subgroups 5 --hosts 40 --days 7
+"""
+
+import argparse
+import os
+import sqlite3
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+import host_search
+import overview
+from availability import backfill_counters
+from host_status import backfill_status
+from incidents import backfill_incidents
+from inventory import HOSTS_SCHEMA
+from migrations import migrate_monitoring_db
+from monitoring import STATUS_DOWN, STATUS_UP
+
+SUBGROUP_NAMES = ['web', 'database', 'network', 'cache', 'storage', 'dns', 'mail', 'backup', 'vpn', 'monitoring']
+
+
+def random_intervals(rng, slots, rate, min_len, max_len):
+    """Маска слотов, попавших в случайные интервалы (число интервалов ~ Пуассон)."""
+    mask = np.zeros(slots, dtype=bool)
+    for _ in range(rng.poisson(rate)):
+        start = rng.integers(0, slots)
+        mask[start:start + rng.integers(min_len, max_len + 1)] = True
+    return mask
+
+
+def generate(db_path, groups=1, subgroups=4, hosts=10, days=1, interval=300,
+             outage_rate=0.5, subgroup_outage_rate=0.2, spike_rate=1.0, loss=0.002,
+             end=None, seed=42):
+    """Создать базу и вернуть количество записанных результатов пингов."""
+    rng = np.random.default_rng(seed)
+    end = end or datetime.now().replace(microsecond=0)
+    slots = max(1, int(days * 86400 // interval))
+    start = end - timedelta(seconds=interval * (slots - 1))
+    timestamps = [(start + timedelta(seconds=interval * i)).strftime('%Y-%m-%d %H:%M:%S')
+                  for i in range(slots)]
+    per_day = 86400 / interval
+
+    conn = sqlite3.connect(db_path)
+    migrate_monitoring_db(conn)
+    total = 0
+    for g in range(groups):
+        group_name = f"group{g + 1}"
+        table = f"hosts_{group_name}"
+        conn.execute("INSERT OR IGNORE INTO groups (group_name) VALUES (?)", (group_name,))
+        conn.execute(HOSTS_SCHEMA.format(table=table))
+
+        addresses, statuses, latencies, host_rows = [], [], [], []
+        for sg in range(subgroups):
+            subgroup = SUBGROUP_NAMES[sg % len(SUBGROUP_NAMES)] + ('' if sg < len(SUBGROUP_NAMES) else str(sg))
+            # авария всей подгруппы (например, отказ коммутатора)
+            subgroup_down = random_intervals(rng, slots, subgroup_outage_rate * days, 2, int(per_day / 12) + 2)
+            for h in range(hosts):
+                value = 0x0A000000 + (g * subgroups + sg) * hosts + h + 1  # 10.0.0.1 и далее
+                address = f"{value >> 24}.{value >> 16 & 255}.{value >> 8 & 255}.{value & 255}"
+                host_rows.append((address, f"{subgroup.capitalize()} host {h + 1}", subgroup))
+                down = subgroup_down | random_intervals(rng, slots, outage_rate * days, 1, int(per_day / 6) + 1)
+                down |= rng.random(slots) < loss
+                base = rng.lognormal(mean=np.log(0.01), sigma=0.6)
+                latency = base * rng.lognormal(mean=0, sigma=0.2, size=slots)
+                spikes = random_intervals(rng, slots, spike_rate * days, 1, int(per_day / 24) + 1)
+                latency[spikes] *= rng.uniform(5, 20)
+                addresses.append(address)
+                statuses.append(down)
+                latencies.append(np.round(latency, 4))
+
+        conn.executemany(f"INSERT OR REPLACE INTO '{table}' (address, description, subgroup) VALUES (?, ?, ?)",
+                         host_rows)
+        # запись в порядке времени, как это делает сборщик
+        for i, ts in enumerate(timestamps):
+            conn.executemany(
+                "INSERT INTO ping_results (group_name, address, timestamp, status, latency) VALUES (?, ?, ?, ?, ?)",
+                [(group_name, address, ts, STATUS_DOWN, None) if down[i]
+                 else (group_name, address, ts, STATUS_UP, float(latency[i]))
+                 for address, down, latency in zip(addresses, statuses, latencies)]
+            )
+        total += slots * len(addresses)
+        conn.commit()
+    # производные таблицы строятся по готовой истории, как при миграции
+    backfill_incidents(conn)
+    backfill_counters(conn)
+    backfill_status(conn)
+    host_search.rebuild(conn)
+    overview.refresh_overview(conn)
+    conn.commit()
+    conn.close()
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--db', default='monitoring_synthetic.db', help='путь к создаваемой базе')
+    parser.add_argument('--groups', type=int, default=1)
+    parser.add_argument('--subgroups', type=int, default=4, help='подгрупп в группе')
+    parser.add_argument('--hosts', type=int, default=10, help='хостов в подгруппе')
+    parser.add_argument('--days', type=float, default=1, help='глубина истории в днях')
+    parser.add_argument('--interval', type=int, default=300, help='интервал опроса, секунд')
+    parser.add_argument('--outage-rate', type=float, default=0.5, help='простоев хоста в сутки')
+    parser.add_argument('--subgroup-outage-rate', type=float, default=0.2, help='аварий подгруппы в сутки')
+    parser.add_argument('--spike-rate', type=float, default=1.0, help='всплесков задержки в сутки на хост')
+    parser.add_argument('--loss', type=float, default=0.002, help='вероятность одиночной потери')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--force', action='store_true', help='перезаписать существующую базу')
+    args = parser.parse_args()
+
+    if os.path.exists(args.db):
+        if not args.force:
+            parser.error(f"{args.db} уже существует (используйте --force)")
+        os.remove(args.db)
+
+    started = time.perf_counter()
+    rows = generate(args.db, args.groups, args.subgroups, args.hosts, args.days, args.interval,
+                    args.outage_rate, args.subgroup_outage_rate, args.spike_rate, args.loss, seed=args.seed)
+    print(f"{args.db}: {args.groups * args.subgroups * args.hosts} хостов, {rows} результатов "
+          f"за {time.perf_counter() - started:.1f} с")
+
+
+if __name__ == '__main__':
+    main()
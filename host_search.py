@@ -0,0 +1,294 @@
+"""Полнотекстовый поиск хостов по всем группам (SQLite FTS5).
+
+host_index - общий список хостов всех групп (группа, адрес, описание,
+подгруппа). host_search - индекс FTS5 с токенизатором trigram над
+host_index (external content), его обновляют триггеры host_index.
+
+host_index обновляют те, кто меняет хосты: синхронизация инвентаря
+(upsert_hosts, remove_hosts, remove_group) и generate_dataset.py
+(rebuild). Правки таблиц hosts_<группа> в обход инвентаря подхватывает
+sync_index: сборщик вызывает его каждый цикл. Триггеров на таблицах групп
+нет намеренно: схема с сотнями групп разбирается при каждом новом
+соединении, и три триггера на группу (500 групп) добавляли к нему ~20 мс.
+"""
+import logging
+import sqlite3
+from contextlib import contextmanager, nullcontext
+
+SEARCH_LIMIT = 50
+# Сколько совпадений FTS5 ранжируется для ответа
+SEARCH_CANDIDATES = 500
+# С какого числа изменяемых хостов индекс FTS5 перестраивается целиком: построчное
+# обновление из триггеров стоит 40-200 мкс на хост, перестроение 100 тыс. хостов ~0,6 с
+BULK_THRESHOLD = 2000
+# Слова короче трех символов trigram не ищет, они проверяются по кандидатам
+MIN_TERM = 3
+
+SEARCH_SCHEMA = """
+CREATE TABLE IF NOT EXISTS host_index (
+    id INTEGER PRIMARY KEY,
+    group_name TEXT NOT NULL,
+    address TEXT NOT NULL,
+    description TEXT,
+    subgroup TEXT,
+    UNIQUE (group_name, address)
+);
+CREATE INDEX IF NOT EXISTS ix_host_index_address ON host_index (address COLLATE NOCASE);
+CREATE VIRTUAL TABLE IF NOT EXISTS host_search USING fts5(
+    address, description, subgroup, group_name,
+    content='host_index', content_rowid='id', tokenize='trigram'
+);
+"""
+
+INDEX_TRIGGERS = """
+CREATE TRIGGER IF NOT EXISTS host_index_ai AFTER INSERT ON host_index BEGIN
+    INSERT INTO host_search (rowid, address, description, subgroup, group_name)
+    VALUES (new.id, new.address, new.description, new.subgroup, new.group_name);
+END;
+CREATE TRIGGER IF NOT EXISTS host_index_ad AFTER DELETE ON host_index BEGIN
+    INSERT INTO host_search (host_search, rowid, address, description, subgroup, group_name)
+    VALUES ('delete', old.id, old.address, old.description, old.subgroup, old.group_name);
+END;
+CREATE TRIGGER IF NOT EXISTS host_index_au AFTER UPDATE ON host_index BEGIN
+    INSERT INTO host_search (host_search, rowid, address, description, subgroup, group_name)
+    VALUES ('delete', old.id, old.address, old.description, old.subgroup, old.group_name);
+    INSERT INTO host_search (rowid, address, description, subgroup, group_name)
+    VALUES (new.id, new.address, new.description, new.subgroup, new.group_name);
+END;
+"""
+
+
+def _execute_script(conn, script):
+    """Выполнить несколько операторов без executescript (он фиксирует открытую транзакцию)."""
+    statement = ''
+    for line in script.splitlines(keepends=True):
+        statement += line
+        if sqlite3.complete_statement(statement):
+            conn.execute(statement)
+            statement = ''
+
+
+def create_schema(conn):
+    _execute_script(conn, SEARCH_SCHEMA + INDEX_TRIGGERS)
+
+
+@contextmanager
+def bulk_update(conn):
+    """Массовое изменение хостов: индекс FTS5 перестраивается один раз в конце.
+
+    Триггеры host_index на время изменений удаляются и создаются заново в
+    той же транзакции, поэтому при откате индекс не меняется.
+    """
+    for name in ('host_index_ai', 'host_index_ad', 'host_index_au'):
+        conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+    yield
+    conn.execute("INSERT INTO host_search (host_search) VALUES ('rebuild')")
+    _execute_script(conn, INDEX_TRIGGERS)
+
+
+def _hosts_table(group_name):
+    return "hosts_" + group_name.replace("'", "''")
+
+
+def upsert_hosts(conn, group_name, hosts):
+    """Добавить или обновить хосты группы в индексе: hosts - [(адрес, описание, подгруппа)]."""
+    conn.executemany("""
+        INSERT INTO host_index (group_name, address, description, subgroup) VALUES (?, ?, ?, ?)
+        ON CONFLICT (group_name, address) DO UPDATE SET
+            description = excluded.description, subgroup = excluded.subgroup
+    """, [(group_name, address, description, subgroup) for address, description, subgroup in hosts])
+
+
+def remove_hosts(conn, group_name, addresses):
+    conn.executemany("DELETE FROM host_index WHERE group_name = ? AND address = ?",
+                     [(group_name, address) for address in addresses])
+
+
+def remove_group(conn, group_name):
+    conn.execute("DELETE FROM host_index WHERE group_name = ?", (group_name,))
+
+
+def _index_group(conn, group_name):
+    """Заново проиндексировать все хосты группы."""
+    remove_group(conn, group_name)
+    conn.execute(f"INSERT INTO host_index (group_name, address, description, subgroup) "
+                 f"SELECT ?, address, description, subgroup FROM '{_hosts_table(group_name)}'", (group_name,))
+
+
+def _group_changes(conn, group_name):
+    """Расхождения индекса с таблицей группы: ([(адрес, описание, подгруппа)], [адрес])."""
+    table = _hosts_table(group_name)
+    changed = conn.execute(
+        f"SELECT address, description, subgroup FROM '{table}' "
+        f"EXCEPT SELECT address, description, subgroup FROM host_index WHERE group_name = ?",
+        (group_name,)
+    ).fetchall()
+    removed = [address for (address,) in conn.execute(
+        f"SELECT address FROM host_index WHERE group_name = ? EXCEPT SELECT address FROM '{table}'",
+        (group_name,)
+    )]
+    return changed, removed
+
+
+def sync_index(conn):
+    """Привести индекс в соответствие с таблицами групп; возвращает число измененных хостов.
+
+    Нужен только для правок в обход инвентаря, поэтому изменения
+    обычно пусты и сводятся к сравнению таблиц.
+    """
+    changes = {}
+    group_names = [name for (name,) in conn.execute(
+        "SELECT g.group_name FROM groups g JOIN sqlite_master m ON m.type = 'table' AND m.name = 'hosts_' || g.group_name"
+    ).fetchall()]
+    for group_name in group_names:
+        changed, removed = _group_changes(conn, group_name)
+        if changed or removed:
+            changes[group_name] = (changed, removed)
+    removed_groups = conn.execute(
+        "DELETE FROM host_index WHERE group_name NOT IN (SELECT group_name FROM groups)").rowcount
+    total = sum(len(changed) + len(removed) for changed, removed in changes.values())
+    if total and not conn.in_transaction:
+        conn.execute("BEGIN IMMEDIATE")
+    with bulk_update(conn) if total >= BULK_THRESHOLD else nullcontext():
+        for group_name, (changed, removed) in changes.items():
+            upsert_hosts(conn, group_name, changed)
+            remove_hosts(conn, group_name, removed)
+    conn.commit()
+    if total or removed_groups:
+        logging.info(f"Поиск хостов: индекс обновлен по таблицам групп, хостов {total + removed_groups}")
+    return total + removed_groups
+
+
+def rebuild(conn):
+    """Перестроить индекс по таблицам всех групп."""
+    with bulk_update(conn):
+        conn.execute("DELETE FROM host_index")
+        for (group_name,) in conn.execute("SELECT group_name FROM groups").fetchall():
+            try:
+                _index_group(conn, group_name)
+            except sqlite3.OperationalError as e:
+                logging.warning(f"Поиск хостов: группа {group_name} не проиндексирована: {e}")
+    total = conn.execute("SELECT COUNT(*) FROM host_index").fetchone()[0]
+    conn.commit()
+    logging.info(f"Поиск хостов: проиндексировано {total}")
+    return total
+
+
+def _match_expression(terms):
+    """Выражение MATCH: каждое слово - фраза (подстрока для trigram), все слова обязательны."""
+    return ' '.join('"' + term.replace('"', '""') + '"' for term in terms)
+
+
+def _score(row, terms):
+    """Релевантность: совпадение с адресом важнее совпадения с описанием, подгруппой и группой."""
+    group_name, address, description, subgroup = (str(value or '').lower() for value in row[:4])
+    score = 0
+    for term in terms:
+        if address == term:
+            score += 100
+        elif address.startswith(term):
+            score += 50
+        elif term in address:
+            score += 20
+        elif description.startswith(term) or f" {term}" in description:
+            score += 10
+        elif term in description:
+            score += 5
+        elif term in subgroup or term in group_name:
+            score += 2
+    return score
+
+
+def _like_pattern(term, prefix_only=False):
+    """Шаблон LIKE для term в начале или в любом месте строки (ESCAPE '\\')."""
+    escaped = term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return escaped + '%' if prefix_only else '%' + escaped + '%'
+
+
+def search(conn, query, limit=SEARCH_LIMIT):
+    """Хосты по запросу в порядке релевантности с последним результатом проверки.
+
+    Возвращает (хосты, truncated). Слова запроса ищутся как подстроки в
+    адресе, описании, подгруппе и имени группы (все слова обязательны).
+    Кандидаты - адреса, начинающиеся с первого слова (индекс host_index),
+    и до SEARCH_CANDIDATES совпадений FTS5 (короткие слова проверяются
+    там же через LIKE); они упорядочиваются в Python (_score). Если
+    совпадений FTS5 больше, к ним добавляются хосты с адресом, равным
+    слову, и до SEARCH_CANDIDATES совпадений слова с адресом - они
+    ранжируются выше всего. Сортировка всех совпадений по bm25 на 100 тыс.
+    хостов занимает 100-200 мс для частых слов вроде "host", отбор
+    кандидатов - единицы. truncated - совпадений было больше, чем
+    ранжировалось, и часть подходящих хостов могла не попасть в ответ.
+    """
+    terms = [term.lower() for term in query.split()]
+    if not terms:
+        return [], False
+    select = "SELECT i.group_name, i.address, i.description, i.subgroup FROM "
+    candidates = conn.execute(
+        select + "host_index i WHERE i.address LIKE ? ESCAPE '\\' ORDER BY i.address COLLATE NOCASE LIMIT ?",
+        (_like_pattern(terms[0], prefix_only=True), SEARCH_CANDIDATES)
+    ).fetchall()
+    truncated = len(candidates) >= SEARCH_CANDIDATES
+    long_terms = [term for term in terms if len(term) >= MIN_TERM]
+    if long_terms:
+        # LIKE в SQLite без учета регистра только для ASCII, остальные короткие слова проверяются ниже
+        short_terms = [term for term in terms if len(term) < MIN_TERM and term.isascii()]
+        fts = (select + "(SELECT rowid FROM host_search WHERE host_search MATCH ? LIMIT ?) m "
+                        "JOIN host_index i ON i.id = m.rowid" if not short_terms else
+               select + "host_search m JOIN host_index i ON i.id = m.rowid WHERE host_search MATCH ?"
+               + " AND (i.address || ' ' || IFNULL(i.description, '') || ' ' || IFNULL(i.subgroup, '') || ' ' "
+                 "|| i.group_name) LIKE ? ESCAPE '\\'" * len(short_terms) + " LIMIT ?")
+        short_patterns = [_like_pattern(term) for term in short_terms]
+
+        def matches(expression, limit):
+            if short_terms:
+                return conn.execute(fts, (expression, *short_patterns, limit)).fetchall()
+            return conn.execute(fts, (expression, limit)).fetchall()
+
+        fts_rows = matches(_match_expression(long_terms), SEARCH_CANDIDATES + 1)
+        # Все совпадения FTS5 включают и все адреса с префиксом первого слова
+        truncated = len(fts_rows) > SEARCH_CANDIDATES
+        candidates += fts_rows[:SEARCH_CANDIDATES]
+        if truncated:
+            # Совпадения с адресом ранжируются выше (_score), поэтому при усечении
+            # они отбираются отдельно: адрес целиком, затем слово в адресе
+            candidates += conn.execute(
+                select + f"host_index i WHERE i.address COLLATE NOCASE IN ({', '.join('?' * len(terms))})",
+                terms
+            ).fetchall()
+            for term in long_terms:
+                others = [other for other in long_terms if other != term]
+                candidates += matches('{address} : ' + _match_expression([term] + others), SEARCH_CANDIDATES)
+
+    found = {}
+    for row in candidates:
+        if row[:2] in found:
+            continue
+        haystack = ' '.join(str(value or '') for value in row).lower()
+        if all(term in haystack for term in terms):
+            found[row[:2]] = (_score(row, terms), row)
+    ranked = sorted(found.values(), key=lambda item: (-item[0], len(item[1][1]), item[1][1], item[1][0]))
+    ranked = [row for _, row in ranked[:limit]]
+
+    # Последний результат только для отобранных хостов
+    statuses = {}
+    if ranked:
+        placeholders = ', '.join(['(?, ?)'] * len(ranked))
+        statuses = {(group_name, address): rest for group_name, address, *rest in conn.execute(
+            f"SELECT s.group_name, s.address, s.status, s.timestamp, s.latency FROM (VALUES {placeholders}) v "
+            f"JOIN host_status s ON s.group_name = v.column1 AND s.address = v.column2",
+            [value for row in ranked for value in row[:2]]
+        )}
+    results = []
+    for group_name, address, description, subgroup in ranked:
+        status, timestamp, latency = statuses.get((group_name, address), (None, None, None))
+        results.append({
+            'group': group_name,
+            'address': address,
+            'description': description,
+            'subgroup': subgroup or 'нет',
+            'status': status,
+            'timestamp': timestamp,
+            'latency': latency,
+        })
+    return results, truncated
@@ -0,0 +1,39 @@
+"""Последний результат проверки каждого хоста.
+
+Таблица host_status хранит по строке на хост (время, статус, задержка
+последней проверки), поэтому текущее состояние любого числа хостов
+читается без поиска по ping_results. update_status обновляет ее при
+записи результатов (обработчик ingest), backfill_status строит по
+истории.
+"""
+import logging
+
+
+def update_status(conn, rows):
+    """Обработчик ingest: запомнить самый новый результат каждого хоста пакета."""
+    latest = {}
+    for group_name, address, timestamp, status, latency in rows:
+        current = latest.get((group_name, address))
+        if current is None or timestamp >= current[2]:
+            latest[(group_name, address)] = (group_name, address, timestamp, status, latency)
+    # Опоздавший результат (например, из очереди агента) не заменяет более новый
+    conn.executemany("""
+        INSERT INTO host_status (group_name, address, timestamp, status, latency) VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT (group_name, address) DO UPDATE SET
+            timestamp = excluded.timestamp, status = excluded.status, latency = excluded.latency
+        WHERE excluded.timestamp >= host_status.timestamp
+    """, list(latest.values()))
+
+
+def backfill_status(conn):
+    """Перестроить host_status по ping_results."""
+    conn.execute("DELETE FROM host_status")
+    # Для MAX() SQLite берет остальные столбцы из строки с максимумом
+    conn.execute("""
+        INSERT INTO host_status (group_name, address, timestamp, status, latency)
+        SELECT group_name, address, MAX(timestamp), status, latency FROM ping_results GROUP BY group_name, address
+    """)
+    total = conn.execute("SELECT COUNT(*) FROM host_status").fetchone()[0]
+    conn.commit()
+    logging.info(f"Последние результаты хостов перестроены: {total}")
+    return total
@@ -0,0 +1,127 @@
+"""Инциденты недоступности хостов, выделяемые из ping_results.
+
+Инцидент - непрерывная серия результатов 'Недоступен' одного хоста:
+started_at - время первой неудачной проверки, ended_at - время первой
+успешной проверки после нее (NULL, пока хост недоступен), failed_probes -
+число неудачных проверок в серии.
+
+update_incidents обновляет таблицу при каждой записи результатов
+(обработчик ingest), backfill_incidents заново строит ее по всей
+истории векторно (NumPy).
+"""
+import logging
+from datetime import datetime
+
+import numpy as np
+
+from monitoring import STATUS_DOWN, STATUS_SUPPRESSED
+
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+def _seconds_between(start, end):
+    return (datetime.strptime(end, TIMESTAMP_FORMAT) - datetime.strptime(start, TIMESTAMP_FORMAT)).total_seconds()
+
+
+def update_incidents(conn, rows):
+    """Обработчик ingest: открыть, продлить или закрыть инциденты по пакету.
+
+    rows - кортежи (group_name, address, timestamp, status, latency) в
+    порядке времени. Открытых инцидентов немного (только недоступные
+    сейчас хосты), поэтому они читаются одним запросом на пакет.
+    """
+    open_incidents = {
+        (group_name, address): [incident_id, started_at, None, failed]
+        for incident_id, group_name, address, started_at, failed in conn.execute(
+            "SELECT id, group_name, address, started_at, failed_probes FROM incidents WHERE ended_at IS NULL"
+        )
+    }
+    touched = {}
+    for group_name, address, timestamp, status, _ in rows:
+        key = (group_name, address)
+        incident = open_incidents.get(key)
+        if status == STATUS_DOWN:
+            if incident is None:
+                incident = open_incidents[key] = [None, timestamp, None, 0]
+            incident[3] += 1
+        # подавленная проверка (недоступен родитель) не закрывает инцидент
+        elif incident is not None and status != STATUS_SUPPRESSED:
+            incident[2] = timestamp
+            del open_incidents[key]
+        else:
+            continue
+        touched[id(incident)] = (key, incident)
+
+    for (group_name, address), (incident_id, started_at, ended_at, failed) in touched.values():
+        duration = _seconds_between(started_at, ended_at) if ended_at else None
+        if incident_id is None:
+            conn.execute(
+                "INSERT INTO incidents (group_name, address, started_at, ended_at, duration_seconds, failed_probes) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (group_name, address, started_at, ended_at, duration, failed)
+            )
+        else:
+            conn.execute(
+                "UPDATE incidents SET ended_at = ?, duration_seconds = ?, failed_probes = ? WHERE id = ?",
+                (ended_at, duration, failed, incident_id)
+            )
+
+
+def detect_incidents(addresses, timestamps, statuses):
+    """Серии недоступности в истории, отсортированной по (адрес, время).
+
+    Возвращает массивы: индекс первой неудачной проверки, индекс
+    закрывающей успешной проверки (-1, если инцидент открыт) и число
+    неудачных проверок.
+    """
+    down = statuses == STATUS_DOWN
+    n = len(down)
+    same_host_next = np.zeros(n, dtype=bool)
+    same_host_next[:-1] = addresses[1:] == addresses[:-1]
+    prev_down = np.zeros(n, dtype=bool)
+    prev_down[1:] = down[:-1] & same_host_next[:-1]
+    next_down = np.zeros(n, dtype=bool)
+    next_down[:-1] = down[1:] & same_host_next[:-1]
+
+    starts = np.flatnonzero(down & ~prev_down)
+    last_failed = np.flatnonzero(down & ~next_down)
+    closing = np.where(same_host_next[last_failed], last_failed + 1, -1)
+    return starts, closing, last_failed - starts + 1
+
+
+def backfill_incidents(conn, group_name=None):
+    """Перестроить инциденты по всей истории ping_results (по группам)."""
+    if group_name:
+        groups = [group_name]
+    else:
+        groups = [row[0] for row in conn.execute("SELECT DISTINCT group_name FROM ping_results")]
+    total = 0
+    for group in groups:
+        rows = conn.execute(
+            "SELECT address, timestamp, status FROM ping_results WHERE group_name = ? AND status != ? "
+            "ORDER BY address, timestamp",
+            (group, STATUS_SUPPRESSED)
+        ).fetchall()
+        conn.execute("DELETE FROM incidents WHERE group_name = ?", (group,))
+        if not rows:
+            continue
+        addresses, timestamps, statuses = (np.array(column) for column in zip(*rows))
+        starts, closing, failed = detect_incidents(addresses, timestamps, statuses)
+
+        seconds = timestamps.astype('datetime64[s]')
+        closed = closing >= 0
+        durations = np.full(len(starts), np.nan)
+        durations[closed] = (seconds[closing[closed]] - seconds[starts[closed]]).astype(np.float64)
+        conn.executemany(
+            "INSERT INTO incidents (group_name, address, started_at, ended_at, duration_seconds, failed_probes) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            [(group, address, started_at, ended_at if is_closed else None,
+              float(duration) if is_closed else None, int(count))
+             for address, started_at, ended_at, is_closed, duration, count in zip(
+                addresses[starts].tolist(), timestamps[starts].tolist(),
+                timestamps[closing].tolist(), closed.tolist(), durations.tolist(), failed.tolist())]
+        )
+        total += len(starts)
+    conn.commit()
+    logging.info(f"Инциденты перестроены: {total}")
+    return total
@@ -0,0 +1,71 @@
+"""Запись результатов проверок в ping_results.
+
+Единая точка записи для сборщика (collector.py): строки пишутся одним
+executemany в одной транзакции, после чего вызываются зарегистрированные
+обработчики (PROCESSORS), которые могут обновить производные таблицы
+в той же транзакции. Каждый обработчик выполняется в своей точке
+сохранения: при ошибке откатываются только его изменения. Состояние в
+памяти обработчик меняет только после commit: он может вернуть функцию,
+которая вызывается после успешной записи (при откате она отбрасывается).
+"""
+import logging
+
+# Обработчики вызываются как processor(conn, rows) до commit; результат,
+# если это функция, вызывается без аргументов после commit
+PROCESSORS = []
+
+
+def register_processor(processor):
+    """Зарегистрировать обработчик новых результатов (можно как декоратор)."""
+    if processor not in PROCESSORS:
+        PROCESSORS.append(processor)
+    return processor
+
+
+def register_default_processors():
+    """Зарегистрировать стандартные обработчики результатов.
+
+    Единый список для всех, кто пишет результаты через write_results;
+    оповещения (alerts.AlertEngine.process) сборщик добавляет сам, так как
+    движок создается по его настройкам.
+    """
+    import anomalies
+    import overview
+    from availability import update_counters
+    from host_status import update_status
+    from incidents import update_incidents
+
+    for processor in (update_incidents, update_counters, anomalies.update_anomalies,
+                      update_status, overview.update_overview):
+        register_processor(processor)
+
+
+def write_results(conn, rows):
+    """Записать пакет результатов.
+
+    rows: последовательность кортежей (group_name, address, timestamp,
+    status, latency), отсортированная по времени. Возвращает число строк.
+    """
+    if not rows:
+        return 0
+    conn.executemany(
+        "INSERT INTO ping_results (group_name, address, timestamp, status, latency) VALUES (?, ?, ?, ?, ?)",
+        rows
+    )
+    on_commit = []
+    for processor in PROCESSORS:
+        conn.execute("SAVEPOINT ingest_processor")
+        try:
+            apply = processor(conn, rows)
+        except Exception as e:
+            conn.execute("ROLLBACK TO ingest_processor")
+            logging.error(f"Ошибка обработчика {getattr(processor, '__name__', processor)}, "
+                          f"его изменения отменены: {e}")
+        else:
+            if callable(apply):
+                on_commit.append(apply)
+        conn.execute("RELEASE ingest_processor")
+    conn.commit()
+    for apply in on_commit:
+        apply()
+    return len(rows)
@@ -0,0 +1,258 @@
+"""Загрузка инвентаря хостов (CSV/JSON) со сравнением и синхронизацией.
+
+Инвентарь - полный список хостов групп: группа, адрес, описание,
+подгруппа и необязательный родитель (dependencies.py). compute_diff
+сравнивает его с таблицами groups и hosts_<группа>: добавленные,
+удаленные и измененные (описание/подгруппа) хосты, новые группы, а с
+prune_groups - и группы, которых нет в инвентаре. apply_diff применяет
+изменения одной транзакцией через executemany. История проверок
+удаленных хостов не удаляется. Сборщик перечитывает хосты в начале
+каждого цикла, поэтому изменения вступают в силу без перезапуска.
+
+    python inventory.py hosts.csv [--db monitoring.db] [--dry-run] [--prune-groups]
+
+CSV: группа,адрес,описание,подгруппа[,родитель] (строка заголовка
+необязательна). JSON: список объектов с ключами group, address,
+description, subgroup, parent (или {"hosts": [...]}).
+"""
+import argparse
+import csv
+import io
+import json
+import logging
+import sqlite3
+import time
+from collections import defaultdict
+from contextlib import nullcontext
+
+import host_search
+import monitoring
+import overview
+from migrations import ensure_monitoring_schema
+
+HOSTS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS '{table}' (
+    address TEXT PRIMARY KEY,
+    description TEXT NOT NULL,
+    subgroup TEXT
+)
+"""
+
+FIELDS = ('group', 'address', 'description', 'subgroup', 'parent')
+# Сколько примеров каждого вида изменений попадает в отчет
+REPORT_SAMPLES = 20
+
+
+class InventoryError(ValueError):
+    """Инвентарь не удалось разобрать."""
+
+
+def hosts_table(group_name):
+    return "hosts_" + group_name.replace("'", "''")
+
+
+def parse_inventory(data, fmt='csv'):
+    """Разобрать инвентарь в список кортежей (группа, адрес, описание, подгруппа, родитель)."""
+    if isinstance(data, bytes):
+        data = data.decode('utf-8-sig')
+    if fmt == 'json':
+        try:
+            items = json.loads(data)
+        except ValueError as e:
+            raise InventoryError(f"Некорректный JSON: {e}") from e
+        if isinstance(items, dict):
+            items = items.get('hosts', [])
+        if not isinstance(items, list):
+            raise InventoryError("JSON должен быть списком хостов или объектом с ключом hosts")
+        records = []
+        for number, item in enumerate(items, 1):
+            if not isinstance(item, dict):
+                raise InventoryError(f"Запись {number}: ожидается объект")
+            records.append((number, [item.get(field) for field in FIELDS]))
+    elif fmt == 'csv':
+        records = []
+        for number, row in enumerate(csv.reader(io.StringIO(data)), 1):
+            if not row or not any(cell.strip() for cell in row) or row[0].startswith('#'):
+                continue
+            if number == 1 and row[0].strip().lower() in ('group', 'группа'):
+                continue
+            records.append((number, (row + [None] * len(FIELDS))[:len(FIELDS)]))
+    else:
+        raise InventoryError(f"Неизвестный формат инвентаря: {fmt}")
+
+    rows = []
+    for number, values in records:
+        group_name, address, description, subgroup, parent = (
+            str(value).strip() if value is not None else '' for value in values)
+        if not group_name or not address:
+            raise InventoryError(f"{'Запись' if fmt == 'json' else 'Строка'} {number}: не указаны группа или адрес")
+        rows.append((group_name, address, description, subgroup or None, parent or None))
+    return rows
+
+
+def compute_diff(conn, rows, prune_groups=False):
+    """Сравнить инвентарь с текущими группами и хостами.
+
+    Синхронизируются только группы из инвентаря (хосты, которых в нем
+    нет, удаляются); группы, отсутствующие в инвентаре, удаляются только
+    с prune_groups. Зависимости меняются, только если в инвентаре есть
+    столбец родителя.
+    """
+    inventory = defaultdict(dict)
+    parents = defaultdict(dict)
+    duplicates = 0
+    for group_name, address, description, subgroup, parent in rows:
+        hosts = inventory[group_name]
+        duplicates += address in hosts
+        hosts[address] = (description, subgroup)
+        if parent:
+            parents[group_name][address] = parent
+    with_parents = bool(parents)
+
+    existing_groups = {name for (name,) in conn.execute("SELECT group_name FROM groups")}
+    current_parents = defaultdict(dict)
+    for group_name, address, parent in conn.execute("SELECT group_name, address, parent FROM host_dependencies"):
+        current_parents[group_name][address] = parent
+
+    diff = {
+        'groups_added': sorted(set(inventory) - existing_groups),
+        'groups_removed': sorted(existing_groups - set(inventory)) if prune_groups else [],
+        'added': [], 'removed': [], 'changed': [],
+        'dependencies_set': [], 'dependencies_removed': [],
+        'duplicates': duplicates,
+    }
+    for group_name, hosts in inventory.items():
+        current = {}
+        if group_name in existing_groups:
+            try:
+                current = {address: (description, subgroup) for address, description, subgroup in conn.execute(
+                    f"SELECT address, description, subgroup FROM '{hosts_table(group_name)}'")}
+            except sqlite3.OperationalError:
+                current = {}
+        for address, values in hosts.items():
+            old = current.get(address)
+            if old is None:
+                diff['added'].append((group_name, address, *values))
+            elif old != values:
+                diff['changed'].append((group_name, address, *values))
+        diff['removed'].extend((group_name, address) for address in current if address not in hosts)
+
+        old_parents = current_parents.get(group_name, {})
+        if with_parents:
+            new_parents = parents.get(group_name, {})
+            diff['dependencies_set'].extend((group_name, address, parent) for address, parent in new_parents.items()
+                                            if old_parents.get(address) != parent)
+            diff['dependencies_removed'].extend((group_name, address) for address in old_parents
+                                                if address not in new_parents)
+        else:
+            diff['dependencies_removed'].extend((group_name, address) for address in old_parents
+                                                if address not in hosts)
+    return diff
+
+
+def apply_diff(conn, diff):
+    """Применить изменения одной транзакцией."""
+    changes = len(diff['added']) + len(diff['removed']) + len(diff['changed']) + len(diff['groups_removed'])
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        with host_search.bulk_update(conn) if changes >= host_search.BULK_THRESHOLD else nullcontext():
+            _apply_changes(conn, diff)
+        overview.refresh_overview(conn)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+
+def _apply_changes(conn, diff):
+    conn.executemany("INSERT INTO groups (group_name) VALUES (?)", [(name,) for name in diff['groups_added']])
+    for group_name in diff['groups_added']:
+        conn.execute(HOSTS_SCHEMA.format(table=hosts_table(group_name)))
+
+    by_group = defaultdict(lambda: ([], [], []))
+    for group_name, address, description, subgroup in diff['added']:
+        by_group[group_name][0].append((address, description, subgroup))
+    for group_name, address in diff['removed']:
+        by_group[group_name][1].append((address,))
+    for group_name, address, description, subgroup in diff['changed']:
+        by_group[group_name][2].append((description, subgroup, address))
+    for group_name, (added, removed, changed) in by_group.items():
+        table = hosts_table(group_name)
+        conn.executemany(f"INSERT INTO '{table}' (address, description, subgroup) VALUES (?, ?, ?)", added)
+        conn.executemany(f"DELETE FROM '{table}' WHERE address = ?", removed)
+        conn.executemany(f"UPDATE '{table}' SET description = ?, subgroup = ? WHERE address = ?", changed)
+        host_search.upsert_hosts(conn, group_name, added + [(address, description, subgroup)
+                                                            for description, subgroup, address in changed])
+        host_search.remove_hosts(conn, group_name, [address for (address,) in removed])
+
+    for group_name in diff['groups_removed']:
+        conn.execute("DELETE FROM groups WHERE group_name = ?", (group_name,))
+        conn.execute(f"DROP TABLE IF EXISTS '{hosts_table(group_name)}'")
+        host_search.remove_group(conn, group_name)
+        conn.execute("DELETE FROM host_dependencies WHERE group_name = ?", (group_name,))
+
+    conn.executemany("DELETE FROM host_dependencies WHERE group_name = ? AND address = ?",
+                     diff['dependencies_removed'])
+    conn.executemany("INSERT OR REPLACE INTO host_dependencies (group_name, address, parent) VALUES (?, ?, ?)",
+                     diff['dependencies_set'])
+
+
+def summarize(diff):
+    """Отчет об изменениях: количества и первые REPORT_SAMPLES записей каждого вида."""
+    return {
+        'groups_added': diff['groups_added'],
+        'groups_removed': diff['groups_removed'],
+        'added': len(diff['added']),
+        'removed': len(diff['removed']),
+        'changed': len(diff['changed']),
+        'dependencies_set': len(diff['dependencies_set']),
+        'dependencies_removed': len(diff['dependencies_removed']),
+        'duplicates': diff['duplicates'],
+        'samples': {
+            'added': ['/'.join(row[:2]) for row in diff['added'][:REPORT_SAMPLES]],
+            'removed': ['/'.join(row) for row in diff['removed'][:REPORT_SAMPLES]],
+            'changed': ['/'.join(row[:2]) for row in diff['changed'][:REPORT_SAMPLES]],
+        },
+    }
+
+
+def sync_inventory(conn, rows, dry_run=False, prune_groups=False):
+    """Сравнить и (без dry_run) применить инвентарь; возвращает отчет."""
+    started = time.perf_counter()
+    ensure_monitoring_schema(conn)
+    diff = compute_diff(conn, rows, prune_groups)
+    if not dry_run:
+        apply_diff(conn, diff)
+    report = summarize(diff)
+    report['hosts'] = len(rows)
+    report['dry_run'] = dry_run
+    report['duration_ms'] = round((time.perf_counter() - started) * 1000, 1)
+    logging.info(f"Инвентарь{' (проверка)' if dry_run else ''}: +{report['added']} -{report['removed']} "
+                 f"~{report['changed']}, новых групп {len(report['groups_added'])}, "
+                 f"удалено групп {len(report['groups_removed'])}")
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Синхронизация инвентаря хостов')
+    parser.add_argument('path', help='CSV или JSON с полным списком хостов групп')
+    parser.add_argument('--db', default=monitoring.MONITORING_DB)
+    parser.add_argument('--format', choices=['csv', 'json'], help='по умолчанию по расширению файла')
+    parser.add_argument('--dry-run', action='store_true', help='только показать изменения')
+    parser.add_argument('--prune-groups', action='store_true', help='удалить группы, которых нет в инвентаре')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    fmt = args.format or ('json' if args.path.lower().endswith('.json') else 'csv')
+    with open(args.path, 'rb') as f:
+        rows = parse_inventory(f.read(), fmt)
+    conn = sqlite3.connect(args.db, timeout=30)
+    try:
+        report = sync_inventory(conn, rows, args.dry_run, args.prune_groups)
+    finally:
+        conn.close()
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+if __name__ == '__main__':
+    main()
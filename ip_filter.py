@@ -1,66 +1,449 @@
+import atexit
+import ipaddress
 import json
 import os
 import logging
+import socket
+import tempfile
+import threading
+import time
+from bisect import bisect_right
+from collections import deque
 from datetime import datetime
 from functools import wraps
-from flask import request, render_template, g
+from flask import request, render_template, g, make_response
+from sqlalchemy import bindparam, case, select
+from sqlalchemy.dialects.sqlite import insert
+from werkzeug.exceptions import HTTPException
+
+from access_log import access_log
+from metrics import cache_requests
+
+
+def parse_ip_entry(entry):
+    """Parse list entry (IP, CIDR or 'first-last' range) into (version, first, last)"""
+    if '-' in entry:
+        first, last = (ipaddress.ip_address(part.strip()) for part in entry.split('-', 1))
+        if first.version != last.version or int(first) > int(last):
+            raise ValueError(f"Invalid IP range: {entry}")
+        return first.version, int(first), int(last)
+    address, _, length = entry.strip().partition('/')
+    family, version, bits = (socket.AF_INET6, 6, 128) if ':' in address else (socket.AF_INET, 4, 32)
+    try:
+        value = int.from_bytes(socket.inet_pton(family, address), 'big')
+    except OSError:
+        raise ValueError(f"Invalid IP address: {entry}")
+    prefix = int(length) if length else bits
+    if not 0 <= prefix <= bits:
+        raise ValueError(f"Invalid prefix length: {entry}")
+    host_bits = bits - prefix
+    first = value >> host_bits << host_bits
+    return version, first, first | ((1 << host_bits) - 1)
+
+
+def covering_entries(entries, ip):
+    """Entries other than ip itself (CIDR or range) whose interval contains ip"""
+    try:
+        version, value, _ = parse_ip_entry(ip)
+    except ValueError:
+        return ()
+    covering = []
+    for entry in entries:
+        if entry == ip:
+            continue
+        try:
+            entry_version, first, last = parse_ip_entry(entry)
+        except ValueError:
+            continue
+        if entry_version == version and first <= value <= last:
+            covering.append(entry)
+    return tuple(covering)
+
+
+def normalize_ip_entry(entry):
+    """Validate admin input and return canonical form of IP, CIDR or range"""
+    entry = entry.strip()
+    if '-' in entry:
+        parse_ip_entry(entry)
+        first, last = (str(ipaddress.ip_address(part.strip())) for part in entry.split('-', 1))
+        return f"{first}-{last}"
+    network = ipaddress.ip_network(entry, strict=False)
+    if network.num_addresses == 1:
+        return str(network.network_address)
+    return str(network)
+
+
+class PrefixSet:
+    """Compiled IP list: exact strings plus merged address intervals per IP version.
+
+    Intervals are sorted and non-overlapping, so a lookup is one bisect over
+    the interval starts, independent of how many prefixes the list holds.
+    """
+
+    def __init__(self, entries):
+        self.exact = frozenset(entries)
+        intervals = {4: [], 6: []}
+        for entry in entries:
+            try:
+                version, first, last = parse_ip_entry(entry)
+            except ValueError:
+                continue  # e.g. 'localhost' - only matched as an exact string
+            intervals[version].append((first, last))
+        self.starts = {}
+        self.ends = {}
+        for version, items in intervals.items():
+            items.sort()
+            starts, ends = [], []
+            for first, last in items:
+                if ends and first <= ends[-1] + 1:
+                    if last > ends[-1]:
+                        ends[-1] = last
+                else:
+                    starts.append(first)
+                    ends.append(last)
+            self.starts[version] = starts
+            self.ends[version] = ends
+
+    def __len__(self):
+        return len(self.exact)
+
+    def __contains__(self, ip):
+        if ip in self.exact:
+            return True
+        try:
+            if ':' in ip:
+                version, value = 6, int.from_bytes(socket.inet_pton(socket.AF_INET6, ip), 'big')
+            else:
+                version, value = 4, int.from_bytes(socket.inet_pton(socket.AF_INET, ip), 'big')
+        except (OSError, TypeError, ValueError):
+            return False
+        starts = self.starts[version]
+        index = bisect_right(starts, value) - 1
+        return index >= 0 and value <= self.ends[version][index]
+
+
+class AttemptTracker:
+    """Sliding-window counter of unauthorized attempts per IP.
+
+    Each worker keeps the timestamps of recent attempts in memory and decides
+    locally. Increments are flushed in batches to the ip_attempts table by a
+    background thread; the upsert resets counters that were idle for longer
+    than the window, and the counts read back after each flush merge attempts
+    seen by other worker processes.
+    """
+
+    def __init__(self, max_attempts=3, window=3600, flush_interval=1.0, max_tracked=100000):
+        self.max_attempts = max_attempts
+        self.window = window
+        self.flush_interval = flush_interval
+        self.max_tracked = max_tracked
+        self.on_block = None  # callback(ip) for IPs blocked by the shared counter
+        self._recent = {}   # ip -> deque of local attempt times (maxlen=max_attempts)
+        self._pending = {}  # ip -> [count, first time, last time] not yet flushed
+        self._shared = {}   # ip -> (count in DB, last attempt time) at last flush
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._engine = None
+        self._table = None
+        self._wakeup = threading.Event()
+        self._thread_pid = None
+
+    def bind(self, engine, table):
+        """Persist counters to ip_attempts through the given SQLAlchemy engine"""
+        self._engine = engine
+        self._table = table
+        atexit.register(self.flush)
+
+    def record(self, ip, now=None):
+        """Register an attempt and return the current attempt count for IP"""
+        now = time.time() if now is None else now
+        with self._lock:
+            recent = self._recent.get(ip)
+            if recent is None:
+                recent = self._recent[ip] = deque(maxlen=self.max_attempts)
+            recent.append(now)
+            pending = self._pending.get(ip)
+            if pending is None:
+                self._pending[ip] = [1, now, now]
+            else:
+                pending[0] += 1
+                pending[2] = now
+            count = self._count_locked(ip, now)
+            overflow = len(self._recent) > self.max_tracked
+        self._ensure_flusher()
+        if overflow:
+            self._wakeup.set()
+        return count
+
+    def count(self, ip, now=None):
+        """Current attempt count for IP within the sliding window"""
+        now = time.time() if now is None else now
+        with self._lock:
+            return self._count_locked(ip, now)
+
+    def _count_locked(self, ip, now):
+        window_start = now - self.window
+        local = sum(1 for t in self._recent.get(ip, ()) if t >= window_start)
+        shared_count, shared_last = self._shared.get(ip, (0, 0))
+        if shared_last < window_start:
+            shared_count = 0
+        pending = self._pending.get(ip)
+        return max(local, shared_count + (pending[0] if pending else 0))
+
+    def confirmed_count(self, ip, now=None):
+        """Flush pending attempts and return the count re-read from the shared table.
+
+        Local counters of other workers may be stale after a manual unblock
+        (reset only runs in the worker that handled it), so a block decision
+        is confirmed against the table first.
+        """
+        self.flush(now)
+        return self.count(ip, now)
+
+    def reset(self, ip):
+        """Forget all attempts of IP in this worker (after manual unblock)"""
+        with self._lock:
+            self._recent.pop(ip, None)
+            self._pending.pop(ip, None)
+            self._shared.pop(ip, None)
+
+    def _ensure_flusher(self):
+        if self._thread_pid == os.getpid():
+            return
+        with self._flush_lock:
+            if self._thread_pid != os.getpid():
+                self._thread_pid = os.getpid()
+                threading.Thread(target=self._flush_loop, name='attempt-flusher', daemon=True).start()
+
+    def _flush_loop(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logging.error(f"Error flushing attempt counters: {e}")
+
+    def flush(self, now=None):
+        """Write pending increments in one batch and evict expired entries"""
+        now = time.time() if now is None else now
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+            if pending and self._engine is not None:
+                try:
+                    shared, blocked = self._write_batch(pending, now)
+                except Exception:
+                    with self._lock:
+                        for ip, (count, first, last) in pending.items():
+                            merged = self._pending.setdefault(ip, [0, first, last])
+                            merged[0] += count
+                            merged[1] = min(merged[1], first)
+                            merged[2] = max(merged[2], last)
+                    raise
+            else:
+                shared, blocked = {}, []
+                for ip, (count, first, last) in pending.items():
+                    previous, previous_last = self._shared.get(ip, (0, 0))
+                    if previous_last < now - self.window:
+                        previous = 0
+                    shared[ip] = (previous + count, last)
+            with self._lock:
+                self._shared.update(shared)
+                if pending and self._engine is not None:
+                    # The table already holds every flushed local attempt, so a
+                    # smaller count means another worker reset the IP (unblock)
+                    for ip, (count, _) in shared.items():
+                        recent = self._recent.get(ip)
+                        if recent is not None and len(recent) > count:
+                            for _ in range(len(recent) - count):
+                                recent.popleft()
+                self._evict_locked(now)
+        if self.on_block is not None:
+            for ip in blocked:
+                self.on_block(ip)
+        return len(pending)
+
+    def _write_batch(self, pending, now):
+        table = self._table
+        window_start = datetime.fromtimestamp(now - self.window)
+        rows = [{
+            'ip_address': ip,
+            'attempt_count': count,
+            'first_attempt': datetime.fromtimestamp(first),
+            'last_attempt': datetime.fromtimestamp(last),
+            'is_blocked': False,
+            'window_start': window_start,
+        } for ip, (count, first, last) in pending.items()]
+
+        stmt = insert(table)
+        stale = table.c.last_attempt < bindparam('window_start')
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.ip_address],
+            set_={
+                'attempt_count': case(
+                    (stale, stmt.excluded.attempt_count),
+                    else_=table.c.attempt_count + stmt.excluded.attempt_count,
+                ),
+                'first_attempt': case((stale, stmt.excluded.first_attempt), else_=table.c.first_attempt),
+                'last_attempt': stmt.excluded.last_attempt,
+                'is_blocked': case((stale, False), else_=table.c.is_blocked),
+            },
+        )
+        shared, blocked, newly_blocked = {}, [], []
+        with self._engine.begin() as conn:
+            conn.execute(stmt, rows)
+            ips = list(pending)
+            for i in range(0, len(ips), 500):
+                query = select(table.c.ip_address, table.c.attempt_count,
+                               table.c.last_attempt, table.c.is_blocked).where(
+                    table.c.ip_address.in_(ips[i:i + 500]))
+                for ip, count, last, is_blocked in conn.execute(query):
+                    shared[ip] = (count, last.timestamp())
+                    if count >= self.max_attempts:
+                        blocked.append(ip)
+                        if not is_blocked:
+                            newly_blocked.append(ip)
+            for i in range(0, len(newly_blocked), 500):
+                conn.execute(table.update().where(
+                    table.c.ip_address.in_(newly_blocked[i:i + 500])).values(is_blocked=True))
+        return shared, blocked
+
+    def _evict_locked(self, now):
+        window_start = now - self.window
+        for ip in [ip for ip, recent in self._recent.items()
+                   if recent[-1] < window_start and ip not in self._pending]:
+            del self._recent[ip]
+        for ip in [ip for ip, (_, last) in self._shared.items() if last < window_start]:
+            del self._shared[ip]
+        for store in (self._recent, self._shared):
+            excess = len(store) - self.max_tracked
+            if excess > 0:
+                for ip in [ip for ip in store if ip not in self._pending][:excess]:
+                    del store[ip]
+
 
 class IPFilter:
     def __init__(self):
         self.whitelist_file = 'config/whitelist.json'
         self.blacklist_file = 'config/blacklist.json'
-        self.attempts_file = 'config/attempts.json'
         self.max_attempts = 3
-        
-    def load_whitelist(self):
-        """Load whitelist from JSON file"""
+        self.attempts = AttemptTracker(max_attempts=self.max_attempts)
+        self.attempts.on_block = self._block_after_attempts
+        # path -> (file signature, entries tuple, compiled PrefixSet)
+        self._lists = {}
+        self._lists_lock = threading.RLock()
+
+    def _file_signature(self, path):
+        """Identify file version by inode, mtime and size (None if missing)"""
         try:
-            if os.path.exists(self.whitelist_file):
-                with open(self.whitelist_file, 'r') as f:
-                    data = json.load(f)
-                    return data.get('allowed_ips', [])
-        except Exception as e:
-            logging.error(f"Error loading whitelist: {e}")
-        return []
+            st = os.stat(path)
+        except OSError:
+            return None
+        return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+    def _get_list(self, path, key):
+        """Return cached (entries, PrefixSet), re-reading the file only when it changed"""
+        signature = self._file_signature(path)
+        cached = self._lists.get(path)
+        if cached is not None and cached[0] == signature:
+            cache_requests.inc('ip_lists', 'hit')
+            return cached[1], cached[2]
+        cache_requests.inc('ip_lists', 'miss')
+
+        with self._lists_lock:
+            cached = self._lists.get(path)
+            if cached is None or cached[0] != signature:
+                entries = cached[1] if cached else ()
+                if signature is None:
+                    entries = ()
+                else:
+                    try:
+                        with open(path, 'r') as f:
+                            entries = tuple(json.load(f).get(key, []))
+                    except Exception as e:
+                        # Keep the previous contents until the file changes again
+                        logging.error(f"Error loading {path}: {e}")
+                cached = (signature, entries, PrefixSet(entries))
+                self._lists[path] = cached
+        return cached[1], cached[2]
+
+    def _write_list(self, path, key, entries):
+        """Atomically replace JSON list file and the in-memory copy"""
+        directory = os.path.dirname(path) or '.'
+        with self._lists_lock:
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-', suffix='.json')
+            try:
+                with os.fdopen(fd, 'w') as f:
+                    json.dump({key: list(entries)}, f, indent=2)
+                os.replace(tmp_path, path)
+            except Exception:
+                if os.path.exists(tmp_path):
+                    os.unlink(tmp_path)
+                raise
+            entries = tuple(entries)
+            self._lists[path] = (self._file_signature(path), entries, PrefixSet(entries))
+
+    def _update_list(self, path, key, add=None, remove=None):
+        """Add or remove one entry under the lock; returns True if the file changed"""
+        with self._lists_lock:
+            entries, matcher = self._get_list(path, key)
+            if add is not None and add not in matcher.exact:
+                self._write_list(path, key, entries + (add,))
+                return True
+            if remove is not None and remove in matcher.exact:
+                self._write_list(path, key, tuple(e for e in entries if e != remove))
+                return True
+        return False
+
+    def load_whitelist(self):
+        """Load whitelist (cached, reloaded when the JSON file changes)"""
+        return list(self._get_list(self.whitelist_file, 'allowed_ips')[0])
     
     def load_blacklist(self):
-        """Load blacklist from JSON file"""
-        try:
-            if os.path.exists(self.blacklist_file):
-                with open(self.blacklist_file, 'r') as f:
-                    data = json.load(f)
-                    return data.get('blocked_ips', [])
-        except Exception as e:
-            logging.error(f"Error loading blacklist: {e}")
-        return []
+        """Load blacklist (cached, reloaded when the JSON file changes)"""
+        return list(self._get_list(self.blacklist_file, 'blocked_ips')[0])
+
+    def save_whitelist(self, whitelist):
+        """Save whitelist to JSON file (raises on I/O errors)"""
+        self._write_list(self.whitelist_file, 'allowed_ips', whitelist)
+
+    def add_to_whitelist(self, ip):
+        """Add IP to whitelist, returns False if it was already present"""
+        return self._update_list(self.whitelist_file, 'allowed_ips', add=ip)
+
+    def remove_from_whitelist(self, ip):
+        """Remove IP from whitelist, returns False if it was not present"""
+        return self._update_list(self.whitelist_file, 'allowed_ips', remove=ip)
     
     def save_blacklist(self, blacklist):
         """Save blacklist to JSON file"""
         try:
-            os.makedirs(os.path.dirname(self.blacklist_file), exist_ok=True)
-            with open(self.blacklist_file, 'w') as f:
-                json.dump({'blocked_ips': blacklist}, f, indent=2)
+            self._write_list(self.blacklist_file, 'blocked_ips', blacklist)
         except Exception as e:
             logging.error(f"Error saving blacklist: {e}")
-    
-    def load_attempts(self):
-        """Load attempt counter from JSON file"""
+
+    def add_to_blacklist(self, ip):
+        """Add IP to blacklist, returns False if it was already blocked"""
         try:
-            if os.path.exists(self.attempts_file):
-                with open(self.attempts_file, 'r') as f:
-                    return json.load(f)
+            return self._update_list(self.blacklist_file, 'blocked_ips', add=ip)
         except Exception as e:
-            logging.error(f"Error loading attempts: {e}")
-        return {}
-    
-    def save_attempts(self, attempts):
-        """Save attempt counter to JSON file"""
+            logging.error(f"Error saving blacklist: {e}")
+        return False
+
+    def remove_from_blacklist(self, ip):
+        """Remove exact entry from blacklist.
+
+        Returns (removed, covering): whether the entry was removed and the
+        remaining CIDR/range entries that still block the IP.
+        """
+        removed = False
         try:
-            os.makedirs(os.path.dirname(self.attempts_file), exist_ok=True)
-            with open(self.attempts_file, 'w') as f:
-                json.dump(attempts, f, indent=2)
+            removed = self._update_list(self.blacklist_file, 'blocked_ips', remove=ip)
         except Exception as e:
-            logging.error(f"Error saving attempts: {e}")
+            logging.error(f"Error saving blacklist: {e}")
+        return removed, covering_entries(self.load_blacklist(), ip)
     
     def get_client_ip(self):
         """Get client IP address, handling proxies"""
@@ -73,48 +456,36 @@ class IPFilter:
     
     def is_ip_allowed(self, ip):
         """Check if IP is in whitelist"""
-        whitelist = self.load_whitelist()
+        whitelist = self._get_list(self.whitelist_file, 'allowed_ips')[1]
         return ip in whitelist or ip == '127.0.0.1' or ip == 'localhost'
     
     def is_ip_blocked(self, ip):
         """Check if IP is in blacklist JSON file"""
-        blacklist = self.load_blacklist()
-        return ip in blacklist
+        return ip in self._get_list(self.blacklist_file, 'blocked_ips')[1]
     
     def record_attempt(self, ip):
         """Record unauthorized attempt and block if limit exceeded"""
-        attempts = self.load_attempts()
-        
-        if ip not in attempts:
-            attempts[ip] = {
-                'count': 1,
-                'first_attempt': datetime.now().isoformat(),
-                'last_attempt': datetime.now().isoformat()
-            }
-        else:
-            attempts[ip]['count'] += 1
-            attempts[ip]['last_attempt'] = datetime.now().isoformat()
-        
-        self.save_attempts(attempts)
+        count = self.attempts.record(ip)
+        if count >= self.max_attempts:
+            count = self.attempts.confirmed_count(ip)
         
         # If max attempts reached, add to blacklist
-        if attempts[ip]['count'] >= self.max_attempts:
-            blacklist = self.load_blacklist()
-            if ip not in blacklist:
-                blacklist.append(ip)
-                self.save_blacklist(blacklist)
+        if count >= self.max_attempts:
+            if self.add_to_blacklist(ip):
                 logging.warning(f"IP blocked after {self.max_attempts} attempts: {ip}")
                 return True  # Blocked
         
-        logging.warning(f"Unauthorized attempt {attempts[ip]['count']}/{self.max_attempts}: {ip}")
+        logging.warning(f"Unauthorized attempt {count}/{self.max_attempts}: {ip}")
         return False  # Not blocked yet
+
+    def _block_after_attempts(self, ip):
+        """Blacklist IP whose attempts across all workers reached the limit"""
+        if self.add_to_blacklist(ip):
+            logging.warning(f"IP blocked after {self.max_attempts} attempts: {ip}")
     
     def get_attempts_left(self, ip):
         """Get remaining attempts for IP"""
-        attempts = self.load_attempts()
-        if ip in attempts:
-            return max(0, self.max_attempts - attempts[ip]['count'])
-        return self.max_attempts
+        return max(0, self.max_attempts - self.attempts.count(ip))
     
     def log_access_attempt(self, ip, status='blocked'):
         """Log access attempt (simplified)"""
@@ -123,7 +494,14 @@ class IPFilter:
         elif status == 'unauthorized':
             logging.warning(f"Unauthorized IP access attempt: {ip} - Path: {request.path}")
         else:
-            logging.info(f"Allowed IP access: {ip} - Path: {request.path}")
+            logging.debug(f"Allowed IP access: {ip} - Path: {request.path}")
+
+    def audit_access(self, status, status_code, started):
+        """Queue access record for the access_logs table (written in background)"""
+        user = g.get('_login_user')  # only if Flask-Login already loaded it
+        access_log.record(g.client_ip, getattr(user, 'id', None), request.path,
+                          request.headers.get('User-Agent'), status, status_code,
+                          (time.perf_counter() - started) * 1000)
     
     def check_ip_access(self):
         """Main IP checking function with attempt counter"""
@@ -153,18 +531,31 @@ def require_ip_whitelist(f):
     """Decorator to check IP whitelist with attempt counter"""
     @wraps(f)
     def decorated_function(*args, **kwargs):
+        started = time.perf_counter()
         allowed, status = ip_filter.check_ip_access()
         
         if not allowed:
             if status == "blocked":
                 # Completely ignore blocked IPs (no response)
+                ip_filter.audit_access(status, 204, started)
                 return "", 204
             else:
                 # Show error page for unauthorized IPs with attempts left
                 attempts_left = ip_filter.get_attempts_left(g.client_ip)
+                ip_filter.audit_access(status, 403, started)
                 return render_template("blocked.html", 
                                      ip=g.client_ip,
                                      attempts_left=attempts_left), 403
         
-        return f(*args, **kwargs)
+        try:
+            response = make_response(f(*args, **kwargs))
+        except HTTPException as e:
+            ip_filter.audit_access(status, e.code, started)
+            raise
+        except Exception:
+            ip_filter.audit_access('error', 500, started)
+            raise
+        ip_filter.audit_access('error' if response.status_code >= 500 else status,
+                               response.status_code, started)
+        return response
     return decorated_function
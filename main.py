@@ -1,5 +1,72 @@
-from app import app
-import routes  # noqa: F401
+import os
+import sqlite3
+
+from app import app, db
+from monitoring import MONITORING_DB
+
+
+_configured = False
+
+
+def create_app():
+    """Собрать веб-приложение: маршруты, авторизация и проверка схемы БД.
+
+    Маршруты регистрируются на общем объекте app из app.py (url_for и
+    шаблоны используют имена представлений без префикса blueprint), поэтому
+    сборка выполняется один раз на процесс: повторный вызов возвращает уже
+    собранное приложение. Модули мониторинга (monitoring.py и инструменты
+    на его основе) не зависят от Flask и не вызывают эту функцию.
+    """
+    global _configured
+    if _configured:
+        return app
+    _configured = True
+
+    import models  # noqa: F401
+    import routes  # noqa: F401
+    import static_assets
+    from migrations import ensure_app_schema, ensure_monitoring_schema, migrate_app_db, migrate_monitoring_db
+
+    with app.app_context():
+        ensure_app_schema(db.engine, db.metadata)
+    # Счетчики, индекс поиска и сводка групп появляются в monitoring.db только
+    # после миграций; без них дашборд, /api/search и /api/overview пусты
+    conn = sqlite3.connect(MONITORING_DB)
+    try:
+        ensure_monitoring_schema(conn)
+    finally:
+        conn.close()
+
+    # Собранная статика (python static_assets.py) раздается в обход приложения
+    static_assets.init_app(app)
+
+    # Встроенный сборщик (обычно запускается отдельно: python collector.py)
+    if os.environ.get('COLLECTOR_ENABLED') == '1':
+        from collector import Collector
+        Collector().start()
+
+    @app.cli.command('migrate')
+    def migrate_command():
+        """Применить миграции схемы базы данных."""
+        with app.app_context():
+            applied = migrate_app_db(db.engine, db.metadata)
+        conn = sqlite3.connect(MONITORING_DB)
+        try:
+            applied += migrate_monitoring_db(conn)
+        finally:
+            conn.close()
+        print(f"Применено миграций: {applied}")
+
+    @app.cli.command('build-assets')
+    def build_assets_command():
+        """Собрать статические файлы с хэшем в имени и сжатыми вариантами."""
+        manifest = static_assets.build()
+        print(f"Собрано файлов: {len(manifest)}; перезапустите приложение, чтобы их использовать")
+
+    return app
+
+
+app = create_app()
 
 if __name__ == "__main__":
     app.run(host="0.0.0.0", port=5000, debug=True)
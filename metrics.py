@@ -0,0 +1,248 @@
+"""Лёгкие метрики в формате Prometheus без внешних зависимостей.
+
+Каждый поток пишет в собственный словарь без блокировок; при сборе
+(scrape) словари всех потоков суммируются. Если задана переменная
+окружения METRICS_DIR, каждый процесс (воркер gunicorn) периодически
+сохраняет свой снимок в этот каталог, а /metrics суммирует снимки всех
+воркеров. Каталог нужно очищать при полном перезапуске сервера.
+"""
+
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from functools import wraps
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = {}
+        self._local = threading.local()
+        self._stores = []   # (поток, словарь значений)
+        self._retired = {}  # значения завершившихся потоков
+        self._lock = threading.Lock()
+        self._dump_pid = None
+        self.directory = os.environ.get('METRICS_DIR')
+        self.dump_interval = 5.0
+
+    def store(self):
+        """Словарь значений текущего потока: (имя, метки) -> число или список."""
+        try:
+            return self._local.values
+        except AttributeError:
+            values = self._local.values = {}
+            with self._lock:
+                self._stores.append((threading.current_thread(), values))
+            if self.directory and self._dump_pid != os.getpid():
+                self._start_dumper()
+            return values
+
+    def register(self, metric):
+        self.metrics[metric.name] = metric
+        return metric
+
+    def snapshot(self):
+        """Суммарные значения всех потоков текущего процесса."""
+        with self._lock:
+            alive = []
+            for thread, values in self._stores:
+                if thread.is_alive():
+                    alive.append((thread, values))
+                else:
+                    _merge(self._retired, dict(values))
+            self._stores = alive
+            merged = {}
+            _merge(merged, self._retired)
+        for _, values in alive:
+            _merge(merged, dict(values))
+        return merged
+
+    def collect(self):
+        """Значения всех процессов (или только текущего без METRICS_DIR)."""
+        if not self.directory:
+            return self.snapshot()
+        self.dump()
+        merged = {}
+        for filename in os.listdir(self.directory):
+            if filename.startswith('metrics-') and filename.endswith('.json'):
+                try:
+                    with open(os.path.join(self.directory, filename)) as f:
+                        items = json.load(f)
+                except (OSError, ValueError):
+                    continue
+                _merge(merged, {(name, tuple(labels)): value for name, labels, value in items})
+        return merged
+
+    def dump(self):
+        """Сохранить снимок процесса в METRICS_DIR (атомарной заменой файла)."""
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"metrics-{os.getpid()}.json")
+        items = [[name, list(labels), value] for (name, labels), value in self.snapshot().items()]
+        with open(path + '.tmp', 'w') as f:
+            json.dump(items, f)
+        os.replace(path + '.tmp', path)
+
+    def _start_dumper(self):
+        with self._lock:
+            if self._dump_pid == os.getpid():
+                return
+            self._dump_pid = os.getpid()
+
+        def loop():
+            while True:
+                time.sleep(self.dump_interval)
+                try:
+                    self.dump()
+                except OSError:
+                    pass
+
+        threading.Thread(target=loop, name='metrics-dumper', daemon=True).start()
+
+    def render(self):
+        """Текст в формате Prometheus exposition 0.0.4."""
+        values = self.collect()
+        by_name = {}
+        for (name, labels), value in values.items():
+            by_name.setdefault(name, []).append((labels, value))
+        lines = []
+        for name, metric in sorted(self.metrics.items()):
+            lines.append(f"# HELP {name} {metric.help}")
+            lines.append(f"# TYPE {name} {metric.type}")
+            for labels, value in sorted(by_name.get(name, ())):
+                lines.extend(metric.format(labels, value))
+        return '\n'.join(lines) + '\n'
+
+
+def _merge(target, source):
+    for key, value in source.items():
+        current = target.get(key)
+        if current is None:
+            target[key] = list(value) if isinstance(value, list) else value
+        elif isinstance(value, list):
+            for i, item in enumerate(value):
+                current[i] += item
+        else:
+            target[key] = current + value
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + '}'
+
+
+class Counter:
+    type = 'counter'
+
+    def __init__(self, name, help, labelnames=(), registry=None):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.registry = registry or REGISTRY
+        self.registry.register(self)
+
+    def inc(self, *labelvalues, amount=1):
+        store = self.registry.store()
+        key = (self.name, labelvalues)
+        store[key] = store.get(key, 0) + amount
+
+    def format(self, labels, value):
+        return [f"{self.name}{_format_labels(self.labelnames, labels)} {value}"]
+
+
+class Histogram:
+    type = 'histogram'
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS, registry=None):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self.registry = registry or REGISTRY
+        self.registry.register(self)
+
+    def observe(self, value, *labelvalues):
+        store = self.registry.store()
+        key = (self.name, labelvalues)
+        cell = store.get(key)
+        if cell is None:
+            # счетчики корзин (последняя - +Inf) и сумма значений
+            cell = store[key] = [0] * (len(self.buckets) + 2)
+        cell[bisect_left(self.buckets, value)] += 1
+        cell[-1] += value
+
+    def time(self, *labelvalues):
+        """Декоратор: длительность вызова функции в секундах."""
+        def decorator(f):
+            @wraps(f)
+            def wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return f(*args, **kwargs)
+                finally:
+                    self.observe(time.perf_counter() - start, *labelvalues)
+            return wrapper
+        return decorator
+
+    def format(self, labels, cell):
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float('inf'),), cell[:-1]):
+            cumulative += count
+            le = '+Inf' if bound == float('inf') else repr(bound)
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, [('le', le)])} {cumulative}")
+        label_text = _format_labels(self.labelnames, labels)
+        lines.append(f"{self.name}_sum{label_text} {cell[-1]}")
+        lines.append(f"{self.name}_count{label_text} {cumulative}")
+        return lines
+
+
+REGISTRY = Registry()
+
+http_request_duration = Histogram(
+    'http_request_duration_seconds', 'Время обработки запроса Flask', ('endpoint', 'method', 'status'))
+http_request_bytes = Counter(
+    'http_request_size_bytes_total', 'Размер тел запросов', ('endpoint',))
+http_response_bytes = Counter(
+    'http_response_size_bytes_total', 'Размер тел ответов', ('endpoint',))
+monitoring_query_duration = Histogram(
+    'monitoring_query_duration_seconds', 'Время выполнения функций monitoring.py', ('accessor',))
+sqlite_statement_duration = Histogram(
+    'sqlite_statement_duration_seconds', 'Время выполнения SQL-запросов к monitoring.db '
+    '(включая ожидание блокировки)', ())
+sqlite_busy_errors = Counter(
+    'sqlite_busy_errors_total', 'Запросы, завершившиеся ошибкой database is locked/busy', ())
+cache_requests = Counter(
+    'cache_requests_total', 'Обращения к кэшам процесса', ('cache', 'result'))
+
+
+def timed_accessor(f):
+    """Декоратор для функций monitoring.py: гистограмма по имени функции."""
+    return monitoring_query_duration.time(f.__name__)(f)
+
+
+def init_app(app):
+    """Подключить замер длительности и размеров запросов Flask."""
+    from flask import g, request
+
+    @app.before_request
+    def start_request_timer():
+        g.metrics_started = time.perf_counter()
+
+    @app.after_request
+    def observe_request(response):
+        started = g.get('metrics_started')
+        if started is not None:
+            endpoint = request.endpoint or 'unmatched'
+            http_request_duration.observe(time.perf_counter() - started,
+                                          endpoint, request.method, str(response.status_code))
+            if request.content_length:
+                http_request_bytes.inc(endpoint, amount=request.content_length)
+            if response.content_length:
+                http_response_bytes.inc(endpoint, amount=response.content_length)
+        return response
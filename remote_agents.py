@@ -0,0 +1,223 @@
+"""Удаленные агенты проверок: назначение хостов и прием пакетов результатов.
+
+Агент (agent.py) проверяет хосты своей площадки и отправляет результаты
+на /api/ingest сжатыми пакетами {"instance", "seq", "rows"}: instance -
+идентификатор очереди агента на диске, seq - номер пакета в ней. Настройки агентов - в
+config/agents.json (путь меняется через AGENTS_CONFIG):
+
+    {"agents": {"branch-a": {"token": "...", "groups": ["branch-a"]},
+                "dc2-net": {"token": "...", "groups": ["production"], "subgroups": ["network"]}}}
+
+Агенту назначаются хосты перечисленных групп (и подгрупп, если они
+указаны); центральный сборщик такие хосты не проверяет. Повторно
+доставленный пакет (тот же агент, instance и seq) подтверждается, но не
+записывается: номер пакета фиксируется в agent_batches в той же
+транзакции, что и сам пакет.
+
+Веб-приложение только ставит принятые строки в очередь agent_inbox, а в
+ping_results их пишет сборщик (drain_inbox в его потоке записи): состояние
+обработчиков ingest (базовые линии аномалий, открытые интервалы,
+оповещения) хранится в памяти и должно быть в одном процессе, а не в
+каждом воркере gunicorn. Без работающего сборщика результаты агентов
+копятся в очереди. Модуль не зависит от Flask.
+"""
+import hmac
+import json
+import logging
+import os
+import sqlite3
+import threading
+import zlib
+from datetime import datetime, timedelta
+
+import ingest
+from dependencies import load_dependencies
+from monitoring import STATUS_DOWN, STATUS_SUPPRESSED, STATUS_UP
+
+AGENTS_CONFIG = os.environ.get('AGENTS_CONFIG', 'config/agents.json')
+# Ограничение размера пакета после распаковки
+MAX_BATCH_BYTES = 16 * 1024 * 1024
+# Сколько дней хранятся номера принятых пакетов
+BATCH_RETENTION_DAYS = 7
+# Сколько пакетов из agent_inbox сборщик пишет за одну транзакцию
+DRAIN_BATCHES = 50
+STATUSES = (STATUS_UP, STATUS_DOWN, STATUS_SUPPRESSED)
+
+
+class BatchError(ValueError):
+    """Пакет агента не удалось разобрать."""
+
+
+class AgentRegistry:
+    """Настройки агентов; файл перечитывается при изменении."""
+
+    def __init__(self, path=AGENTS_CONFIG):
+        self.path = path
+        self.lock = threading.Lock()
+        self._mtime = None
+        self._agents = {}
+
+    def agents(self):
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            mtime = None
+        with self.lock:
+            if mtime != self._mtime:
+                self._agents = self._load() if mtime is not None else {}
+                self._mtime = mtime
+            return self._agents
+
+    def _load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                config = json.load(f)
+        except (OSError, ValueError) as e:
+            logging.error(f"Настройки агентов {self.path} не загружены: {e}")
+            return {}
+        agents = {}
+        for agent_id, options in config.get('agents', {}).items():
+            if not options.get('token'):
+                logging.warning(f"Агент {agent_id} без токена пропущен")
+                continue
+            agents[agent_id] = {
+                'token': options['token'],
+                'groups': set(options.get('groups', [])),
+                'subgroups': set(options.get('subgroups', [])),
+            }
+        return agents
+
+    def authenticate(self, agent_id, token):
+        """Идентификатор агента, если токен верен, иначе None."""
+        agent = self.agents().get(agent_id or '')
+        if agent is None or not token or not hmac.compare_digest(agent['token'], token):
+            return None
+        return agent_id
+
+    def owner(self, group_name, subgroup):
+        """Агент, которому назначен хост, или None (проверяет центральный сборщик)."""
+        for agent_id, agent in self.agents().items():
+            if group_name in agent['groups'] and (not agent['subgroups'] or subgroup in agent['subgroups']):
+                return agent_id
+        return None
+
+
+registry = AgentRegistry()
+
+
+def host_subgroups(conn, group_names):
+    """{(группа, адрес): подгруппа} для указанных групп."""
+    hosts = {}
+    for group_name in group_names:
+        table_name = "hosts_" + group_name.replace("'", "''")
+        try:
+            rows = conn.execute(f"SELECT address, subgroup FROM '{table_name}'").fetchall()
+        except sqlite3.Error:
+            continue
+        hosts.update(((group_name, address), subgroup) for address, subgroup in rows)
+    return hosts
+
+
+def agent_targets(conn, agent_id):
+    """Хосты агента и зависимости между ними: {'targets': [[группа, адрес]], 'dependencies': [...]}."""
+    agent = registry.agents().get(agent_id)
+    if agent is None:
+        return {'targets': [], 'dependencies': []}
+    hosts = host_subgroups(conn, sorted(agent['groups']))
+    targets = [key for key, subgroup in hosts.items() if registry.owner(key[0], subgroup) == agent_id]
+    assigned = set(targets)
+    dependencies = [[group_name, address, parent]
+                    for (group_name, address), (_, parent) in load_dependencies(conn).items()
+                    if (group_name, address) in assigned]
+    return {'targets': [list(key) for key in targets], 'dependencies': dependencies}
+
+
+def decode_batch(body, content_encoding=None):
+    """Распаковать и разобрать тело пакета (gzip/deflate или без сжатия)."""
+    encoding = (content_encoding or '').strip().lower()
+    if encoding not in ('', 'identity', 'gzip', 'deflate'):
+        raise BatchError(f"Неподдерживаемое сжатие: {content_encoding}")
+    try:
+        if encoding in ('gzip', 'deflate'):
+            decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS if encoding == 'gzip' else zlib.MAX_WBITS)
+            body = decompressor.decompress(body, MAX_BATCH_BYTES + 1)
+        if len(body) > MAX_BATCH_BYTES:
+            raise BatchError("Пакет слишком большой")
+        payload = json.loads(body)
+    except (zlib.error, UnicodeDecodeError, json.JSONDecodeError) as e:
+        raise BatchError(f"Некорректный пакет: {e}") from e
+    if not isinstance(payload, dict) or not isinstance(payload.get('rows'), list):
+        raise BatchError("Пакет должен быть объектом с полями instance, seq и rows")
+    seq = payload.get('seq')
+    if not isinstance(seq, int) or isinstance(seq, bool) or seq < 1:
+        raise BatchError("Некорректный номер пакета")
+    instance = payload.get('instance')
+    if not isinstance(instance, str) or not 0 < len(instance) <= 64:
+        raise BatchError("Некорректный идентификатор очереди агента")
+    return payload
+
+
+def _parse_row(row):
+    if not isinstance(row, list) or len(row) != 5:
+        raise BatchError(f"Некорректная строка: {row!r}")
+    group_name, address, timestamp, status, latency = row
+    if not isinstance(group_name, str) or not isinstance(address, str) or status not in STATUSES:
+        raise BatchError(f"Некорректная строка: {row!r}")
+    try:
+        datetime.strptime(timestamp, '%Y-%m-%d %H:%M:%S')
+    except (TypeError, ValueError):
+        raise BatchError(f"Некорректное время: {timestamp!r}") from None
+    if latency is not None and (not isinstance(latency, (int, float)) or isinstance(latency, bool) or latency < 0):
+        raise BatchError(f"Некорректная задержка: {latency!r}")
+    return group_name, address, timestamp, status, latency
+
+
+def ingest_batch(conn, agent_id, payload):
+    """Принять пакет агента в agent_inbox; возвращает подтверждение {'seq', 'accepted', 'rejected', 'duplicate'}.
+
+    Строки хостов, не назначенных агенту (например, удаленных из
+    инвентаря), отбрасываются.
+    """
+    seq = payload['seq']
+    rows = [_parse_row(row) for row in payload['rows']]
+    hosts = host_subgroups(conn, {row[0] for row in rows})
+    accepted = sorted((row for row in rows
+                       if row[:2] in hosts and registry.owner(row[0], hosts[row[:2]]) == agent_id),
+                      key=lambda row: row[2])
+    now = datetime.now()
+    cursor = conn.execute(
+        "INSERT OR IGNORE INTO agent_batches (agent_id, instance, seq, received_at, rows) VALUES (?, ?, ?, ?, ?)",
+        (agent_id, payload['instance'], seq, now.strftime('%Y-%m-%d %H:%M:%S'), len(accepted))
+    )
+    if cursor.rowcount == 0:
+        conn.rollback()
+        return {'seq': seq, 'accepted': 0, 'rejected': 0, 'duplicate': True}
+    if seq % 100 == 0:
+        cutoff = now - timedelta(days=BATCH_RETENTION_DAYS)
+        conn.execute("DELETE FROM agent_batches WHERE received_at < ?", (cutoff.strftime('%Y-%m-%d %H:%M:%S'),))
+    if accepted:
+        conn.execute("INSERT INTO agent_inbox (agent_id, received_at, rows) VALUES (?, ?, ?)",
+                     (agent_id, now.strftime('%Y-%m-%d %H:%M:%S'), json.dumps(accepted, ensure_ascii=False)))
+    conn.commit()
+    if len(accepted) < len(rows):
+        logging.warning(f"Агент {agent_id}, пакет {seq}: отброшено {len(rows) - len(accepted)} строк "
+                        f"не назначенных агенту хостов")
+    return {'seq': seq, 'accepted': len(accepted), 'rejected': len(rows) - len(accepted), 'duplicate': False}
+
+
+def drain_inbox(conn, limit=DRAIN_BATCHES):
+    """Записать до limit пакетов из agent_inbox через ingest.write_results; возвращает число строк.
+
+    Вызывается сборщиком: пакеты удаляются из очереди в той же транзакции,
+    что и запись результатов, поэтому при ошибке они остаются в очереди.
+    """
+    batches = conn.execute("SELECT id, rows FROM agent_inbox ORDER BY id LIMIT ?", (limit,)).fetchall()
+    if not batches:
+        return 0
+    rows = sorted((tuple(row) for _, body in batches for row in json.loads(body)), key=lambda row: row[2])
+    conn.execute("DELETE FROM agent_inbox WHERE id <= ?", (batches[-1][0],))
+    if rows:
+        ingest.write_results(conn, rows)
+    else:
+        conn.commit()
+    return len(rows)
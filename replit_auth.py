@@ -1,5 +1,5 @@
-import jwt
 import os
+import time
 import uuid
 import logging
 from functools import wraps
@@ -15,19 +15,91 @@ from flask_dance.consumer.storage import BaseStorage
 from flask_login import LoginManager, login_user, logout_user, current_user
 from oauthlib.oauth2.rfc6749.errors import InvalidGrantError
 from sqlalchemy.exc import NoResultFound
+from sqlalchemy.orm import make_transient_to_detached
 from werkzeug.local import LocalProxy
 
 from app import app, db
+from metrics import cache_requests
 from models import OAuth, User
 
 login_manager = LoginManager(app)
 
+# Пути, которым не нужны сессия и OAuth (опрос API и статика)
+FAST_PATH_PREFIXES = ('/api/', '/static/', '/metrics')
+
+
+def is_fast_path():
+    return request.path.startswith(FAST_PATH_PREFIXES)
+
+
+class TTLCache:
+    """Небольшой кэш процесса с временем жизни записей"""
+
+    def __init__(self, name, ttl=60, max_size=10000):
+        self.name = name
+        self.ttl = ttl
+        self.max_size = max_size
+        self._data = {}
+
+    def get(self, key, default=None):
+        item = self._data.get(key)
+        if item is None or item[0] < time.monotonic():
+            cache_requests.inc(self.name, 'miss')
+            return default
+        cache_requests.inc(self.name, 'hit')
+        return item[1]
+
+    def set(self, key, value):
+        if len(self._data) >= self.max_size:
+            now = time.monotonic()
+            self._data = {k: v for k, v in self._data.items() if v[0] >= now}
+            if len(self._data) >= self.max_size:
+                self._data.clear()
+        self._data[key] = (time.monotonic() + self.ttl, value)
+
+    def pop(self, key):
+        self._data.pop(key, None)
+
+
+# Кэш пользователей локален для процесса: invalidate_user сбрасывает его только
+# в текущем воркере, поэтому изменение прав (is_admin) доходит до остальных не
+# позже чем через USER_CACHE_TTL секунд
+USER_CACHE_TTL = 5
+user_cache = TTLCache('users', ttl=USER_CACHE_TTL)
+token_cache = TTLCache('oauth_tokens')
+_MISSING = object()
+
+
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(user_id)
+    values = user_cache.get(user_id)
+    if values is None:
+        user = User.query.get(user_id)
+        if user is not None:
+            # В кэше только значения столбцов, а не экземпляр ORM
+            user_cache.set(user_id, {column.key: getattr(user, column.key) for column in User.__table__.columns})
+        return user
+    # Экземпляр из кэшированных значений присоединяется к сессии запроса без
+    # SELECT, поэтому ленивая загрузка связей работает как обычно
+    user = User(**values)
+    make_transient_to_detached(user)
+    return db.session.merge(user, load=False)
+
+
+def invalidate_user(user_id):
+    """Сбросить кэшированного пользователя после изменения его записи"""
+    user_cache.pop(user_id)
+
 
 class UserSessionStorage(BaseStorage):
+    def _key(self, blueprint):
+        return (current_user.get_id(), g.browser_session_key, blueprint.name)
+
     def get(self, blueprint):
+        key = self._key(blueprint)
+        token = token_cache.get(key, _MISSING)
+        if token is not _MISSING:
+            return token
         try:
             token = db.session.query(OAuth).filter_by(
                 user_id=current_user.get_id(),
@@ -36,9 +108,11 @@ class UserSessionStorage(BaseStorage):
             ).one().token
         except NoResultFound:
             token = None
+        token_cache.set(key, token)
         return token
 
     def set(self, blueprint, token):
+        token_cache.pop(self._key(blueprint))
         db.session.query(OAuth).filter_by(
             user_id=current_user.get_id(),
             browser_session_key=g.browser_session_key,
@@ -53,6 +127,7 @@ class UserSessionStorage(BaseStorage):
         db.session.commit()
 
     def delete(self, blueprint):
+        token_cache.pop(self._key(blueprint))
         db.session.query(OAuth).filter_by(
             user_id=current_user.get_id(),
             browser_session_key=g.browser_session_key,
@@ -97,9 +172,11 @@ def make_replit_blueprint():
 
     @replit_bp.before_app_request
     def set_applocal_session():
+        if is_fast_path():
+            return
+        # Запись в сессию (и новый Set-Cookie) только при создании ключа
         if '_browser_session_key' not in session:
             session['_browser_session_key'] = uuid.uuid4().hex
-        session.modified = True
         g.browser_session_key = session['_browser_session_key']
         g.flask_dance_replit = replit_bp.session
 
@@ -132,10 +209,12 @@ def save_user(user_claims):
     user.profile_image_url = user_claims.get('profile_image_url')
     merged_user = db.session.merge(user)
     db.session.commit()
+    invalidate_user(merged_user.id)
     return merged_user
 
 @oauth_authorized.connect
 def logged_in(blueprint, token):
+    import jwt
     user_claims = jwt.decode(token['id_token'], options={"verify_signature": False})
     user = save_user(user_claims)
     login_user(user)
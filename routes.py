@@ -1,20 +1,42 @@
 from flask import session, render_template, request, redirect, url_for, flash, jsonify
 from flask_login import current_user
 from app import app, db
-from replit_auth import require_login, make_replit_blueprint
-from ip_filter import require_ip_whitelist, ip_filter
-from monitoring import *
+from replit_auth import require_login, make_replit_blueprint, invalidate_user, is_fast_path
+from ip_filter import require_ip_whitelist, ip_filter, normalize_ip_entry
+from access_log import access_log
+import metrics
+import sql_profiler
+from monitoring import (
+    get_groups, get_subgroups, get_hosts, get_ping_history, get_dashboard_data,
+    get_host_status_color, get_subgroup_status_summary, get_collector_stats, get_group_staleness,
+    get_incidents, get_incident_stats, get_availability, get_anomalies, get_open_anomalies,
+    normalize_timestamp, get_db_connection, search_hosts, get_overview, get_heatmap,
+)
 from models import User, AccessLog, IPAttempt
-import json
+import inventory
+import logging
 import os
+import sqlite3
 
 # Register auth blueprint
 app.register_blueprint(make_replit_blueprint(), url_prefix="/auth")
 
+# Метрики запросов для /metrics и профилировщик SQL (SQL_PROFILE=1)
+metrics.init_app(app)
+with app.app_context():
+    sql_profiler.init_app(app, db.engine)
+
+# Счетчики попыток доступа сохраняются пакетами в таблицу ip_attempts
+# Журнал доступа пишется в access_logs фоновым потоком
+with app.app_context():
+    ip_filter.attempts.bind(db.engine, IPAttempt.__table__)
+    access_log.bind(db.engine, AccessLog.__table__)
+
 # Make session permanent
 @app.before_request
 def make_session_permanent():
-    session.permanent = True
+    if not is_fast_path() and not session.permanent:
+        session.permanent = True
 
 @app.route('/')
 @require_ip_whitelist
@@ -38,7 +60,6 @@ def index():
     start_time = request.args.get('start_time', None)
     end_time = request.args.get('end_time', None)
     status = request.args.get('status', None)
-    ping_history = get_ping_history(selected_group, selected_host, start_time, end_time, status, selected_subgroup) if selected_group and selected_host else []
     
     dashboard_data = get_dashboard_data(selected_group, selected_subgroup) if selected_group else {'availability': [], 'latency': [], 'down': []}
     
@@ -49,12 +70,7 @@ def index():
             if sg != 'Все':
                 subgroup_statuses[sg] = get_subgroup_status_summary(selected_group, sg)
     
-    # Получение статусов хостов
-    host_statuses = {}
-    if selected_group:
-        for host in hosts:
-            host_statuses[host['address']] = get_host_status_color(selected_group, host['address'])
-    
+    # Строки таблиц хостов и истории загружает monitoring.js через /api/hosts и /api/ping_history
     return render_template('index.html', 
                          groups=groups, 
                          selected_group=selected_group, 
@@ -62,15 +78,24 @@ def index():
                          selected_subgroup=selected_subgroup, 
                          hosts=hosts, 
                          selected_host=selected_host, 
-                         ping_history=ping_history, 
                          dashboard_data=dashboard_data,
                          start_time=start_time,
                          end_time=end_time,
                          status=status,
                          subgroup_statuses=subgroup_statuses,
-                         host_statuses=host_statuses,
                          user=current_user)
 
+@app.route('/overview')
+@require_ip_whitelist
+def overview():
+    """Обзор всех групп и подгрупп (данные загружает overview.js через /api/overview)"""
+    is_local_dev = os.environ.get('REPL_ID', 'local-dev-mode') == 'local-dev-mode'
+    
+    if not is_local_dev and not current_user.is_authenticated:
+        return render_template('login.html')
+    
+    return render_template('overview.html', user=current_user)
+
 @app.route('/admin')
 @require_ip_whitelist
 @require_login
@@ -80,8 +105,15 @@ def admin():
         flash('У вас нет прав доступа к административной панели', 'error')
         return redirect(url_for('index'))
     
-    # Получение логов доступа
-    access_logs = AccessLog.query.order_by(AccessLog.timestamp.desc()).limit(100).all()
+    # Получение логов доступа (индексы по timestamp и ip_address + timestamp)
+    log_ip = request.args.get('log_ip', '').strip()
+    log_status = request.args.get('log_status', '').strip()
+    logs_query = AccessLog.query
+    if log_ip:
+        logs_query = logs_query.filter_by(ip_address=log_ip)
+    if log_status:
+        logs_query = logs_query.filter_by(status=log_status)
+    access_logs = logs_query.order_by(AccessLog.timestamp.desc()).limit(100).all()
     
     # Получение заблокированных IP
     blocked_ips = IPAttempt.query.filter_by(is_blocked=True).all()
@@ -90,11 +122,21 @@ def admin():
     whitelist = ip_filter.load_whitelist()
     blacklist = ip_filter.load_blacklist()
     
+    # Состояние сборщика
+    collector_stats = get_collector_stats(20)
+    group_staleness = get_group_staleness()
+    
     return render_template('admin.html',
                          access_logs=access_logs,
+                         log_ip=log_ip,
+                         log_status=log_status,
+                         dropped_logs=access_log.dropped,
                          blocked_ips=blocked_ips,
                          whitelist=whitelist,
                          blacklist=blacklist,
+                         collector_stats=collector_stats,
+                         group_staleness=group_staleness,
+                         stale_groups=sum(1 for g in group_staleness if g['stale']),
                          user=current_user)
 
 @app.route('/admin/whitelist', methods=['POST'])
@@ -112,29 +154,60 @@ def update_whitelist():
         flash('IP адрес не может быть пустым', 'error')
         return redirect(url_for('admin'))
     
-    whitelist = ip_filter.load_whitelist()
-    
-    if action == 'add' and ip not in whitelist:
-        whitelist.append(ip)
+    if action == 'add':
         try:
-            os.makedirs(os.path.dirname(ip_filter.whitelist_file), exist_ok=True)
-            with open(ip_filter.whitelist_file, 'w') as f:
-                json.dump({'allowed_ips': whitelist}, f, indent=2)
-            flash(f'IP {ip} добавлен в белый список', 'success')
+            ip = normalize_ip_entry(ip)
+        except ValueError:
+            flash(f'Некорректный IP адрес, подсеть или диапазон: {ip}', 'error')
+            return redirect(url_for('admin'))
+        try:
+            if ip_filter.add_to_whitelist(ip):
+                flash(f'IP {ip} добавлен в белый список', 'success')
         except Exception as e:
             flash(f'Ошибка сохранения: {e}', 'error')
     
-    elif action == 'remove' and ip in whitelist:
-        whitelist.remove(ip)
+    elif action == 'remove':
         try:
-            with open(ip_filter.whitelist_file, 'w') as f:
-                json.dump({'allowed_ips': whitelist}, f, indent=2)
-            flash(f'IP {ip} удален из белого списка', 'success')
+            if ip_filter.remove_from_whitelist(ip):
+                flash(f'IP {ip} удален из белого списка', 'success')
         except Exception as e:
             flash(f'Ошибка сохранения: {e}', 'error')
     
     return redirect(url_for('admin'))
 
+@app.route('/admin/blacklist', methods=['POST'])
+@require_ip_whitelist
+@require_login
+def update_blacklist():
+    """Обновление черного списка IP (адреса, подсети CIDR и диапазоны)"""
+    if not current_user.is_admin:
+        return jsonify({'error': 'Нет прав доступа'}), 403
+    
+    action = request.form.get('action')
+    ip = request.form.get('ip', '').strip()
+    
+    if not ip:
+        flash('IP адрес не может быть пустым', 'error')
+        return redirect(url_for('admin'))
+    
+    if action == 'add':
+        try:
+            ip = normalize_ip_entry(ip)
+        except ValueError:
+            flash(f'Некорректный IP адрес, подсеть или диапазон: {ip}', 'error')
+            return redirect(url_for('admin'))
+        if ip_filter.add_to_blacklist(ip):
+            flash(f'{ip} добавлен в черный список', 'success')
+    
+    elif action == 'remove':
+        removed, covering = ip_filter.remove_from_blacklist(ip)
+        if removed:
+            flash(f'{ip} удален из черного списка', 'success')
+        if covering:
+            flash(f'{ip} по-прежнему заблокирован записями черного списка: {", ".join(covering)}', 'warning')
+    
+    return redirect(url_for('admin'))
+
 @app.route('/admin/unblock', methods=['POST'])
 @require_ip_whitelist
 @require_login
@@ -148,19 +221,72 @@ def unblock_ip():
         flash('IP адрес не может быть пустым', 'error')
         return redirect(url_for('admin'))
     
-    # Удаление из базы данных
+    # Удаление из базы данных и из счетчиков в памяти; другие воркеры сверяют
+    # свои счетчики с таблицей перед блокировкой (AttemptTracker.confirmed_count)
+    ip_filter.attempts.flush()
     attempt = IPAttempt.query.filter_by(ip_address=ip).first()
     if attempt:
         db.session.delete(attempt)
         db.session.commit()
-    
-    # Удаление из файла черного списка
-    blacklist = ip_filter.load_blacklist()
-    if ip in blacklist:
-        blacklist.remove(ip)
-        ip_filter.save_blacklist(blacklist)
-    
-    flash(f'IP {ip} разблокирован', 'success')
+    ip_filter.attempts.reset(ip)
+    
+    # Удаление из файла черного списка; подсети и диапазоны, в которые
+    # входит адрес, не удаляются - администратор решает сам
+    _, covering = ip_filter.remove_from_blacklist(ip)
+    if covering:
+        flash(f'Счетчик попыток IP {ip} сброшен, но адрес по-прежнему заблокирован записями '
+              f'черного списка: {", ".join(covering)}. Удалите их или разбейте на части', 'warning')
+    else:
+        flash(f'IP {ip} разблокирован', 'success')
+    return redirect(url_for('admin'))
+
+@app.route('/admin/inventory', methods=['POST'])
+@require_ip_whitelist
+@require_login
+def sync_inventory():
+    """Синхронизация хостов с инвентарем (файл CSV/JSON или тело JSON)"""
+    if not current_user.is_admin:
+        return jsonify({'error': 'Нет прав доступа'}), 403
+
+    # Клиенты API присылают инвентарь телом JSON и получают отчет в JSON
+    wants_json = request.is_json
+    dry_run = request.values.get('dry_run') in ('1', 'true', 'on')
+    prune_groups = request.values.get('prune_groups') in ('1', 'true', 'on')
+    try:
+        if wants_json:
+            rows = inventory.parse_inventory(request.get_data(), 'json')
+        else:
+            upload = request.files.get('file')
+            if not upload or not upload.filename:
+                flash('Файл инвентаря не выбран', 'error')
+                return redirect(url_for('admin'))
+            fmt = 'json' if upload.filename.lower().endswith('.json') else 'csv'
+            rows = inventory.parse_inventory(upload.read(), fmt)
+        conn = get_db_connection()
+        try:
+            report = inventory.sync_inventory(conn, rows, dry_run, prune_groups)
+        finally:
+            conn.close()
+    except inventory.InventoryError as e:
+        if wants_json:
+            return jsonify({'error': str(e)}), 400
+        flash(f'Ошибка в инвентаре: {e}', 'error')
+        return redirect(url_for('admin'))
+    except sqlite3.Error as e:
+        if wants_json:
+            return jsonify({'error': str(e)}), 500
+        flash(f'Ошибка синхронизации: {e}', 'error')
+        return redirect(url_for('admin'))
+
+    if wants_json:
+        return jsonify(report)
+    message = (f"{'Проверка инвентаря' if dry_run else 'Инвентарь применен'}: "
+               f"добавлено {report['added']}, удалено {report['removed']}, изменено {report['changed']}, "
+               f"новых групп {len(report['groups_added'])}, удалено групп {len(report['groups_removed'])} "
+               f"({report['duration_ms']} мс)")
+    if dry_run and report['samples']['removed']:
+        message += '. Будут удалены: ' + ', '.join(report['samples']['removed'])
+    flash(message, 'info' if dry_run else 'success')
     return redirect(url_for('admin'))
 
 @app.route('/admin/users')
@@ -187,6 +313,7 @@ def toggle_admin(user_id):
     if user and user.id != current_user.id:  # Нельзя изменить свой статус
         user.is_admin = not user.is_admin
         db.session.commit()
+        invalidate_user(user.id)
         status = 'назначен' if user.is_admin else 'снят'
         flash(f'Пользователь {user.email} {status} администратором', 'success')
     
@@ -246,9 +373,37 @@ def api_hosts():
     
     return jsonify({
         'hosts': hosts,
-        'host_statuses': host_statuses
+        'host_statuses': host_statuses,
+        'host_anomalies': get_open_anomalies(group_name)
     })
 
+@app.route('/api/overview')
+@require_ip_whitelist
+def api_overview():
+    """API endpoint для сводки по всем группам и подгруппам"""
+    return jsonify(get_overview())
+
+@app.route('/api/search')
+@require_ip_whitelist
+def api_search():
+    """API endpoint для поиска хостов по всем группам"""
+    query = request.args.get('q', '').strip()[:200]
+    try:
+        limit = min(int(request.args.get('limit', 50)), 200)
+    except ValueError:
+        return jsonify({'error': 'Invalid limit'}), 400
+    if not query:
+        return jsonify({'results': [], 'truncated': False})
+    
+    # truncated: совпадений больше, чем ранжировалось, стоит уточнить запрос
+    results, truncated = search_hosts(query, limit)
+    return jsonify({'results': results, 'truncated': truncated})
+
+def _columnar_format():
+    """format=columnar -> True, без format -> False, иное значение -> None."""
+    value = request.args.get('format', 'rows')
+    return {'rows': False, 'columnar': True}.get(value)
+
 @app.route('/api/ping_history')
 @require_ip_whitelist
 def api_ping_history():
@@ -262,8 +417,11 @@ def api_ping_history():
     
     if not group_name or not address:
         return jsonify({'error': 'Group and host parameters required'}), 400
+    columnar = _columnar_format()
+    if columnar is None:
+        return jsonify({'error': 'Unknown format'}), 400
     
-    ping_history = get_ping_history(group_name, address, start_time, end_time, status, subgroup)
+    ping_history = get_ping_history(group_name, address, start_time, end_time, status, subgroup, columnar=columnar)
     
     return jsonify({'ping_history': ping_history})
 
@@ -276,11 +434,174 @@ def api_dashboard():
     
     if not group_name:
         return jsonify({'error': 'Group parameter required'}), 400
+    columnar = _columnar_format()
+    if columnar is None:
+        return jsonify({'error': 'Unknown format'}), 400
     
-    dashboard_data = get_dashboard_data(group_name, subgroup)
+    dashboard_data = get_dashboard_data(group_name, subgroup, columnar=columnar)
     
     return jsonify({'dashboard_data': dashboard_data})
 
+@app.route('/api/incidents')
+@require_ip_whitelist
+def api_incidents():
+    """API endpoint для списка инцидентов недоступности"""
+    group_name = request.args.get('group')
+    if not group_name:
+        return jsonify({'error': 'Group parameter required'}), 400
+    try:
+        start_time = normalize_timestamp(request.args.get('start_time'))
+        end_time = normalize_timestamp(request.args.get('end_time'))
+        limit = min(int(request.args.get('limit', 500)), 5000)
+    except ValueError:
+        return jsonify({'error': 'Invalid time range or limit'}), 400
+    
+    incidents = get_incidents(group_name, request.args.get('host'), request.args.get('subgroup'),
+                              start_time, end_time, limit)
+    return jsonify({'incidents': incidents})
+
+@app.route('/api/incidents/stats')
+@require_ip_whitelist
+def api_incident_stats():
+    """API endpoint для MTTR/MTBF по хостам и подгруппе"""
+    group_name = request.args.get('group')
+    if not group_name:
+        return jsonify({'error': 'Group parameter required'}), 400
+    try:
+        start_time = normalize_timestamp(request.args.get('start_time'))
+        end_time = normalize_timestamp(request.args.get('end_time'))
+    except ValueError:
+        return jsonify({'error': 'Invalid time range'}), 400
+    
+    stats = get_incident_stats(group_name, request.args.get('subgroup'), request.args.get('host'),
+                               start_time, end_time)
+    return jsonify(stats)
+
+@app.route('/api/availability')
+@require_ip_whitelist
+def api_availability():
+    """API endpoint для доступности хостов группы за произвольный период"""
+    group_name = request.args.get('group')
+    if not group_name:
+        return jsonify({'error': 'Group parameter required'}), 400
+    try:
+        start_time = normalize_timestamp(request.args.get('start_time'))
+        end_time = normalize_timestamp(request.args.get('end_time'))
+    except ValueError:
+        return jsonify({'error': 'Invalid time range'}), 400
+    
+    availability = get_availability(group_name, request.args.get('subgroup'), start_time, end_time)
+    return jsonify(availability)
+
+@app.route('/api/heatmap')
+@require_ip_whitelist
+def api_heatmap():
+    """API endpoint для тепловой карты доступности хостов по часам или суткам"""
+    group_name = request.args.get('group')
+    if not group_name:
+        return jsonify({'error': 'Group parameter required'}), 400
+    try:
+        start_time = normalize_timestamp(request.args.get('start'))
+        end_time = normalize_timestamp(request.args.get('end'))
+        heatmap = get_heatmap(group_name, request.args.get('subgroup'), request.args.get('bucket', 'hour'),
+                              start_time, end_time)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return jsonify(heatmap)
+
+@app.route('/api/anomalies')
+@require_ip_whitelist
+def api_anomalies():
+    """API endpoint для интервалов аномальной задержки"""
+    group_name = request.args.get('group')
+    if not group_name:
+        return jsonify({'error': 'Group parameter required'}), 400
+    try:
+        start_time = normalize_timestamp(request.args.get('start_time'))
+        end_time = normalize_timestamp(request.args.get('end_time'))
+        limit = min(int(request.args.get('limit', 500)), 5000)
+    except ValueError:
+        return jsonify({'error': 'Invalid time range or limit'}), 400
+    
+    anomalies = get_anomalies(group_name, request.args.get('host'), request.args.get('subgroup'),
+                              start_time, end_time, limit)
+    return jsonify({'anomalies': anomalies})
+
+@app.route('/api/collector_stats')
+@require_ip_whitelist
+def api_collector_stats():
+    """API endpoint для статистики сборщика и актуальности данных групп"""
+    try:
+        limit = min(int(request.args.get('limit', 100)), 1000)
+    except ValueError:
+        return jsonify({'error': 'Invalid limit'}), 400
+    
+    return jsonify({
+        'cycles': get_collector_stats(limit),
+        'groups': get_group_staleness(),
+    })
+
+def _authenticated_agent():
+    """Агент по заголовкам X-Agent-Id и Authorization: Bearer <токен> или None"""
+    # remote_agents через dependencies тянет NumPy, поэтому импортируется по требованию
+    import remote_agents
+    scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+    if scheme.lower() != 'bearer':
+        return None
+    return remote_agents.registry.authenticate(request.headers.get('X-Agent-Id'), token.strip())
+
+@app.route('/api/agent/targets')
+@require_ip_whitelist
+def api_agent_targets():
+    """API endpoint: хосты, назначенные удаленному агенту"""
+    import remote_agents
+    agent_id = _authenticated_agent()
+    if agent_id is None:
+        return jsonify({'error': 'Unauthorized'}), 401
+    conn = get_db_connection()
+    try:
+        return jsonify(remote_agents.agent_targets(conn, agent_id))
+    finally:
+        conn.close()
+
+@app.route('/api/ingest', methods=['POST'])
+@require_ip_whitelist
+def api_ingest():
+    """API endpoint: пакет результатов удаленного агента (gzip JSON с номером пакета)"""
+    import remote_agents
+    agent_id = _authenticated_agent()
+    if agent_id is None:
+        return jsonify({'error': 'Unauthorized'}), 401
+    if (request.content_length or 0) > remote_agents.MAX_BATCH_BYTES:
+        return jsonify({'error': 'Batch too large'}), 413
+    # Без Content-Length (chunked) тело читается с тем же ограничением
+    body = request.stream.read(remote_agents.MAX_BATCH_BYTES + 1)
+    if len(body) > remote_agents.MAX_BATCH_BYTES:
+        return jsonify({'error': 'Batch too large'}), 413
+    try:
+        payload = remote_agents.decode_batch(body, request.headers.get('Content-Encoding'))
+    except remote_agents.BatchError as e:
+        return jsonify({'error': str(e)}), 400
+
+    conn = get_db_connection()
+    try:
+        return jsonify(remote_agents.ingest_batch(conn, agent_id, payload))
+    except remote_agents.BatchError as e:
+        return jsonify({'error': str(e)}), 400
+    except sqlite3.Error as e:
+        # Агент повторит отправку пакета
+        logging.error(f"Ошибка записи пакета агента {agent_id}: {e}")
+        return jsonify({'error': 'Storage unavailable'}), 503
+    finally:
+        conn.close()
+
+@app.route('/metrics')
+@require_ip_whitelist
+def prometheus_metrics():
+    """Метрики в текстовом формате Prometheus (суммарно по всем воркерам)"""
+    return metrics.REGISTRY.render(), 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
+
 @app.errorhandler(500)
 def internal_error(error):
     return render_template('500.html'), 500
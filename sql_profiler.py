@@ -0,0 +1,148 @@
+"""Профилировщик SQL-запросов в рамках одного HTTP-запроса (по запросу).
+
+Включается переменной окружения SQL_PROFILE=1. Для каждого запроса
+считает количество SQL-запросов и суммарное время в БД (и для сырых
+соединений monitoring.db, и для движка SQLAlchemy), отмечает одинаковые
+по форме запросы, повторяющиеся в одном HTTP-запросе (N+1), и сохраняет
+EXPLAIN QUERY PLAN для медленных запросов. Итог отдается в заголовке
+X-SQL-Profile и пишется в ротируемый лог logs/sql_profile.log.
+"""
+
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from logging.handlers import RotatingFileHandler
+
+_WHITESPACE = re.compile(r'\s+')
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_IN_LISTS = re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)')
+
+
+def statement_shape(sql):
+    """Форма запроса: без литералов, списков IN и лишних пробелов."""
+    shape = _WHITESPACE.sub(' ', sql).strip()
+    shape = _LITERALS.sub('?', shape)
+    return _IN_LISTS.sub('(...)', shape)
+
+
+class SQLProfiler:
+    def __init__(self):
+        self.enabled = os.environ.get('SQL_PROFILE') == '1'
+        self.slow_ms = float(os.environ.get('SQL_PROFILE_SLOW_MS', 50))
+        self.repeat_threshold = int(os.environ.get('SQL_PROFILE_REPEAT', 5))
+        self.log_file = os.environ.get('SQL_PROFILE_LOG', 'logs/sql_profile.log')
+        self._local = threading.local()
+        self._logger = None
+
+    @property
+    def logger(self):
+        if self._logger is None:
+            logger = logging.getLogger('sql_profile')
+            logger.propagate = False
+            logger.setLevel(logging.INFO)
+            os.makedirs(os.path.dirname(self.log_file) or '.', exist_ok=True)
+            handler = RotatingFileHandler(self.log_file, maxBytes=5 * 1024 * 1024, backupCount=3)
+            handler.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
+            logger.addHandler(handler)
+            self._logger = logger
+        return self._logger
+
+    def start(self, label):
+        self._local.profile = {'label': label, 'count': 0, 'seconds': 0.0, 'shapes': {}, 'slow': {}}
+
+    def record(self, sql, duration, explain=None):
+        """Учесть выполненный запрос; explain() вызывается только для медленных."""
+        profile = getattr(self._local, 'profile', None)
+        if profile is None:
+            return
+        profile['count'] += 1
+        profile['seconds'] += duration
+        shape = statement_shape(sql)
+        profile['shapes'][shape] = profile['shapes'].get(shape, 0) + 1
+        ms = round(duration * 1000, 2)
+        slow = profile['slow'].get(shape)
+        if slow is not None:
+            slow['count'] += 1
+            slow['max_ms'] = max(slow['max_ms'], ms)
+        elif ms >= self.slow_ms:
+            # план сохраняется один раз для каждой формы запроса
+            plan = None
+            if explain is not None and shape.upper().startswith(('SELECT', 'WITH')):
+                try:
+                    plan = explain()
+                except Exception as e:
+                    plan = [f"EXPLAIN failed: {e}"]
+            profile['slow'][shape] = {'sql': shape, 'max_ms': ms, 'count': 1, 'plan': plan}
+
+    def finish(self):
+        """Завершить профиль текущего запроса и вернуть сводку."""
+        profile = getattr(self._local, 'profile', None)
+        self._local.profile = None
+        if profile is None:
+            return None
+        repeated = {shape: n for shape, n in profile['shapes'].items() if n >= self.repeat_threshold}
+        summary = {
+            'request': profile['label'],
+            'queries': profile['count'],
+            'db_ms': round(profile['seconds'] * 1000, 2),
+            'repeated': repeated,
+            'slow': list(profile['slow'].values()),
+        }
+        if repeated or profile['slow']:
+            self.logger.warning(json.dumps(summary, ensure_ascii=False))
+        else:
+            self.logger.info(json.dumps(summary, ensure_ascii=False))
+        return summary
+
+
+def explain_sqlite(connection, sql, parameters):
+    """EXPLAIN QUERY PLAN через обычный курсор (без повторного профилирования)."""
+    cursor = sqlite3.Cursor(connection)
+    try:
+        cursor.execute('EXPLAIN QUERY PLAN ' + sql, parameters)
+        return [row[-1] for row in cursor.fetchall()]
+    finally:
+        cursor.close()
+
+
+profiler = SQLProfiler()
+
+
+def init_app(app, engine):
+    """Подключить профилировщик к Flask и движку SQLAlchemy (если включен)."""
+    if not profiler.enabled:
+        return
+    from flask import request
+    from sqlalchemy import event
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('profile_started', []).append(time.perf_counter())
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info['profile_started'].pop()
+        explain = None
+        if not executemany:
+            explain = lambda: explain_sqlite(cursor.connection, statement, parameters)  # noqa: E731
+        profiler.record(statement, time.perf_counter() - started, explain)
+
+    @app.before_request
+    def start_sql_profile():
+        profiler.start(f"{request.method} {request.full_path.rstrip('?')}")
+
+    @app.after_request
+    def finish_sql_profile(response):
+        summary = profiler.finish()
+        if summary is not None:
+            response.headers['X-SQL-Profile'] = (
+                f"queries={summary['queries']}; db_ms={summary['db_ms']}; "
+                f"repeated={len(summary['repeated'])}; slow={len(summary['slow'])}"
+            )
+        return response
+
+    logging.warning(f"SQL profiler enabled, log: {profiler.log_file}")
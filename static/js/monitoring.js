@@ -1,8 +1,320 @@
 // Современная система мониторинга с AJAX поддержкой
 
+// Виртуальная таблица: в DOM находятся только видимые строки (плюс запас
+// overscan), высота остальных заменяется двумя строками-распорками.
+// Строки привязаны к ключу записи и при обновлении данных меняют только
+// те ячейки, значения которых изменились.
+class VirtualTable {
+    constructor(tbody, options) {
+        this.tbody = tbody;
+        this.scroller = tbody.closest('.virtual-scroll') || tbody.parentElement;
+        this.columns = options.columns;
+        this.key = options.key;
+        this.createRow = options.create;
+        this.updateRow = options.update;
+        this.emptyText = options.emptyText || '';
+        this.rowHeight = options.rowHeight || 41;
+        this.overscan = options.overscan || 10;
+        this.items = [];
+        this.rows = new Map(); // ключ -> строка в DOM
+        this.pool = [];
+        this.measured = false;
+        this.frame = null;
+
+        this.top = this.createSpacer();
+        this.bottom = this.createSpacer();
+        this.empty = this.createSpacer();
+        this.empty.className = 'virtual-empty';
+        this.empty.firstChild.className = 'text-center text-muted py-4';
+        tbody.replaceChildren(this.top, this.bottom);
+
+        this.scroller.addEventListener('scroll', () => this.scheduleRender(), { passive: true });
+    }
+
+    createSpacer() {
+        const row = document.createElement('tr');
+        row.className = 'virtual-spacer';
+        const cell = document.createElement('td');
+        cell.colSpan = this.columns;
+        row.appendChild(cell);
+        return row;
+    }
+
+    setData(items, resetScroll = false) {
+        this.items = items;
+        if (resetScroll) {
+            this.scroller.scrollTop = 0;
+        }
+        this.render();
+    }
+
+    scheduleRender() {
+        if (this.frame !== null) return;
+        const schedule = window.requestAnimationFrame || (callback => setTimeout(callback, 16));
+        this.frame = schedule(() => {
+            this.frame = null;
+            this.render();
+        });
+    }
+
+    render() {
+        const total = this.items.length;
+        if (total === 0) {
+            this.recycle(new Set());
+            this.setSpacer(this.top, 0);
+            this.setSpacer(this.bottom, 0);
+            this.empty.firstChild.textContent = this.emptyText;
+            if (!this.empty.parentNode) this.tbody.insertBefore(this.empty, this.bottom);
+            return;
+        }
+        this.empty.remove();
+
+        const scrollTop = this.scroller.scrollTop;
+        const viewport = this.scroller.clientHeight || this.rowHeight * 20;
+        let start = Math.max(0, Math.floor(scrollTop / this.rowHeight) - this.overscan);
+        start -= start % 2; // четное начало сохраняет чередование строк table-striped
+        const end = Math.min(total, Math.ceil((scrollTop + viewport) / this.rowHeight) + this.overscan);
+
+        // items - массив или колоночные данные с методом get(i)
+        const visible = new Map();
+        for (let i = start; i < end; i++) {
+            const item = this.items.get ? this.items.get(i) : this.items[i];
+            const key = this.key(item);
+            visible.set(visible.has(key) ? `${key}#${i}` : key, item);
+        }
+        this.recycle(visible);
+
+        // Строки ставятся по порядку; при неизменном порядке ключей DOM не перестраивается
+        let cursor = this.top.nextSibling;
+        visible.forEach((item, key) => {
+            let row = this.rows.get(key);
+            if (!row) {
+                row = this.pool.pop() || this.createRow();
+                this.rows.set(key, row);
+            }
+            this.updateRow(row, item);
+            if (row === cursor) {
+                cursor = cursor.nextSibling;
+            } else {
+                this.tbody.insertBefore(row, cursor);
+            }
+        });
+
+        this.setSpacer(this.top, start * this.rowHeight);
+        this.setSpacer(this.bottom, (total - end) * this.rowHeight);
+
+        // Высота строки уточняется по первой отрисованной строке (без верстки она 0)
+        if (!this.measured && this.top.nextSibling !== this.bottom) {
+            this.measured = true;
+            const height = this.top.nextSibling.offsetHeight;
+            if (height && Math.abs(height - this.rowHeight) > 1) {
+                this.rowHeight = height;
+                this.render();
+            }
+        }
+    }
+
+    recycle(visible) {
+        this.rows.forEach((row, key) => {
+            if (!visible.has(key)) {
+                row.remove();
+                this.rows.delete(key);
+                this.pool.push(row);
+            }
+        });
+    }
+
+    setSpacer(spacer, height) {
+        const value = `${height}px`;
+        if (spacer.firstChild.style.height !== value) {
+            spacer.firstChild.style.height = value;
+        }
+    }
+}
+
+// Обновляет свойство узла, только если значение изменилось
+function patch(node, property, value) {
+    if (node[property] !== value) {
+        node[property] = value;
+    }
+}
+
+function statusBadgeClass(status) {
+    if (status === 'Доступен') return 'success';
+    if (status === 'Недоступен (подавлен)') return 'suppressed';
+    return 'danger';
+}
+
+// Заменяет содержимое массива target, не создавая новый массив
+function fillArray(target, source) {
+    target.length = source.length;
+    for (let i = 0; i < source.length; i++) {
+        target[i] = source[i];
+    }
+}
+
+// Точки {x, y} переиспользуются между обновлениями графика
+function fillPoints(target, xs, ys) {
+    target.length = Math.min(target.length, xs.length);
+    for (let i = 0; i < xs.length; i++) {
+        const point = target[i];
+        if (point) {
+            point.x = xs[i];
+            point.y = ys[i];
+        } else {
+            target[i] = { x: xs[i], y: ys[i] };
+        }
+    }
+}
+
+// Точки столбчатой диаграммы: x - номер подписи категории
+function fillIndexedPoints(target, ys) {
+    target.length = Math.min(target.length, ys.length);
+    for (let i = 0; i < ys.length; i++) {
+        const point = target[i];
+        if (point) {
+            point.x = i;
+            point.y = ys[i];
+        } else {
+            target[i] = { x: i, y: ys[i] };
+        }
+    }
+}
+
+// Время в базе без часового пояса; на сервере и в браузере оно
+// кодируется как UTC, чтобы не сдвигаться на пояс браузера.
+// 'YYYY-MM-DD HH:MM' -> миллисекунды эпохи
+function parseHour(text) {
+    return Date.parse(`${text.replace(' ', 'T')}Z`);
+}
+
+function formatHour(value) {
+    return new Date(value).toLocaleString('ru-RU', {
+        day: '2-digit', month: '2-digit', hour: '2-digit', minute: '2-digit', timeZone: 'UTC'
+    });
+}
+
+// Секунды эпохи -> 'YYYY-MM-DD HH:MM:SS', как в ping_results
+function formatTimestamp(seconds) {
+    return new Date(seconds * 1000).toISOString().slice(0, 19).replace('T', ' ');
+}
+
+// Колоночный формат (format=columnar): time_base и разности соседних значений -> секунды
+function decodeTimes(data) {
+    const times = new Float64Array(data.time_delta.length + (data.time_base === null ? 0 : 1));
+    let value = data.time_base;
+    for (let i = 0; i < times.length; i++) {
+        if (i > 0) value += data.time_delta[i - 1];
+        times[i] = value;
+    }
+    return times;
+}
+
+// Цвета тепловой карты по доступности в десятых долях процента (0-1000):
+// до 80% красный, 80-90% переход к желтому, 90-100% - к зеленому
+const HEATMAP_EMPTY = '#dee2e6';
+const HEATMAP_COLORS = Array.from({ length: 1001 }, (_, permille) => {
+    const mix = (from, to, t) => from.map((value, i) => Math.round(value + (to[i] - value) * t));
+    const red = [220, 53, 69], yellow = [255, 193, 7], green = [25, 135, 84];
+    let rgb = red;
+    if (permille >= 900) {
+        rgb = mix(yellow, green, (permille - 900) / 100);
+    } else if (permille >= 800) {
+        rgb = mix(red, yellow, (permille - 800) / 100);
+    }
+    return `rgb(${rgb.join(', ')})`;
+});
+
+// История пингов в колоночном формате: строки собираются только для видимых записей
+class PingHistoryColumns {
+    constructor(data) {
+        this.times = decodeTimes(data);
+        this.status = data.status;
+        this.statusNames = data.status_names;
+        this.latency = data.latency;
+        this.length = data.count;
+    }
+
+    get(i) {
+        const latency = this.latency[i];
+        return {
+            timestamp: formatTimestamp(this.times[i]),
+            status: this.statusNames[this.status[i]],
+            latency: latency === null ? 'нет данных' : latency
+        };
+    }
+}
+
+const hostRows = {
+    columns: 5,
+    key: host => host.address,
+
+    create() {
+        const row = document.createElement('tr');
+        row.style.cursor = 'pointer';
+        row.title = 'Нажмите для просмотра логов';
+        row.innerHTML = `
+            <td><span class="status-indicator"></span></td>
+            <td class="fw-bold"><span class="host-address"></span> <span class="badge bg-warning text-dark" hidden>Аномалия задержки</span></td>
+            <td></td>
+            <td><span class="badge bg-secondary"></span></td>
+            <td class="text-center">${typeof feather !== 'undefined' ? feather.icons['arrow-right'].toSvg({ class: 'text-muted' }) : ''}</td>
+        `;
+        const cells = row.children;
+        row.refs = {
+            indicator: cells[0].firstChild,
+            address: cells[1].querySelector('.host-address'),
+            anomaly: cells[1].querySelector('.badge'),
+            description: cells[2],
+            subgroup: cells[3].firstChild
+        };
+        return row;
+    },
+
+    update(row, host) {
+        const refs = row.refs;
+        patch(row, 'className', `host-row status-${host.status}`);
+        patch(refs.indicator, 'className', `status-indicator status-${host.status}`);
+        if (row.dataset.address !== host.address) {
+            row.dataset.address = host.address;
+        }
+        patch(refs.address, 'textContent', host.address);
+        patch(refs.description, 'textContent', host.description || '');
+        patch(refs.subgroup, 'textContent', host.subgroup || '');
+        const anomaly = host.anomaly;
+        patch(refs.anomaly, 'hidden', !anomaly);
+        patch(refs.anomaly, 'title', anomaly
+            ? `Задержка выше обычной с ${anomaly.started_at} (z=${anomaly.max_z}, обычно ${anomaly.baseline_ms} мс)`
+            : '');
+    }
+};
+
+const historyRows = {
+    columns: 3,
+    key: entry => entry.timestamp,
+
+    create() {
+        const row = document.createElement('tr');
+        row.innerHTML = '<td></td><td><span class="badge"></span></td><td></td>';
+        const cells = row.children;
+        row.refs = { timestamp: cells[0], status: cells[1].firstChild, latency: cells[2] };
+        return row;
+    },
+
+    update(row, entry) {
+        const refs = row.refs;
+        patch(refs.timestamp, 'textContent', entry.timestamp);
+        patch(refs.status, 'className', `badge bg-${statusBadgeClass(entry.status)}`);
+        patch(refs.status, 'textContent', entry.status);
+        patch(refs.latency, 'textContent', entry.latency === null || entry.latency === undefined ? '' : String(entry.latency));
+    }
+};
+
 class MonitoringDashboard {
     constructor() {
         this.charts = {};
+        this.tables = {};
+        this.heatmap = null;
         this.updateInterval = 300000; // 5 минут
         this.currentState = {
             group: null,
@@ -28,15 +340,36 @@ class MonitoringDashboard {
             this.currentState.group = groupSelect.value;
         }
 
+        const hostSelect = document.getElementById('host');
+        if (hostSelect && hostSelect.value) {
+            this.currentState.host = hostSelect.value;
+        }
+
         // Обработка вкладок
         this.setupTabs();
 
+        // Поиск хостов по всем группам
+        this.setupSearch();
+
         // Фильтрация истории
         const filterBtn = document.querySelector('.filter-history-btn');
         if (filterBtn) {
             filterBtn.addEventListener('click', this.handleFilterHistory.bind(this));
         }
 
+        // Тепловая карта: период и подсказка по положению мыши
+        const heatmapBucket = document.getElementById('heatmap-bucket');
+        if (heatmapBucket) {
+            heatmapBucket.addEventListener('change', () => this.loadHeatmap());
+        }
+        const heatmapCanvas = document.getElementById('heatmapCanvas');
+        if (heatmapCanvas) {
+            heatmapCanvas.addEventListener('mousemove', this.showHeatmapTooltip.bind(this));
+            heatmapCanvas.addEventListener('mouseleave', () => {
+                document.getElementById('heatmap-tooltip').classList.add('d-none');
+            });
+        }
+
         // Делегированные обработчики для динамически создаваемых элементов
         document.addEventListener('click', this.handleDelegatedClicks.bind(this));
         document.addEventListener('change', this.handleDelegatedChanges.bind(this));
@@ -53,9 +386,8 @@ class MonitoringDashboard {
         // Обработка кликов по хостам для перехода к логам
         if (event.target.matches('.host-row td') || event.target.closest('.host-row')) {
             const row = event.target.closest('.host-row');
-            if (row) {
-                const hostAddress = row.querySelector('.fw-bold').textContent;
-                this.drillDownToHostLogs(hostAddress);
+            if (row && row.dataset.address) {
+                this.drillDownToHostLogs(row.dataset.address);
             }
         }
     }
@@ -78,12 +410,123 @@ class MonitoringDashboard {
             });
         });
 
-        // Открыть первую вкладку по умолчанию
+        // Открыть вкладку из адреса (#history из результатов поиска) или первую
         if (tabLinks.length > 0) {
-            this.switchTab('hosts');
+            const requested = window.location.hash.substring(1);
+            const known = Array.from(tabLinks).some(link => link.getAttribute('href') === `#${requested}`);
+            this.switchTab(known ? requested : 'hosts');
+        }
+    }
+
+    setupSearch() {
+        const input = document.getElementById('host-search');
+        const results = document.getElementById('host-search-results');
+        if (!input || !results) return;
+
+        this.search = { input, results, timer: null, controller: null };
+
+        // Запрос уходит через 200 мс после последнего нажатия, предыдущий отменяется
+        input.addEventListener('input', () => {
+            clearTimeout(this.search.timer);
+            this.search.timer = setTimeout(() => this.searchHosts(input.value.trim()), 200);
+        });
+        input.addEventListener('keydown', (e) => {
+            if (e.key === 'Escape') {
+                this.hideSearchResults();
+            } else if (e.key === 'Enter') {
+                e.preventDefault();
+                const first = results.querySelector('a');
+                if (first) window.location.href = first.href;
+            }
+        });
+        input.addEventListener('focus', () => {
+            if (results.childElementCount > 0) results.classList.remove('d-none');
+        });
+        document.addEventListener('click', (e) => {
+            if (!e.target.closest('.host-search')) this.hideSearchResults();
+        });
+    }
+
+    hideSearchResults() {
+        this.search.results.classList.add('d-none');
+    }
+
+    async searchHosts(query) {
+        if (this.search.controller) {
+            this.search.controller.abort();
+        }
+        if (!query) {
+            this.search.results.replaceChildren();
+            this.hideSearchResults();
+            return;
+        }
+
+        const controller = new AbortController();
+        this.search.controller = controller;
+        try {
+            const response = await fetch(`/api/search?q=${encodeURIComponent(query)}`, { signal: controller.signal });
+            const data = await response.json();
+            if (data.error) {
+                throw new Error(data.error);
+            }
+            this.renderSearchResults(data.results, data.truncated);
+        } catch (error) {
+            if (error.name !== 'AbortError') {
+                this.handleError(error);
+            }
+        } finally {
+            if (this.search.controller === controller) {
+                this.search.controller = null;
+            }
         }
     }
 
+    renderSearchResults(hosts, truncated = false) {
+        const results = this.search.results;
+        const items = hosts.map(host => {
+            // Переход к истории хоста в его группе
+            const params = new URLSearchParams({ group: host.group, host: host.address });
+            const item = document.createElement('a');
+            item.href = `/?${params}#history`;
+            item.className = 'list-group-item list-group-item-action';
+
+            const indicator = document.createElement('span');
+            indicator.className = `status-indicator status-${host.color}`;
+            indicator.title = host.status || 'нет данных';
+
+            const address = document.createElement('span');
+            address.className = 'search-address';
+            address.textContent = host.address;
+
+            const description = document.createElement('span');
+            description.className = 'text-truncate';
+            description.textContent = host.description || '';
+
+            const meta = document.createElement('small');
+            meta.className = 'search-meta text-muted';
+            meta.textContent = `${host.group} / ${host.subgroup}` +
+                (host.latency !== null && host.latency !== undefined ? ` · ${host.latency} с` : '');
+
+            item.append(indicator, address, description, meta);
+            return item;
+        });
+
+        if (items.length === 0) {
+            const empty = document.createElement('div');
+            empty.className = 'list-group-item text-muted';
+            empty.textContent = 'Ничего не найдено';
+            items.push(empty);
+        } else if (truncated) {
+            // Совпадений больше, чем ранжирует сервер: лучшие могли не попасть в список
+            const note = document.createElement('div');
+            note.className = 'list-group-item small text-muted';
+            note.textContent = 'Совпадений слишком много, уточните запрос';
+            items.push(note);
+        }
+        results.replaceChildren(...items);
+        results.classList.remove('d-none');
+    }
+
     switchTab(tabName) {
         this.currentState.tab = tabName;
 
@@ -210,7 +653,8 @@ class MonitoringDashboard {
                 <span class="status-indicator status-${statusClass}"></span>
                 ${subgroup}
                 ${subgroup !== 'Все' && statusInfo.up !== undefined ? 
-                    `<small class="text-muted">(${statusInfo.up}/${statusInfo.total})</small>` : ''}
+                    `<small class="text-muted">(${statusInfo.up}/${statusInfo.total}${statusInfo.suppressed ?
+                        `, подавлено ${statusInfo.suppressed}` : ''})</small>` : ''}
             `;
             
             container.appendChild(tab);
@@ -246,7 +690,7 @@ class MonitoringDashboard {
                 throw new Error(data.error);
             }
 
-            this.renderHosts(data.hosts, data.host_statuses);
+            this.renderHosts(data.hosts, data.host_statuses, data.host_anomalies || {});
         } catch (error) {
             this.handleError(error);
         } finally {
@@ -254,42 +698,31 @@ class MonitoringDashboard {
         }
     }
 
-    renderHosts(hosts, hostStatuses) {
-        const tableBody = document.querySelector('#hosts tbody');
-        if (!tableBody) return;
-
-        if (hosts.length === 0) {
-            const container = document.getElementById('hosts');
-            container.innerHTML = `
-                <div class="dashboard-card">
-                    <div class="alert alert-info">
-                        <i data-feather="info"></i>
-                        Список хостов пуст или группа не существует.
-                    </div>
-                </div>
-            `;
-            feather.replace();
-            return;
-        }
-
-        let html = '';
-        hosts.forEach(host => {
-            const statusClass = hostStatuses[host.address] || 'secondary';
-            html += `
-                <tr class="host-row status-${statusClass}" style="cursor: pointer;" title="Нажмите для просмотра логов">
-                    <td>
-                        <span class="status-indicator status-${statusClass}"></span>
-                    </td>
-                    <td class="fw-bold">${host.address}</td>
-                    <td>${host.description}</td>
-                    <td>
-                        <span class="badge bg-secondary">${host.subgroup}</span>
-                    </td>
-                </tr>
-            `;
-        });
+    getTable(name, selector, rows, emptyText) {
+        const tbody = document.querySelector(selector);
+        if (!tbody) return null;
+        const table = this.tables[name];
+        if (table && table.tbody === tbody) return table;
+        this.tables[name] = new VirtualTable(tbody, { ...rows, emptyText });
+        return this.tables[name];
+    }
 
-        tableBody.innerHTML = html;
+    renderHosts(hosts, hostStatuses, hostAnomalies = {}) {
+        const table = this.getTable('hosts', '#hosts tbody', hostRows,
+            'Список хостов пуст или группа не существует.');
+        if (!table) return;
+
+        const items = hosts.map(host => ({
+            address: host.address,
+            description: host.description,
+            subgroup: host.subgroup,
+            status: hostStatuses[host.address] || 'secondary',
+            anomaly: hostAnomalies[host.address] || null
+        }));
+        // Прокрутка сбрасывается только при смене группы или подгруппы, не при автообновлении
+        const view = `${this.currentState.group}|${this.currentState.subgroup}`;
+        table.setData(items, view !== this.hostsView);
+        this.hostsView = view;
     }
 
     async drillDownToHostLogs(hostAddress) {
@@ -324,7 +757,8 @@ class MonitoringDashboard {
             const params = new URLSearchParams({
                 group: this.currentState.group,
                 host: this.currentState.host,
-                subgroup: this.currentState.subgroup
+                subgroup: this.currentState.subgroup,
+                format: 'columnar'
             });
 
             if (startTime) params.set('start_time', startTime);
@@ -347,45 +781,20 @@ class MonitoringDashboard {
     }
 
     renderPingHistory(pingHistory) {
-        const tableBody = document.querySelector('#history tbody');
-        if (!tableBody) return;
-
-        if (pingHistory.length === 0) {
-            this.renderEmptyHistory();
-            return;
+        const table = this.getTable('history', '#history tbody', historyRows,
+            'История пингов пуста или хост не выбран.');
+        if (!table) return;
+        if (pingHistory.format === 'columnar') {
+            pingHistory = new PingHistoryColumns(pingHistory);
         }
 
-        let html = '';
-        pingHistory.forEach(entry => {
-            const badgeClass = entry.status === 'Доступен' ? 'success' : 'danger';
-            html += `
-                <tr>
-                    <td>${entry.timestamp}</td>
-                    <td>
-                        <span class="badge bg-${badgeClass}">
-                            ${entry.status}
-                        </span>
-                    </td>
-                    <td>${entry.latency}</td>
-                </tr>
-            `;
-        });
-
-        tableBody.innerHTML = html;
+        const view = `${this.currentState.group}|${this.currentState.host}`;
+        table.setData(pingHistory, view !== this.historyView);
+        this.historyView = view;
     }
 
     renderEmptyHistory() {
-        const container = document.getElementById('history');
-        const existingTable = container.querySelector('.table-responsive');
-        if (existingTable) {
-            existingTable.innerHTML = `
-                <div class="alert alert-info">
-                    <i data-feather="info"></i>
-                    История пингов пуста или хост не выбран.
-                </div>
-            `;
-            feather.replace();
-        }
+        this.renderPingHistory([]);
     }
 
     async handleFilterHistory() {
@@ -398,7 +807,7 @@ class MonitoringDashboard {
         try {
             this.showLoadingIndicator('dashboard');
 
-            const response = await fetch(`/api/dashboard?group=${encodeURIComponent(this.currentState.group)}&subgroup=${encodeURIComponent(this.currentState.subgroup)}`);
+            const response = await fetch(`/api/dashboard?group=${encodeURIComponent(this.currentState.group)}&subgroup=${encodeURIComponent(this.currentState.subgroup)}&format=columnar`);
             const data = await response.json();
             
             if (data.error) {
@@ -407,6 +816,7 @@ class MonitoringDashboard {
 
             window.dashboardData = data.dashboard_data;
             this.initializeCharts();
+            await this.loadHeatmap();
         } catch (error) {
             this.handleError(error);
         } finally {
@@ -414,52 +824,199 @@ class MonitoringDashboard {
         }
     }
 
+    async loadHeatmap() {
+        const canvas = document.getElementById('heatmapCanvas');
+        if (!canvas || !this.currentState.group) return;
+
+        const params = new URLSearchParams({
+            group: this.currentState.group,
+            subgroup: this.currentState.subgroup,
+            bucket: document.getElementById('heatmap-bucket').value
+        });
+        const response = await fetch(`/api/heatmap?${params}`);
+        const data = await response.json();
+        if (data.error) {
+            throw new Error(data.error);
+        }
+        this.heatmap = data;
+        this.drawHeatmap();
+    }
+
+    // Матрица рисуется на одном canvas: ячейка - прямоугольник, строки -
+    // хосты, столбцы - часы или сутки; подписи хостов - если строки достаточно высокие
+    drawHeatmap() {
+        const data = this.heatmap;
+        const canvas = document.getElementById('heatmapCanvas');
+        if (!data || !canvas) return;
+
+        const ctx = canvas.getContext('2d');
+        const rowHeight = data.hosts.length > 200 ? 4 : 12;
+        ctx.font = '10px sans-serif';
+        let labelWidth = 0;
+        if (rowHeight >= 12) {
+            data.hosts.forEach(host => {
+                labelWidth = Math.max(labelWidth, ctx.measureText(host).width);
+            });
+            labelWidth = Math.min(Math.ceil(labelWidth) + 6, 160);
+        }
+        const available = canvas.parentElement.clientWidth - labelWidth;
+        const cellWidth = Math.max(2, Math.floor(available / Math.max(data.columns, 1)));
+        canvas.width = labelWidth + cellWidth * data.columns;
+        canvas.height = Math.max(rowHeight * data.hosts.length, rowHeight);
+        this.heatmapLayout = { labelWidth, cellWidth, rowHeight };
+
+        // canvas.width сбрасывает состояние контекста
+        ctx.font = '10px sans-serif';
+        ctx.textBaseline = 'middle';
+        ctx.fillStyle = '#495057';
+        if (labelWidth) {
+            data.hosts.forEach((host, row) => {
+                ctx.fillText(host, 0, row * rowHeight + rowHeight / 2, labelWidth - 6);
+            });
+        }
+        const values = data.availability;
+        let color = null;
+        for (let row = 0; row < data.hosts.length; row++) {
+            const offset = row * data.columns;
+            for (let column = 0; column < data.columns; column++) {
+                const value = values[offset + column];
+                const next = value < 0 ? HEATMAP_EMPTY : HEATMAP_COLORS[value];
+                if (next !== color) {
+                    ctx.fillStyle = color = next;
+                }
+                ctx.fillRect(labelWidth + column * cellWidth, row * rowHeight,
+                             cellWidth - (cellWidth > 3 ? 1 : 0), rowHeight - (rowHeight > 4 ? 1 : 0));
+            }
+        }
+    }
+
+    showHeatmapTooltip(event) {
+        const data = this.heatmap;
+        const tooltip = document.getElementById('heatmap-tooltip');
+        if (!data || !this.heatmapLayout) return;
+
+        const { labelWidth, cellWidth, rowHeight } = this.heatmapLayout;
+        const column = Math.floor((event.offsetX - labelWidth) / cellWidth);
+        const row = Math.floor(event.offsetY / rowHeight);
+        if (column < 0 || column >= data.columns || row < 0 || row >= data.hosts.length) {
+            tooltip.classList.add('d-none');
+            return;
+        }
+        const value = data.availability[row * data.columns + column];
+        const time = formatTimestamp(data.time_base + column * data.step_seconds);
+        const period = data.bucket === 'day' ? time.slice(0, 10) : time.slice(0, 16);
+        tooltip.textContent = `${data.hosts[row]}, ${period}: ` +
+            (value < 0 ? 'нет проверок' : `${(value / 10).toFixed(1)}%`);
+        // Подсказка внутри прокручиваемого контейнера: координаты относительно canvas
+        tooltip.style.left = `${event.offsetX + 12}px`;
+        tooltip.style.top = `${event.offsetY + 12}px`;
+        tooltip.classList.remove('d-none');
+    }
+
+    // Графики создаются один раз и при обновлении меняют данные на месте:
+    // массивы и объекты точек переиспользуются, анимация и разбор данных
+    // Chart.js отключены (parsing: false - точки уже во внутреннем формате {x, y}).
     initializeCharts() {
-        // Уничтожить существующие графики
-        Object.values(this.charts).forEach(chart => {
-            if (chart) {
-                chart.destroy();
+        if (!window.dashboardData) return;
+        const columns = this.dashboardColumns(window.dashboardData);
+
+        this.renderChart('availability', 'availabilityChart', () => this.availabilityChartConfig(), chart => {
+            const values = columns.availability.values;
+            fillArray(chart.data.labels, columns.availability.labels);
+            fillIndexedPoints(chart.data.datasets[0].data, values);
+            const background = chart.data.datasets[0].backgroundColor;
+            const border = chart.data.datasets[0].borderColor;
+            background.length = border.length = values.length;
+            for (let i = 0; i < values.length; i++) {
+                background[i] = this.getAvailabilityColor(values[i]);
+                border[i] = this.getAvailabilityColor(values[i], true);
             }
         });
-        this.charts = {};
 
-        // График доступности
-        const availabilityCanvas = document.getElementById('availabilityChart');
-        if (availabilityCanvas && window.dashboardData) {
-            this.createAvailabilityChart(availabilityCanvas);
-        }
+        this.renderChart('latency', 'latencyChart', () => this.latencyChartConfig(), chart => {
+            fillArray(chart.data.labels, columns.latency.labels);
+            fillIndexedPoints(chart.data.datasets[0].data, columns.latency.values);
+        });
 
-        // График задержки
-        const latencyCanvas = document.getElementById('latencyChart');
-        if (latencyCanvas && window.dashboardData) {
-            this.createLatencyChart(latencyCanvas);
+        this.renderChart('down', 'downChart', () => this.downChartConfig(), chart => {
+            fillPoints(chart.data.datasets[0].data, columns.down.times, columns.down.down);
+            fillPoints(chart.data.datasets[1].data, columns.down.times, columns.down.suppressed);
+        });
+    }
+
+    // Данные дашборда в виде параллельных массивов
+    dashboardColumns(data) {
+        if (data.format === 'columnar') {
+            return {
+                availability: { labels: data.availability.address, values: data.availability.availability },
+                latency: { labels: data.latency.address, values: data.latency.avg_latency },
+                down: {
+                    times: Array.from(decodeTimes(data.down), seconds => seconds * 1000),
+                    down: data.down.down_count,
+                    suppressed: data.down.suppressed_count
+                }
+            };
         }
+        const availability = data.availability || [];
+        const latency = data.latency || [];
+        const down = data.down || [];
+        return {
+            availability: {
+                labels: availability.map(item => item.address),
+                values: availability.map(item => item.availability)
+            },
+            latency: {
+                labels: latency.map(item => item.address),
+                values: latency.map(item => item.avg_latency)
+            },
+            down: {
+                times: down.map(item => parseHour(item.timestamp)),
+                down: down.map(item => item.down_count),
+                suppressed: down.map(item => item.suppressed_count || 0)
+            }
+        };
+    }
 
-        // График недоступных хостов
-        const downCanvas = document.getElementById('downChart');
-        if (downCanvas && window.dashboardData) {
-            this.createDownChart(downCanvas);
+    renderChart(name, canvasId, createConfig, fill) {
+        const canvas = document.getElementById(canvasId);
+        if (!canvas) return;
+        let chart = this.charts[name];
+        if (chart && chart.canvas !== canvas) {
+            chart.destroy();
+            chart = null;
         }
+        if (!chart) {
+            chart = this.charts[name] = new Chart(canvas, createConfig());
+        }
+        fill(chart);
+        chart.update('none');
     }
 
-    createAvailabilityChart(canvas) {
-        const data = window.dashboardData.availability || [];
-        
-        this.charts.availability = new Chart(canvas, {
+    baseChartOptions() {
+        return {
+            responsive: true,
+            maintainAspectRatio: false,
+            animation: false,
+            parsing: false,
+            normalized: true
+        };
+    }
+
+    availabilityChartConfig() {
+        return {
             type: 'bar',
             data: {
-                labels: data.map(item => item.address),
+                labels: [],
                 datasets: [{
                     label: 'Доступность (%)',
-                    data: data.map(item => item.availability),
-                    backgroundColor: data.map(item => this.getAvailabilityColor(item.availability)),
-                    borderColor: data.map(item => this.getAvailabilityColor(item.availability, true)),
+                    data: [],
+                    backgroundColor: [],
+                    borderColor: [],
                     borderWidth: 1
                 }]
             },
             options: {
-                responsive: true,
-                maintainAspectRatio: false,
+                ...this.baseChartOptions(),
                 scales: {
                     y: {
                         beginAtZero: true,
@@ -485,27 +1042,24 @@ class MonitoringDashboard {
                     }
                 }
             }
-        });
+        };
     }
 
-    createLatencyChart(canvas) {
-        const data = window.dashboardData.latency || [];
-        
-        this.charts.latency = new Chart(canvas, {
+    latencyChartConfig() {
+        return {
             type: 'bar',
             data: {
-                labels: data.map(item => item.address),
+                labels: [],
                 datasets: [{
                     label: 'Средняя задержка (сек)',
-                    data: data.map(item => item.avg_latency),
+                    data: [],
                     backgroundColor: 'rgba(153, 102, 255, 0.6)',
                     borderColor: 'rgba(153, 102, 255, 1)',
                     borderWidth: 1
                 }]
             },
             options: {
-                responsive: true,
-                maintainAspectRatio: false,
+                ...this.baseChartOptions(),
                 scales: {
                     y: {
                         beginAtZero: true,
@@ -530,19 +1084,16 @@ class MonitoringDashboard {
                     }
                 }
             }
-        });
+        };
     }
 
-    createDownChart(canvas) {
-        const data = window.dashboardData.down || [];
-        
-        this.charts.down = new Chart(canvas, {
+    downChartConfig() {
+        return {
             type: 'line',
             data: {
-                labels: data.map(item => item.timestamp),
                 datasets: [{
                     label: 'Недоступные хосты',
-                    data: data.map(item => item.down_count),
+                    data: [],
                     fill: false,
                     borderColor: 'rgba(255, 99, 132, 1)',
                     backgroundColor: 'rgba(255, 99, 132, 0.2)',
@@ -551,11 +1102,17 @@ class MonitoringDashboard {
                     pointBorderColor: '#fff',
                     pointHoverBackgroundColor: '#fff',
                     pointHoverBorderColor: 'rgba(255, 99, 132, 1)'
+                }, {
+                    label: 'Подавленные (недоступен родитель)',
+                    data: [],
+                    fill: false,
+                    borderColor: 'rgba(111, 66, 193, 1)',
+                    backgroundColor: 'rgba(111, 66, 193, 0.2)',
+                    tension: 0.1
                 }]
             },
             options: {
-                responsive: true,
-                maintainAspectRatio: false,
+                ...this.baseChartOptions(),
                 scales: {
                     y: {
                         beginAtZero: true,
@@ -564,8 +1121,10 @@ class MonitoringDashboard {
                         }
                     },
                     x: {
+                        type: 'linear',
                         ticks: {
-                            maxTicksLimit: 12
+                            maxTicksLimit: 12,
+                            callback: value => formatHour(value)
                         }
                     }
                 },
@@ -573,10 +1132,21 @@ class MonitoringDashboard {
                     legend: {
                         display: true,
                         position: 'top'
+                    },
+                    // Длинные ряды прореживаются до 500 точек (нужны parsing: false и линейная ось x)
+                    decimation: {
+                        enabled: true,
+                        algorithm: 'lttb',
+                        samples: 500
+                    },
+                    tooltip: {
+                        callbacks: {
+                            title: items => (items.length ? formatHour(items[0].parsed.x) : '')
+                        }
                     }
                 }
             }
-        });
+        };
     }
 
     getAvailabilityColor(availability, border = false) {
@@ -679,10 +1249,16 @@ class MonitoringDashboard {
 
 // Инициализация при загрузке страницы
 document.addEventListener('DOMContentLoaded', () => {
-    window.monitoringDashboard = new MonitoringDashboard();
+    // Страница обзора групп работает со своим модулем (overview.js)
+    if (!document.getElementById('overview')) {
+        window.monitoringDashboard = new MonitoringDashboard();
+    }
 });
 
 // Экспорт для использования в других модулях (только в Node.js окружении)
 if (typeof module !== 'undefined' && typeof module.exports !== 'undefined') {
     module.exports = MonitoringDashboard;
+    module.exports.VirtualTable = VirtualTable;
+    module.exports.hostRows = hostRows;
+    module.exports.historyRows = historyRows;
 }
\ No newline at end of file
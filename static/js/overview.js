@@ -0,0 +1,132 @@
+// Обзор всех групп: сводка /api/overview, раскрытие подгрупп по клику
+
+function formatAge(seconds) {
+    if (seconds === null || seconds === undefined) return 'нет данных';
+    if (seconds < 60) return `${seconds} с назад`;
+    if (seconds < 3600) return `${Math.floor(seconds / 60)} мин назад`;
+    if (seconds < 86400) return `${Math.floor(seconds / 3600)} ч назад`;
+    return `${Math.floor(seconds / 86400)} д назад`;
+}
+
+function formatLatency(latency) {
+    return latency === null || latency === undefined ? '' : `${latency} с`;
+}
+
+class OverviewPage {
+    constructor() {
+        this.updateInterval = 30000; // 30 секунд
+        this.expanded = new Set();
+        this.data = null;
+        this.tbody = document.querySelector('.overview-table tbody');
+        this.problemsOnly = document.getElementById('overview-problems');
+
+        this.tbody.addEventListener('click', (e) => {
+            const row = e.target.closest('.overview-group');
+            if (!row || e.target.closest('a')) return;
+            const group = row.dataset.group;
+            if (this.expanded.has(group)) {
+                this.expanded.delete(group);
+            } else {
+                this.expanded.add(group);
+            }
+            this.render();
+        });
+        this.problemsOnly.addEventListener('change', () => this.render());
+
+        if (typeof feather !== 'undefined') {
+            feather.replace();
+        }
+
+        this.load();
+        setInterval(() => this.load(), this.updateInterval);
+    }
+
+    async load() {
+        try {
+            const response = await fetch('/api/overview');
+            const data = await response.json();
+            if (data.error) {
+                throw new Error(data.error);
+            }
+            this.data = data;
+            this.render();
+        } catch (error) {
+            console.error('Ошибка загрузки сводки:', error);
+        }
+    }
+
+    render() {
+        const data = this.data;
+        if (!data) return;
+
+        document.querySelectorAll('.overview-summary [data-field]').forEach(node => {
+            node.textContent = data.summary[node.dataset.field];
+        });
+        document.getElementById('overview-refreshed').textContent =
+            data.refreshed_at ? `Сводка на ${data.refreshed_at}` : '';
+
+        const problemsOnly = this.problemsOnly.checked;
+        const fragment = document.createDocumentFragment();
+        data.groups.forEach(group => {
+            if (problemsOnly && group.status === 'success' && !group.stale) return;
+            fragment.appendChild(this.renderRow(group, group.group, true));
+            if (!this.expanded.has(group.group)) return;
+            group.subgroups.forEach(subgroup => {
+                if (problemsOnly && subgroup.status === 'success' && !subgroup.stale) return;
+                fragment.appendChild(this.renderRow(subgroup, subgroup.subgroup, false, group.group));
+            });
+        });
+        if (!fragment.childNodes.length) {
+            const row = document.createElement('tr');
+            const cell = row.insertCell();
+            cell.colSpan = 8;
+            cell.className = 'text-center text-muted';
+            cell.textContent = problemsOnly ? 'Проблем нет' : 'Групп нет';
+            fragment.appendChild(row);
+        }
+        this.tbody.replaceChildren(fragment);
+    }
+
+    renderRow(item, title, isGroup, groupName) {
+        const row = document.createElement('tr');
+        row.className = isGroup ? 'overview-group' : 'overview-subgroup';
+        if (isGroup) {
+            row.dataset.group = item.group;
+        }
+
+        const name = row.insertCell();
+        const indicator = document.createElement('span');
+        indicator.className = `status-indicator status-${item.status}`;
+        const link = document.createElement('a');
+        const params = new URLSearchParams({ group: isGroup ? item.group : groupName });
+        if (!isGroup && item.subgroup !== 'нет') params.set('subgroup', item.subgroup);
+        link.href = `/?${params}`;
+        link.textContent = title;
+        name.append(indicator, link);
+        if (isGroup && item.subgroups.length) {
+            const toggle = document.createElement('small');
+            toggle.className = 'text-muted ms-2';
+            toggle.textContent = `${this.expanded.has(item.group) ? '▾' : '▸'} подгрупп: ${item.subgroups.length}`;
+            name.appendChild(toggle);
+        }
+
+        [item.total, item.up, item.down, item.suppressed, item.no_data, formatLatency(item.worst_latency)]
+            .forEach(value => {
+                const cell = row.insertCell();
+                cell.className = 'text-end';
+                cell.textContent = value;
+            });
+
+        const age = row.insertCell();
+        age.className = `text-end${item.stale ? ' text-danger' : ''}`;
+        age.textContent = formatAge(item.age_seconds);
+        if (item.last_result) age.title = item.last_result;
+        return row;
+    }
+}
+
+document.addEventListener('DOMContentLoaded', () => {
+    if (document.getElementById('overview')) {
+        window.overviewPage = new OverviewPage();
+    }
+});
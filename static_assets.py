@@ -0,0 +1,246 @@
+"""Сборка статических файлов с хэшем содержимого в имени и их раздача.
+
+build() копирует файлы static/css, static/js и static/libs в static/dist
+под именами вида chart.min.<хэш>.js, рядом кладет сжатые варианты .gz
+и .br (если установлен пакет brotli) и пишет manifest.json:
+{'libs/js/chart.min.js': 'libs/js/chart.min.<хэш>.js', ...}.
+Относительные ссылки url(...) в CSS (шрифты, картинки) переписываются
+на файлы с хэшем до вычисления хэша самого CSS; ссылки на файлы, которых
+нет в static, попадают в предупреждение сборки.
+
+При старте приложения (init_app) url_for('static', filename=...) в
+шаблонах подменяется на /assets/<имя с хэшем> по манифесту, а файлы
+/assets/ раздает WSGI-прослойка ImmutableStatic до Flask - без хуков
+before_request, сессии и журнала доступа. Имя меняется вместе с
+содержимым, поэтому ответы кэшируются навсегда (Cache-Control: immutable).
+Без сборки (нет манифеста) статика раздается Flask, как раньше.
+
+Сборка: python static_assets.py [--static static]  или  flask --app main build-assets
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import logging
+import mimetypes
+import os
+import posixpath
+import re
+import shutil
+
+try:
+    import brotli
+except ImportError:  # необязательная зависимость: без нее собираются только .gz
+    brotli = None
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+ASSET_DIRS = ('css', 'js', 'libs')
+DIST = 'dist'
+URL_PREFIX = '/assets/'
+# Файлы меньше этого размера не сжимаются
+MIN_COMPRESS_SIZE = 256
+# Варианты в порядке предпочтения: (Content-Encoding, расширение файла)
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+CSS_URL = re.compile(r"""url\(\s*(['"]?)([^'")]+?)\1\s*\)""")
+
+
+def build(static_dir=STATIC_DIR):
+    """Собрать static/dist и манифест; возвращает манифест."""
+    dist_dir = os.path.join(static_dir, DIST)
+    tmp_dir = dist_dir + '.tmp'
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    sources = {}
+    for top in ASSET_DIRS:
+        for root, _, files in os.walk(os.path.join(static_dir, top)):
+            for name in sorted(files):
+                source = os.path.join(root, name)
+                sources[os.path.relpath(source, static_dir).replace(os.sep, '/')] = source
+    manifest = {}
+    missing = set()
+
+    def emit(logical):
+        """Записать файл под именем с хэшем (CSS - после файлов, на которые он ссылается)."""
+        if logical in manifest:
+            return manifest[logical]
+        with open(sources[logical], 'rb') as f:
+            content = f.read()
+        if logical.endswith('.css'):
+            manifest[logical] = None  # циклические ссылки CSS остаются как есть
+            content = _rewrite_css_urls(content.decode('utf-8'), logical, sources, emit, missing).encode('utf-8')
+        digest = hashlib.sha256(content).hexdigest()[:12]
+        stem, ext = os.path.splitext(logical)
+        hashed = f"{stem}.{digest}{ext}"
+        target = os.path.join(tmp_dir, hashed)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with open(target, 'wb') as f:
+            f.write(content)
+        if len(content) >= MIN_COMPRESS_SIZE:
+            with open(target + '.gz', 'wb') as f:
+                f.write(gzip.compress(content, compresslevel=9, mtime=0))
+            if brotli is not None:
+                with open(target + '.br', 'wb') as f:
+                    f.write(brotli.compress(content, quality=11))
+        manifest[logical] = hashed
+        return hashed
+
+    for logical in sources:
+        emit(logical)
+    with open(os.path.join(tmp_dir, 'manifest.json'), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    shutil.rmtree(dist_dir, ignore_errors=True)
+    os.replace(tmp_dir, dist_dir)
+    if missing:
+        logging.warning(f"Файлы, на которые ссылается CSS, не найдены в {static_dir} "
+                        f"(будут отвечать 404): {', '.join(sorted(missing))}")
+    if brotli is None:
+        logging.warning("Пакет brotli не установлен, собраны только варианты .gz")
+    return manifest
+
+
+def _rewrite_css_urls(css, logical, sources, emit, missing):
+    """Заменить относительные url(...) в CSS на пути к файлам с хэшем."""
+    base = posixpath.dirname(logical)
+
+    def replace(match):
+        quote, url = match.groups()
+        path, suffix = re.match(r'([^?#]*)(.*)', url.strip()).groups()
+        if not path or path.startswith('/') or re.match(r'[a-zA-Z][a-zA-Z0-9+.-]*:', path):
+            return match.group(0)  # data:, http(s):, абсолютные пути и #фрагменты
+        target = posixpath.normpath(posixpath.join(base, path))
+        if target not in sources:
+            missing.add(target)
+            return match.group(0)
+        hashed = emit(target)
+        if hashed is None:
+            return match.group(0)
+        return f"url({quote}{posixpath.relpath(hashed, base)}{suffix}{quote})"
+
+    return CSS_URL.sub(replace, css)
+
+
+def load_manifest(static_dir=STATIC_DIR):
+    try:
+        with open(os.path.join(static_dir, DIST, 'manifest.json'), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+class ImmutableStatic:
+    """WSGI-прослойка: раздает собранные файлы /assets/ в обход приложения.
+
+    Содержимое читается в память при первом запросе каждого файла (это
+    несколько мегабайт библиотек); сжатый вариант выбирается по
+    Accept-Encoding.
+    """
+
+    def __init__(self, wsgi_app, dist_dir, prefix=URL_PREFIX):
+        self.wsgi_app = wsgi_app
+        self.dist_dir = os.path.realpath(dist_dir)
+        self.prefix = prefix
+        self._files = {}
+
+    def __call__(self, environ, start_response):
+        path = environ.get('PATH_INFO', '')
+        if not path.startswith(self.prefix):
+            return self.wsgi_app(environ, start_response)
+        if environ.get('REQUEST_METHOD') not in ('GET', 'HEAD'):
+            start_response('405 Method Not Allowed', [('Allow', 'GET, HEAD'), ('Content-Length', '0')])
+            return [b'']
+
+        variants = self._variants(path[len(self.prefix):])
+        if variants is None:
+            start_response('404 Not Found', [('Content-Type', 'text/plain'), ('Content-Length', '9')])
+            return [b'Not Found']
+
+        content_type, etag, files = variants
+        accepted = _accepted_encodings(environ.get('HTTP_ACCEPT_ENCODING', ''))
+        encoding, body = next(((encoding, files[encoding]) for encoding, _ in ENCODINGS
+                               if encoding in files and encoding in accepted), (None, files[None]))
+        tag = f'"{etag}-{encoding}"' if encoding else f'"{etag}"'
+        headers = [
+            ('Cache-Control', 'public, max-age=31536000, immutable'),
+            ('Content-Type', content_type),
+            ('ETag', tag),
+            ('Vary', 'Accept-Encoding'),
+        ]
+        if tag in environ.get('HTTP_IF_NONE_MATCH', ''):
+            start_response('304 Not Modified', headers)
+            return [b'']
+        if encoding:
+            headers.append(('Content-Encoding', encoding))
+        headers.append(('Content-Length', str(len(body))))
+        start_response('200 OK', headers)
+        return [b''] if environ['REQUEST_METHOD'] == 'HEAD' else [body]
+
+    def _variants(self, relative):
+        cached = self._files.get(relative)
+        if cached is not None:
+            return cached
+        path = os.path.realpath(os.path.join(self.dist_dir, relative))
+        if not path.startswith(self.dist_dir + os.sep) or path.endswith(('.gz', '.br')) \
+                or not os.path.isfile(path):
+            return None
+        files = {}
+        for encoding, suffix in ((None, ''),) + ENCODINGS:
+            if os.path.isfile(path + suffix):
+                with open(path + suffix, 'rb') as f:
+                    files[encoding] = f.read()
+        content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        if content_type.startswith('text/') or content_type == 'application/javascript':
+            content_type += '; charset=utf-8'
+        # хэш содержимого уже в имени файла: name.<хэш>.ext
+        etag = os.path.basename(path).rsplit('.', 2)[-2]
+        self._files[relative] = (content_type, etag, files)
+        return self._files[relative]
+
+
+def _accepted_encodings(header):
+    """Кодировки из Accept-Encoding, кроме запрещенных через q=0."""
+    accepted = set()
+    for item in header.split(','):
+        name, _, params = item.strip().partition(';')
+        q = params.strip()
+        if q.startswith('q='):
+            try:
+                if float(q[2:]) == 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(name.strip().lower())
+    return accepted
+
+
+def init_app(app, static_dir=STATIC_DIR):
+    """Подменить url_for статики на собранные файлы и подключить ImmutableStatic.
+
+    Без манифеста (сборка не выполнялась) ничего не меняет.
+    """
+    manifest = load_manifest(static_dir)
+    if not manifest:
+        return False
+    app.wsgi_app = ImmutableStatic(app.wsgi_app, os.path.join(static_dir, DIST))
+    flask_url_for = app.jinja_env.globals['url_for']
+
+    def url_for(endpoint, **values):
+        if endpoint == 'static':
+            hashed = manifest.get(values.get('filename'))
+            if hashed:
+                return URL_PREFIX + hashed
+        return flask_url_for(endpoint, **values)
+
+    app.jinja_env.globals['url_for'] = url_for
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Сборка статических файлов с хэшем в имени')
+    parser.add_argument('--static', default=STATIC_DIR, help='каталог static')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    manifest = build(args.static)
+    print(f"Собрано файлов: {len(manifest)} в {os.path.join(args.static, DIST)}")
+
+
+if __name__ == '__main__':
+    main()